@@ -8,37 +8,29 @@ import numpy as np
 from datetime import datetime
 
 # Import modules
-from src.data_loader import load_webinar_data, load_store_data, get_status_order
-from src.data_processor import (
-    merge_datasets, prepare_analysis_data, 
-    get_webinar_list, get_month_list,
-    filter_by_webinar, filter_by_month, filter_by_status
-)
-from src.analysis.first_seller import (
-    analyze_first_seller_conversion, 
-    get_first_seller_summary_text
-)
-from src.analysis.gmv_analysis import (
-    analyze_gmv_comparison, 
-    analyze_gmv_by_segment,
-    get_gmv_summary_text
-)
-from src.analysis.status_evolution import (
-    analyze_status_evolution,
-    get_sankey_data,
-    get_status_summary_text
-)
+from src.cache import get_shared_cache, file_fingerprint
+from src.file_readers import COLUMNAR_EXTENSIONS, list_excel_sheets
+from src.engine import DataLoadError, Filters, WebinarImpactEngine
+from src.data_processor import AGE_LABELS
+from src.analysis.contingency import TEST_NAMES
+from src.analysis.first_seller import get_first_seller_summary_text
+from src.analysis.gmv_analysis import get_gmv_summary_text
+from src.analysis.matching import DEFAULT_MATCH_K
+from src.analysis.status_evolution import get_status_summary_text
 from src.visualizations import (
     create_conversion_comparison_chart,
     create_conversion_funnel,
     create_conversion_by_month_chart,
     create_gmv_comparison_chart,
     create_gmv_distribution_chart,
+    create_gmv_histogram_chart,
+    create_gmv_ecdf_chart,
     create_gmv_by_status_chart,
     create_status_transition_chart,
     create_sankey_diagram,
     create_status_distribution_comparison,
     create_upgrade_by_status_chart,
+    create_leaderboard_chart,
     format_number
 )
 
@@ -120,6 +112,90 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# Dashboard sections (one hypothesis each) and the widgets drawn inside them
+SECTIONS = {
+    'h1': "🎯 H1: First Seller",
+    'h2': "💰 H2: GMV",
+    'h3': "📊 H3: Evolução de Status",
+    'leaderboard': "🏆 Ranking de Webinars"
+}
+SECTION_WIDGETS = ['gmv_period', 'segment_col', 'strata_by_month', 'leaderboard_group']
+
+
+def select_sheet(file, key):
+    """Let the user pick the sheet when an Excel upload has more than one"""
+    if file is None:
+        return None
+    
+    try:
+        sheets = get_shared_cache().get_or_compute(
+            ('sheets', file_fingerprint(file)),
+            lambda: list_excel_sheets(file)
+        )
+    except Exception:
+        # An unreadable file is reported by the load ("Erro ao carregar")
+        file.seek(0)
+        return None
+    if len(sheets) > 1:
+        return st.selectbox("Aba da planilha", sheets, key=key)
+    return None
+
+
+def show_load_metrics(frames):
+    """Show how long each upload took to read and normalise"""
+    with st.sidebar.expander("⏱️ Tempo de carregamento"):
+        for label, df in frames.items():
+            metrics = df.attrs.get('load_metrics')
+            if not metrics:
+                continue
+            st.markdown(
+                f"**{label}** ({metrics['format']}, engine {metrics['engine']}): "
+                f"{metrics['rows']:,} linhas · leitura {metrics['read_seconds']:.2f}s · "
+                f"total {metrics['total_seconds']:.2f}s"
+            )
+
+
+def show_interval(interval, run, fmt, label=''):
+    """Caption with a bootstrap confidence interval under a metric"""
+    if interval['ci_low'] is None:
+        return
+    caption = (
+        f"{label}IC {run['confidence']:.0%} (bootstrap): "
+        f"{fmt.format(interval['ci_low'])} a {fmt.format(interval['ci_high'])}"
+    )
+    if run['truncated']:
+        caption += f" · {run['n_resamples']:,} reamostragens (limite de tempo)"
+    st.caption(caption)
+
+
+def show_permutation(result, label='Teste de permutação'):
+    """Caption with a permutation p-value and its Monte Carlo error"""
+    if result.get('error'):
+        st.caption(f"{label}: {result['error']}")
+        return
+    if result.get('p_value') is None:
+        return
+    sig = "significativo" if result['significant'] else "não significativo"
+    caption = (
+        f"{label}: p-valor {result['p_value']:.4f} ± {result['mc_error']:.4f} "
+        f"({result['n_permutations']:,} permutações, {sig})"
+    )
+    if result['truncated']:
+        caption += " · limite de tempo atingido"
+    st.caption(caption)
+
+
+def select_gmv_period():
+    """GMV period radio, shared by the GMV and ranking sections"""
+    return st.radio(
+        "Período de GMV",
+        ['gmv_d30', 'gmv_d90'],
+        format_func=lambda x: 'Últimos 30 dias' if x == 'gmv_d30' else 'Últimos 90 dias',
+        horizontal=True,
+        key='gmv_period'
+    )
+
+
 def main():
     # Header
     st.markdown('<p class="main-header">📊 Webinar Impact Analyzer</p>', unsafe_allow_html=True)
@@ -131,19 +207,39 @@ def main():
         
         st.markdown("**1. Base de Participantes do Webinar**")
         webinar_file = st.file_uploader(
-            "CSV/Excel com participantes",
-            type=['csv', 'xlsx', 'xls'],
+            "CSV/Excel/Parquet com participantes",
+            type=['csv', 'xlsx', 'xls'] + COLUMNAR_EXTENSIONS,
             key='webinar_file',
             help="Arquivo com store_id, data do webinar, status de participação"
         )
+        webinar_sheet = select_sheet(webinar_file, 'webinar_sheet')
         
         st.markdown("**2. Base Total de Lojas**")
         store_file = st.file_uploader(
-            "CSV/Excel com todas as lojas",
-            type=['csv', 'xlsx', 'xls'],
+            "CSV/Excel/Parquet com todas as lojas",
+            type=['csv', 'xlsx', 'xls'] + COLUMNAR_EXTENSIONS,
             key='store_file',
             help="Arquivo com store_id, GMV, status atual"
         )
+        store_sheet = select_sheet(store_file, 'store_sheet')
+        stream_store = st.checkbox(
+            "Modo streaming (bases grandes)",
+            key='stream_store',
+            help="Lê a base de lojas em blocos e guarda só agregados do grupo de controle. "
+                 "Usa menos memória; medianas, quartis, Mann-Whitney e os gráficos de distribuição "
+                 "de GMV do controle (box plot, histograma, ECDF) vêm de um sketch e ficam aproximados, "
+                 "e o teste de permutação de GMV não está disponível."
+        )
+        matched_control = st.checkbox(
+            "Controle pareado (vizinhos mais próximos)",
+            key='matched_control',
+            disabled=stream_store,
+            help="Compara cada participante com as k lojas de controle de idade mais parecida, "
+                 "em vez de todas as lojas não participantes. Indisponível no modo streaming."
+        )
+        match_k = None
+        if matched_control and not stream_store:
+            match_k = st.slider("Vizinhos por participante (k)", 1, 20, DEFAULT_MATCH_K, key='match_k')
         
         st.divider()
         
@@ -163,7 +259,7 @@ def main():
         
         | Hipótese | Métrica | Método |
         |----------|---------|--------|
-        | **H1: First Seller** | Taxa de conversão para primeira venda | Teste Chi-quadrado |
+        | **H1: First Seller** | Taxa de conversão para primeira venda | Teste Chi-quadrado (Fisher em amostras pequenas) |
         | **H2: GMV** | Comparação de GMV atual | Teste t / Mann-Whitney |
         | **H3: Status** | Evolução de status de seller | Análise de transição |
         
@@ -192,59 +288,88 @@ def main():
         """)
         return
     
-    # Load data
-    with st.spinner("Carregando dados..."):
-        webinar_df, webinar_error = load_webinar_data(webinar_file)
-        store_df, store_error = load_store_data(store_file)
+    engine = WebinarImpactEngine()
     
-    if webinar_error:
-        st.error(f"Erro ao carregar base de webinar: {webinar_error}")
+    # Load and merge data
+    try:
+        with st.spinner("Carregando dados..."):
+            dataset = engine.load(
+                webinar_file, store_file,
+                webinar_sheet=webinar_sheet,
+                store_sheet=store_sheet,
+                stream_store=stream_store,
+                match_k=match_k
+            )
+    except DataLoadError as e:
+        st.error(str(e))
         return
+    webinar_df = dataset.webinar_df
     
-    if store_error:
-        st.error(f"Erro ao carregar base de lojas: {store_error}")
-        return
+    show_load_metrics({'Base de webinar': webinar_df, 'Base de lojas': dataset.store_df})
     
-    # Merge datasets
-    with st.spinner("Processando dados..."):
-        participants_df, control_df = merge_datasets(webinar_df, store_df)
-        analysis_data = prepare_analysis_data(participants_df, control_df)
-        participants = analysis_data['participants']
-        control = analysis_data['control']
+    # Report values that could not be parsed instead of dropping them silently
+    parse_report = webinar_df.attrs.get('parse_report', {})
+    invalid_columns = {col: r for col, r in parse_report.items() if r['invalid'] > 0}
+    if invalid_columns:
+        with st.sidebar.expander("⚠️ Valores não reconhecidos na base de webinar"):
+            for col, report in invalid_columns.items():
+                st.markdown(
+                    f"**{col}**: {report['invalid']:,} de {report['rows']:,} linhas "
+                    f"(ex.: {', '.join(map(str, report['examples']))})"
+                )
+    
+    filter_options = engine.filter_options(dataset)
     
     # Sidebar filters
     with st.sidebar:
         st.divider()
         st.header("🔍 Filtros")
         
-        # Month filter
-        months = ['Todos'] + get_month_list(webinar_df)
-        selected_month = st.selectbox("Mês do Webinar", months)
-        
-        # Webinar filter
-        webinars = ['Todos'] + get_webinar_list(webinar_df)
-        selected_webinar = st.selectbox("Webinar", webinars)
-        
-        # Status filter
-        statuses = ['Todos', 'no-seller', 'struggling-seller', 'tiny-seller', 
+        # Month range filter
+        months = filter_options['months']
+        selected_months = None
+        if len(months) > 1:
+            first, last = st.select_slider("Meses do Webinar", months, value=(months[0], months[-1]))
+            month_range = months[months.index(first):months.index(last) + 1]
+            if len(month_range) < len(months):
+                selected_months = month_range
+        
+        # Multi-select filters: an empty selection means all values
+        selected_webinars = st.multiselect("Webinars", filter_options['webinars'], placeholder="Todos")
+        selected_webinar_statuses = st.multiselect(
+            "Tipo de Participação", filter_options['webinar_statuses'], placeholder="Todos"
+        )
+        statuses = ['no-seller', 'struggling-seller', 'tiny-seller', 
                     'small-seller', 'medium-seller', 'large-seller', 'top-seller']
-        selected_status = st.selectbox("Status Inicial", statuses)
-    
-    # Apply filters
-    filtered_webinar = webinar_df.copy()
-    if selected_month != 'Todos':
-        filtered_webinar = filter_by_month(filtered_webinar, selected_month)
-    if selected_webinar != 'Todos':
-        filtered_webinar = filter_by_webinar(filtered_webinar, selected_webinar)
-    
-    # Re-process with filtered data
-    if len(filtered_webinar) > 0:
-        participants_filtered, _ = merge_datasets(filtered_webinar, store_df)
-        analysis_data_filtered = prepare_analysis_data(participants_filtered, control_df)
-        participants = analysis_data_filtered['participants']
+        selected_statuses = st.multiselect("Status Inicial", statuses, placeholder="Todos")
+        selected_ages = st.multiselect("Idade da Loja", AGE_LABELS, placeholder="Todos")
+        
+        show_ci = st.checkbox(
+            "Intervalos de confiança (bootstrap)",
+            key='bootstrap_ci',
+            help="Mostra intervalos de 95% para lift, diferença de GMV e taxa de upgrade, "
+                 "com 10.000 reamostragens (ou o que couber em 5 segundos)."
+        )
+        show_permutation_tests = st.checkbox(
+            "Testes de permutação",
+            key='permutation_tests',
+            help="p-valores sem suposição de normalidade, por permutação dos rótulos "
+                 "participante/controle. Para assim que o resultado está decidido."
+        )
     
-    if selected_status != 'Todos':
-        participants = filter_by_status(participants, selected_status, 'status_at_webinar')
+    # Apply filters: webinar filters select participation rows (and so change
+    # each store's first webinar), status and age select participants
+    filters = Filters.of(
+        months=selected_months,
+        webinars=selected_webinars,
+        webinar_statuses=selected_webinar_statuses,
+        statuses=selected_statuses,
+        age_categories=selected_ages
+    )
+    selection = engine.select(dataset, filters)
+    participants = selection.participants
+    control = selection.control
+    matched = dataset.matched
     
     # Overview metrics
     st.markdown("### 📈 Visão Geral")
@@ -261,44 +386,57 @@ def main():
     with col2:
         st.metric(
             label="Grupo de Controle",
-            value=format_number(len(control)),
+            value=format_number(control.total),
             help="Lojas que não participaram de webinars"
         )
+        if matched is not None:
+            age_balance = matched.balance.get('store_age_days', {})
+            st.caption(
+                f"Pareado: {matched.k} vizinhos por participante · diferença padronizada de idade "
+                f"{age_balance.get('smd_before', 0):.2f} → {age_balance.get('smd_after', 0):.2f}"
+            )
     
     with col3:
-        webinar_count = webinar_df['webinar_name'].nunique() if 'webinar_name' in webinar_df.columns else 0
         st.metric(
             label="Webinars Analisados",
-            value=webinar_count,
+            value=dataset.webinar_count,
             help="Número de webinars diferentes"
         )
     
     with col4:
-        months_count = webinar_df['Data do Webinar (mês)'].nunique() if 'Data do Webinar (mês)' in webinar_df.columns else 0
         st.metric(
             label="Meses de Dados",
-            value=months_count,
+            value=dataset.month_count,
             help="Período analisado"
         )
     
     st.divider()
     
-    # Tabs for each hypothesis
-    tab1, tab2, tab3 = st.tabs([
-        "🎯 H1: First Seller",
-        "💰 H2: GMV",
-        "📊 H3: Evolução de Status"
-    ])
+    # One section per hypothesis. Unlike st.tabs, which runs every tab's
+    # body on each rerun, only the selected section is computed.
+    section = st.radio(
+        "Análise",
+        list(SECTIONS),
+        format_func=lambda x: SECTIONS[x],
+        horizontal=True,
+        key='section',
+        label_visibility='collapsed'
+    )
     
-    # Tab 1: First Seller Analysis
-    with tab1:
+    # Keep the widget values of the sections not drawn in this run
+    for widget_key in SECTION_WIDGETS:
+        if widget_key in st.session_state:
+            st.session_state[widget_key] = st.session_state[widget_key]
+    
+    # Section 1: First Seller Analysis
+    if section == 'h1':
         st.markdown("## Hipótese 1: Conversão para First Seller")
         st.markdown("""
         > **Pergunta:** Participantes de webinar têm maior taxa de conversão para primeira venda?
         """)
         
         with st.spinner("Analisando conversão..."):
-            h1_results = analyze_first_seller_conversion(participants, control)
+            h1_results = engine.first_seller(selection).details
         
         # Key metrics
         col1, col2, col3 = st.columns(3)
@@ -325,14 +463,20 @@ def main():
                     value=f"{lift:+.1f}%",
                     delta="vs Controle"
                 )
+                if show_ci:
+                    ci = engine.bootstrap_lift(selection)
+                    show_interval(ci['lift'], ci, '{:+.1f}%')
         
         # Statistical significance
         if h1_results.get('chi_square') and h1_results['chi_square'].get('p_value') is not None:
             chi = h1_results['chi_square']
             if chi['significant']:
-                st.success(f"✅ **Resultado estatisticamente significativo** (p-valor: {chi['p_value']:.4f})")
+                st.success(f"✅ **Resultado estatisticamente significativo** (p-valor: {chi['p_value']:.4f} · {TEST_NAMES[chi['method']]})")
             else:
-                st.warning(f"⚠️ **Resultado não é estatisticamente significativo** (p-valor: {chi['p_value']:.4f})")
+                st.warning(f"⚠️ **Resultado não é estatisticamente significativo** (p-valor: {chi['p_value']:.4f} · {TEST_NAMES[chi['method']]})")
+        
+        if show_permutation_tests:
+            show_permutation(engine.permutation_conversion(selection))
         
         st.divider()
         
@@ -358,23 +502,18 @@ def main():
         with st.expander("📋 Resumo Detalhado"):
             st.markdown(get_first_seller_summary_text(h1_results))
     
-    # Tab 2: GMV Analysis
-    with tab2:
+    # Section 2: GMV Analysis
+    if section == 'h2':
         st.markdown("## Hipótese 2: Impacto no GMV")
         st.markdown("""
         > **Pergunta:** Participantes de webinar têm GMV maior que o grupo de controle?
         """)
         
         # GMV period selector
-        gmv_period = st.radio(
-            "Período de GMV",
-            ['gmv_d30', 'gmv_d90'],
-            format_func=lambda x: 'Últimos 30 dias' if x == 'gmv_d30' else 'Últimos 90 dias',
-            horizontal=True
-        )
+        gmv_period = select_gmv_period()
         
         with st.spinner("Analisando GMV..."):
-            h2_results = analyze_gmv_comparison(participants, control, gmv_period)
+            h2_results = engine.gmv(selection, gmv_period).details
         
         # Key metrics
         col1, col2, col3 = st.columns(3)
@@ -401,6 +540,11 @@ def main():
                     value=f"{diff:+.1f}%",
                     delta="Participantes vs Controle"
                 )
+                if show_ci:
+                    with st.spinner("Calculando intervalos..."):
+                        ci = engine.bootstrap_gmv(selection, gmv_period)
+                    show_interval(ci['mean_diff_pct'], ci, '{:+.1f}%')
+                    show_interval(ci['median_diff'], ci, 'R$ {:+,.2f}', label='Dif. mediana · ')
         
         # Statistical significance
         if h2_results.get('ttest') and h2_results['ttest'].get('p_value') is not None:
@@ -410,6 +554,15 @@ def main():
             else:
                 st.warning(f"⚠️ **Resultado não é estatisticamente significativo** (p-valor: {ttest['p_value']:.4f})")
         
+        if show_permutation_tests:
+            with st.spinner("Executando permutações..."):
+                permutation = engine.permutation_gmv(selection, gmv_period)
+            if permutation.get('error'):
+                show_permutation(permutation)
+            else:
+                show_permutation(permutation['mean_diff'], 'Permutação (diferença de médias)')
+                show_permutation(permutation['rank_sum'], 'Permutação (soma de postos)')
+        
         st.divider()
         
         # Charts
@@ -420,9 +573,22 @@ def main():
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
-            fig = create_gmv_distribution_chart(participants, control, gmv_period)
+            fig = create_gmv_distribution_chart(participants, control, gmv_period, h2_results)
             st.plotly_chart(fig, use_container_width=True)
         
+        # Whole distribution, heavy tail included, binned on log-spaced edges
+        distribution = engine.gmv_distribution(selection, gmv_period)
+        if not distribution.get('error'):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fig = create_gmv_histogram_chart(distribution)
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                fig = create_gmv_ecdf_chart(distribution)
+                st.plotly_chart(fig, use_container_width=True)
+        
         # GMV by status
         if h2_results.get('participants_by_status'):
             st.markdown("### GMV por Status do Seller")
@@ -431,16 +597,29 @@ def main():
                 st.plotly_chart(fig, use_container_width=True)
         
         # Segmented analysis
-        st.markdown("### Análise por Segmento (Controlando por Status)")
-        
-        segment_results = analyze_gmv_by_segment(
-            participants, control, 'current_status', gmv_period
+        st.markdown("### Análise por Segmento")
+        
+        segment_labels = {
+            'current_status': 'Status',
+            'age_category': 'Idade da Loja',
+            ('current_status', 'age_category'): 'Status × Idade'
+        }
+        segment_col = st.radio(
+            "Controlar por",
+            list(segment_labels),
+            format_func=lambda x: segment_labels[x],
+            horizontal=True,
+            key='segment_col'
         )
         
+        segment_results = engine.gmv_by_segment(selection, segment_col, gmv_period)
+        
         if segment_results:
             segment_df = pd.DataFrame([
                 {
-                    'Status': r['segment'],
+                    segment_labels[segment_col]: (
+                        ' · '.join(map(str, r['segment'])) if isinstance(r['segment'], tuple) else r['segment']
+                    ),
                     'GMV Participantes': f"R$ {r['participants']['mean']:,.2f}",
                     'GMV Controle': f"R$ {r['control']['mean']:,.2f}",
                     'Diferença (%)': f"{r.get('mean_diff_pct', 0):+.1f}%",
@@ -451,20 +630,76 @@ def main():
             ])
             st.dataframe(segment_df, use_container_width=True, hide_index=True)
         
+        # Stratified (CEM-style) effect
+        st.markdown("### Efeito Estratificado (Idade)")
+        strata_by_month = st.checkbox("Separar estratos por mês do webinar", key='strata_by_month')
+        stratified = engine.stratified(selection, gmv_period, by_month=strata_by_month)
+        
+        if stratified.get('error'):
+            st.info(stratified['error'])
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(
+                    label="Efeito Médio nos Participantes",
+                    value=f"R$ {stratified['att']:+,.2f}",
+                    delta=f"{stratified['att_pct']:+.1f}%" if stratified['att_pct'] is not None else None,
+                    help="Diferença de GMV médio dentro de cada estrato de idade da loja, "
+                         "ponderada pelo número de participantes do estrato"
+                )
+            with col2:
+                st.metric(
+                    label="IC 95%",
+                    value=f"R$ {stratified['ci_low']:+,.0f} a {stratified['ci_high']:+,.0f}",
+                    delta=f"p-valor: {stratified['p_value']:.4f}" if stratified['p_value'] is not None else None,
+                    delta_color='off'
+                )
+            with col3:
+                st.metric(
+                    label="Participantes Pareados",
+                    value=format_number(stratified['matched_participants']),
+                    delta=f"{stratified['pruned_participants']:,} sem estrato no controle",
+                    delta_color='off'
+                )
+            
+            strata_df = pd.DataFrame([
+                {
+                    'Idade': r['age_category'],
+                    **({'Mês': r['month']} if strata_by_month else {}),
+                    'Participantes': r['participants'],
+                    'Controle': r['control'],
+                    'GMV Participantes': r['participants_mean'],
+                    'GMV Controle': r['control_mean'],
+                    'Diferença': r['diff'],
+                    'Peso (%)': r['weight'] * 100
+                }
+                for r in stratified['strata'] if r['matched']
+            ])
+            st.dataframe(
+                strata_df.style.format({
+                    'GMV Participantes': 'R$ {:,.2f}',
+                    'GMV Controle': 'R$ {:,.2f}',
+                    'Diferença': 'R$ {:+,.2f}',
+                    'Peso (%)': '{:.1f}%'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        
         # Summary
         with st.expander("📋 Resumo Detalhado"):
             st.markdown(get_gmv_summary_text(h2_results, gmv_period))
     
-    # Tab 3: Status Evolution
-    with tab3:
+    # Section 3: Status Evolution
+    if section == 'h3':
         st.markdown("## Hipótese 3: Evolução de Status")
         st.markdown("""
         > **Pergunta:** Participantes de webinar têm melhor evolução de status de seller?
         """)
         
         with st.spinner("Analisando evolução de status..."):
-            h3_results = analyze_status_evolution(participants, control)
-            sankey_data = get_sankey_data(participants)
+            h3_results = engine.status_evolution(selection).details
+            sankey_data = engine.sankey(selection)
         
         # Key metrics
         if 'participants_transitions' in h3_results:
@@ -486,6 +721,9 @@ def main():
                     value=f"{upgrade_rate:.1f}%",
                     delta=f"{trans.get('upgrade_count', 0):,} lojas"
                 )
+                if show_ci:
+                    ci = engine.bootstrap_upgrade_rate(selection)
+                    show_interval(ci['upgrade_rate'], ci, '{:.1f}%')
             
             with col3:
                 maintained_rate = trans.get('maintained_rate', 0)
@@ -507,9 +745,12 @@ def main():
         if h3_results.get('distribution_chi_square') and h3_results['distribution_chi_square'].get('p_value') is not None:
             chi = h3_results['distribution_chi_square']
             if chi['significant']:
-                st.success(f"✅ **Distribuição de status é significativamente diferente entre grupos** (p-valor: {chi['p_value']:.4f})")
+                st.success(f"✅ **Distribuição de status é significativamente diferente entre grupos** (p-valor: {chi['p_value']:.4f} · {TEST_NAMES[chi['method']]})")
             else:
-                st.info(f"ℹ️ **Distribuição de status não é significativamente diferente** (p-valor: {chi['p_value']:.4f})")
+                st.info(f"ℹ️ **Distribuição de status não é significativamente diferente** (p-valor: {chi['p_value']:.4f} · {TEST_NAMES[chi['method']]})")
+        
+        if show_permutation_tests:
+            show_permutation(engine.permutation_status(selection))
         
         st.divider()
         
@@ -545,6 +786,62 @@ def main():
         with st.expander("📋 Resumo Detalhado"):
             st.markdown(get_status_summary_text(h3_results))
     
+    # Section 4: Leaderboard
+    if section == 'leaderboard':
+        st.markdown("## Ranking de Webinars")
+        st.markdown("""
+        > **Pergunta:** Quais webinars (ou meses) trazem os melhores resultados frente ao grupo de controle?
+        """)
+        st.caption("Calculado sobre todos os participantes, sem os filtros da barra lateral.")
+        
+        group_labels = {'webinar_name': 'Webinar', 'Data do Webinar (mês)': 'Mês'}
+        group_col = st.radio(
+            "Agrupar por",
+            list(group_labels),
+            format_func=lambda x: group_labels[x],
+            horizontal=True,
+            key='leaderboard_group'
+        )
+        gmv_period = select_gmv_period()
+        
+        with st.spinner("Calculando ranking..."):
+            leaderboard = engine.leaderboard(dataset, group_col, gmv_period)
+        
+        if leaderboard:
+            fig = create_leaderboard_chart(leaderboard, 'lift')
+            if fig:
+                st.plotly_chart(fig, use_container_width=True)
+            
+            leaderboard_df = pd.DataFrame([
+                {
+                    group_labels[group_col]: r['group'],
+                    'Participantes': r['participants'],
+                    'Conversão (%)': r['conversion_rate'],
+                    'Lift (%)': r['lift'],
+                    'p-valor (χ²)': r['p_value'],
+                    'GMV Médio': r['gmv_mean'],
+                    'Dif. GMV Médio (%)': r['gmv_mean_diff_pct'],
+                    'Dif. GMV Mediano': r['gmv_median_diff'],
+                    'Upgrade (%)': r['upgrade_rate']
+                }
+                for r in leaderboard
+            ]).sort_values('Lift (%)', ascending=False)
+            st.dataframe(
+                leaderboard_df.style.format({
+                    'Conversão (%)': '{:.1f}',
+                    'Lift (%)': '{:+.1f}',
+                    'p-valor (χ²)': '{:.4f}',
+                    'GMV Médio': 'R$ {:,.2f}',
+                    'Dif. GMV Médio (%)': '{:+.1f}',
+                    'Dif. GMV Mediano': 'R$ {:+,.2f}',
+                    'Upgrade (%)': '{:.1f}'
+                }, na_rep='N/A'),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("Nenhum webinar encontrado na base de participantes")
+    
     # Footer
     st.divider()
     st.markdown("""
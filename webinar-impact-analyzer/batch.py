@@ -0,0 +1,313 @@
+"""
+Webinar Impact Analyzer - execução em lote
+Roda as três hipóteses para a base toda e para cada webinar e mês, sem o painel
+
+Uso:
+    python batch.py --webinar exports/webinars/ --store exports/lojas.parquet --out relatorios/2025-09
+"""
+import argparse
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.engine import AnalysisReport, DataLoadError, Dataset, Filters, WebinarImpactEngine
+from src.file_readers import FORMAT_BY_EXTENSION
+from src.data_processor import get_month_list, get_webinar_list
+from src.visualizations import (
+    create_conversion_comparison_chart,
+    create_gmv_comparison_chart,
+    create_status_distribution_comparison,
+    create_leaderboard_chart
+)
+
+
+SCOPE_LABELS = {'overall': 'Geral', 'webinar': 'Webinar', 'month': 'Mês'}
+
+# Flat result columns -> labels of the HTML tables
+TABLE_COLUMNS = {
+    'group': 'Grupo',
+    'participants': 'Participantes',
+    'first_seller_conversion_rate': 'Conversão (%)',
+    'first_seller_lift': 'Lift (%)',
+    'first_seller_p_value': 'p-valor H1',
+    'gmv_d30_mean_diff_pct': 'Dif. GMV D-30 (%)',
+    'gmv_d30_p_value': 'p-valor H2 (D-30)',
+    'gmv_d90_mean_diff_pct': 'Dif. GMV D-90 (%)',
+    'status_evolution_upgrade_rate': 'Upgrade (%)',
+    'status_evolution_p_value': 'p-valor H3'
+}
+
+Job = Tuple[str, str, Filters]
+
+# Per-process state of the pool workers
+_worker: Dict[str, Any] = {}
+
+
+def list_sources(paths: List[str]) -> List[str]:
+    """Expand directories into their data files, sorted by name (e.g. one per month)"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if os.path.splitext(name)[1].lower() in FORMAT_BY_EXTENSION
+            ))
+        else:
+            sources.append(path)
+    return sources
+
+
+def build_jobs(dataset: Dataset, by_webinar: bool = True, by_month: bool = True) -> List[Job]:
+    """One job for the whole base plus one per webinar and per month"""
+    jobs = [('overall', 'Todos', Filters())]
+    if by_webinar:
+        jobs += [('webinar', name, Filters.of(webinars=[name])) for name in get_webinar_list(dataset.webinar_df)]
+    if by_month:
+        jobs += [('month', month, Filters.of(months=[month])) for month in get_month_list(dataset.webinar_df)]
+    return jobs
+
+
+def _init_worker(dataset: Dataset) -> None:
+    """Give the process its engine and the prepared dataset"""
+    _worker['engine'] = WebinarImpactEngine()
+    _worker['dataset'] = dataset
+
+
+def _run_job(job: Job) -> Tuple[str, str, AnalysisReport]:
+    """Select and analyze one job's participants"""
+    scope, group, filters = job
+    engine = _worker['engine']
+    selection = engine.select(_worker['dataset'], filters)
+    return scope, group, engine.analyze(selection)
+
+
+def run_jobs(dataset: Dataset, jobs: List[Job], workers: int = 1) -> List[Tuple[str, str, AnalysisReport]]:
+    """
+    Run the jobs, across a process pool when workers > 1
+
+    Every worker receives the prepared dataset once and keeps its own
+    engine cache; results come back in job order.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        _init_worker(dataset)
+        return [_run_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dataset,)) as pool:
+        return list(pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def flatten_report(scope: str, group: str, report: AnalysisReport) -> Dict[str, Any]:
+    """One flat row per run, for Parquet and the HTML tables"""
+    summary = report.to_dict()
+    row = {
+        'scope': scope,
+        'group': group,
+        'participants': summary['participants'],
+        'control_total': summary['control_total']
+    }
+    row.update({f'first_seller_{k}': v for k, v in summary['first_seller'].items()})
+    for gmv_col, result in summary['gmv'].items():
+        row.update({f'{gmv_col}_{k}': v for k, v in result.items() if k != 'gmv_col'})
+    row.update({f'status_evolution_{k}': v for k, v in summary['status_evolution'].items()})
+    return row
+
+
+def _figure_html(fig, include_plotlyjs) -> str:
+    """Chart as an HTML fragment (empty when there is no figure)"""
+    if fig is None:
+        return ''
+    return fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs)
+
+
+def _table_html(rows: pd.DataFrame) -> str:
+    """Formatted results table of one scope"""
+    table = rows[[col for col in TABLE_COLUMNS if col in rows.columns]].rename(columns=TABLE_COLUMNS)
+    formats = {
+        label: '{:.4f}' if 'p-valor' in label else '{:,.0f}' if label == 'Participantes' else '{:+.1f}'
+        for label in table.columns if label != 'Grupo'
+    }
+    formats.update({label: '{:.1f}' for label in ('Conversão (%)', 'Upgrade (%)') if label in formats})
+    # Cells are formatted here rather than with DataFrame.style, which needs
+    # Jinja2 (only installed with Streamlit)
+    for label, fmt in formats.items():
+        table[label] = [fmt.format(value) if pd.notna(value) else 'N/A' for value in table[label]]
+    return table.to_html(index=False, border=0, na_rep='N/A')
+
+
+def write_html_report(
+    path: str,
+    results: List[Tuple[str, str, AnalysisReport]],
+    rows: pd.DataFrame,
+    inputs: Dict[str, Any]
+) -> None:
+    """Static HTML report: overall charts, then one table per scope"""
+    overall = next(report for scope, _, report in results if scope == 'overall')
+    gmv_col = 'gmv_d30' if 'gmv_d30' in overall.gmv else next(iter(overall.gmv))
+    figures = [
+        create_conversion_comparison_chart(overall.first_seller.details),
+        create_gmv_comparison_chart(overall.gmv[gmv_col].details),
+        create_status_distribution_comparison(overall.status_evolution.details)
+    ]
+    webinar_rows = rows[rows['scope'] == 'webinar']
+    if len(webinar_rows):
+        figures.append(create_leaderboard_chart([
+            {
+                'group': row['group'],
+                'lift': row['first_seller_lift'],
+                'significant': row['first_seller_significant'],
+                'participants': row['participants']
+            }
+            for row in webinar_rows.to_dict('records')
+        ]))
+
+    # plotly.js is inlined once so the report works offline
+    charts = []
+    for fig in figures:
+        charts.append(_figure_html(fig, include_plotlyjs=not any(charts)))
+
+    sections = []
+    for scope, label in SCOPE_LABELS.items():
+        scope_rows = rows[rows['scope'] == scope]
+        if len(scope_rows):
+            sections.append(f"<h2>{label}</h2>\n{_table_html(scope_rows)}")
+
+    files = ''.join(
+        f"<li>{html.escape(name)}: {html.escape(', '.join(map(os.path.basename, paths)))}</li>"
+        for name, paths in (('Webinar', inputs['webinar']), ('Lojas', inputs['store']))
+    )
+    page = f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Webinar Impact Analyzer - Relatório</title>
+<style>
+    body {{ font-family: sans-serif; margin: 2rem; color: #1e293b; }}
+    h1 {{ color: #6366f1; }}
+    table {{ border-collapse: collapse; margin-bottom: 2rem; }}
+    th, td {{ border: 1px solid #e2e8f0; padding: 0.3rem 0.6rem; text-align: right; }}
+    th {{ background-color: #f1f5f9; }}
+    .charts > div {{ display: inline-block; width: 49%; vertical-align: top; }}
+</style>
+</head>
+<body>
+<h1>📊 Webinar Impact Analyzer</h1>
+<p>Gerado em {inputs['generated_at']} · {overall.participants:,} participantes · {overall.control_total:,} lojas no grupo de controle</p>
+<ul>{files}</ul>
+<div class="charts">{''.join(f'<div>{chart}</div>' for chart in charts if chart)}</div>
+{''.join(sections)}
+</body>
+</html>
+"""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(page)
+
+
+def _json_default(value):
+    """numpy scalars from the analyses"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def write_outputs(
+    out_dir: str,
+    results: List[Tuple[str, str, AnalysisReport]],
+    inputs: Dict[str, Any]
+) -> Dict[str, str]:
+    """Write results.json, results.parquet and report.html into out_dir"""
+    os.makedirs(out_dir, exist_ok=True)
+    rows = pd.DataFrame([flatten_report(scope, group, report) for scope, group, report in results])
+    paths = {
+        'json': os.path.join(out_dir, 'results.json'),
+        'parquet': os.path.join(out_dir, 'results.parquet'),
+        'html': os.path.join(out_dir, 'report.html')
+    }
+
+    document = {
+        'inputs': inputs,
+        'runs': [
+            {'scope': scope, 'group': group, **report.to_dict()}
+            for scope, group, report in results
+        ]
+    }
+    with open(paths['json'], 'w', encoding='utf-8') as file:
+        json.dump(document, file, ensure_ascii=False, indent=2, default=_json_default)
+
+    rows.to_parquet(paths['parquet'], index=False)
+    write_html_report(paths['html'], results, rows, inputs)
+    return paths
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Roda H1, H2 e H3 para a base toda e para cada webinar e mês."
+    )
+    parser.add_argument('--webinar', nargs='+', required=True,
+                        help="Arquivos ou pastas da base de participantes (as pastas são lidas em ordem de nome)")
+    parser.add_argument('--store', nargs='+', required=True,
+                        help="Arquivos ou pastas da base de lojas (em lojas repetidas vale o último arquivo)")
+    parser.add_argument('--out', required=True, help="Pasta de saída")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processos em paralelo (padrão: número de CPUs)")
+    parser.add_argument('--match-k', type=int, default=None,
+                        help="Controle pareado com k vizinhos por participante")
+    parser.add_argument('--stream-store', action='store_true',
+                        help="Lê a base de lojas em blocos (um único arquivo de lojas)")
+    parser.add_argument('--no-webinars', action='store_true', help="Não roda por webinar")
+    parser.add_argument('--no-months', action='store_true', help="Não roda por mês")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    webinar_sources = list_sources(args.webinar)
+    store_sources = list_sources(args.store)
+    if not webinar_sources or not store_sources:
+        print("Nenhum arquivo de dados encontrado", file=sys.stderr)
+        return 2
+
+    engine = WebinarImpactEngine()
+    start = time.perf_counter()
+    try:
+        if args.stream_store:
+            if len(webinar_sources) > 1 or len(store_sources) > 1:
+                print("O modo streaming aceita um único arquivo de cada base", file=sys.stderr)
+                return 2
+            if args.match_k:
+                print("O controle pareado (--match-k) não está disponível no modo streaming", file=sys.stderr)
+                return 2
+            dataset = engine.load(webinar_sources[0], store_sources[0], stream_store=True)
+        else:
+            dataset = engine.load_many(webinar_sources, store_sources, match_k=args.match_k)
+    except DataLoadError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Dados carregados em {time.perf_counter() - start:.1f}s: "
+          f"{len(dataset.participants):,} participantes, {dataset.control.total:,} lojas de controle")
+
+    jobs = build_jobs(dataset, by_webinar=not args.no_webinars, by_month=not args.no_months)
+    start = time.perf_counter()
+    results = run_jobs(dataset, jobs, workers=args.workers)
+    print(f"{len(jobs)} análises em {time.perf_counter() - start:.1f}s")
+
+    inputs = {
+        'webinar': webinar_sources,
+        'store': store_sources,
+        'match_k': dataset.matched.k if dataset.matched is not None else None,
+        'stream_store': args.stream_store,
+        'generated_at': datetime.now().strftime('%d/%m/%Y %H:%M')
+    }
+    for name, path in write_outputs(args.out, results, inputs).items():
+        print(f"{name}: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Accumulators Module
+Mergeable one-pass summaries of GMV columns, for data read in chunks or in parallel
+"""
+import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+
+
+# KLL accuracy parameter: the rank error of a quantile is about 1.7 / k of
+# the number of values (k=2000 -> ~0.1%), using O(k) memory
+DEFAULT_SKETCH_K = 2000
+
+# Capacity ratio between consecutive KLL levels (from the KLL paper)
+_LEVEL_DECAY = 2 / 3
+_MIN_LEVEL_CAPACITY = 8
+
+
+@dataclass
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang & Liberty, 2016)
+
+    Values are kept in levels; an item at level h stands for 2**h values.
+    When a level overflows it is sorted and every other item is promoted,
+    alternating the starting offset so the compaction stays unbiased. Two
+    sketches with the same k combine with merge() with the same guarantee.
+    """
+    k: int = DEFAULT_SKETCH_K
+    levels: List[np.ndarray] = field(default_factory=list)
+    rng: np.random.Generator = field(default_factory=lambda: np.random.default_rng(0))
+
+    @property
+    def count(self) -> int:
+        return int(sum(len(level) << h for h, level in enumerate(self.levels)))
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(_MIN_LEVEL_CAPACITY, int(np.ceil(self.k * _LEVEL_DECAY ** depth)))
+
+    def _compress(self) -> None:
+        """Compact overflowing levels until every level fits its capacity"""
+        compacted = True
+        while compacted:
+            compacted = False
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) <= self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so no weight is lost
+                keep = items[:len(items) % 2]
+                promoted = items[len(keep):][self.rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                compacted = True
+
+    def update(self, values: np.ndarray) -> 'KLLSketch':
+        """Add NaN-free values"""
+        values = np.asarray(values, dtype=np.float64)
+        if not self.levels:
+            self.levels.append(np.empty(0))
+        # Feeding a large chunk at once would compact whole levels away;
+        # blocks of about one level's capacity keep every level populated
+        for start in range(0, len(values), self.k):
+            self.levels[0] = np.concatenate([self.levels[0], values[start:start + self.k]])
+            self._compress()
+        return self
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Add another sketch's items level by level"""
+        for h, items in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+        return self
+
+    def weighted_items(self):
+        """All retained items, sorted, with the number of values each stands for"""
+        items = np.concatenate(self.levels) if self.levels else np.empty(0)
+        weights = np.concatenate([
+            np.full(len(level), 1 << h, dtype=np.int64) for h, level in enumerate(self.levels)
+        ]) if self.levels else np.empty(0, dtype=np.int64)
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def _weighted(self):
+        """All retained items, sorted, with their cumulative weights"""
+        items, weights = self.weighted_items()
+        return items, np.cumsum(weights)
+
+    def quantile(self, q: float) -> float:
+        """
+        Approximate quantile (value at rank q * (count - 1))
+
+        Interpolates linearly between neighbouring ranks, so while every item
+        still has weight 1 the result equals numpy's/pandas' quantile.
+        """
+        items, cumulative = self._weighted()
+        if len(items) == 0:
+            return np.nan
+        position = (cumulative[-1] - 1) * q
+        lower = np.floor(position)
+        below, above = np.minimum(
+            np.searchsorted(cumulative, [lower, lower + 1], side='right'), len(items) - 1
+        )
+        return float(items[below] + (position - lower) * (items[above] - items[below]))
+
+    def count_below(self, values: np.ndarray) -> np.ndarray:
+        """Approximate number of recorded values strictly smaller than each value"""
+        values = np.asarray(values, dtype=np.float64)
+        below = np.zeros(len(values))
+        for h, level in enumerate(self.levels):
+            below += np.searchsorted(np.sort(level), values, side='left') * float(1 << h)
+        return below
+
+
+@dataclass
+class GMVAccumulator:
+    """
+    One-pass summary of a GMV column
+
+    Count, min, max and the Welford moments (mean, sum of squared deviations)
+    are exact; quantiles come from a KLLSketch. Zeros, the most common value,
+    are counted exactly for the Mann-Whitney tie correction. Accumulators
+    built on separate chunks or threads combine with merge().
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float = np.inf
+    max: float = -np.inf
+    zeros: int = 0
+    sketch: KLLSketch = field(default_factory=KLLSketch)
+
+    @classmethod
+    def from_values(cls, values: Union[np.ndarray, pd.Series], k: int = DEFAULT_SKETCH_K) -> 'GMVAccumulator':
+        """Accumulator over a single array of values"""
+        return cls(sketch=KLLSketch(k=k)).update(values)
+
+    def _combine(self, count: int, mean: float, m2: float) -> None:
+        """Chan et al. pairwise update of the Welford moments"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def update(self, values: Union[np.ndarray, pd.Series]) -> 'GMVAccumulator':
+        """Add a chunk of values (NaNs are skipped)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        mean = float(values.mean())
+        self._combine(len(values), mean, float(np.square(values - mean).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.zeros += int(np.count_nonzero(values == 0))
+        self.sketch.update(values)
+        return self
+
+    def merge(self, other: 'GMVAccumulator') -> 'GMVAccumulator':
+        """Combine with an accumulator built on other rows"""
+        if other.count == 0:
+            return self
+        self._combine(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def total(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (ddof=1)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile, kept inside the exact [min, max] range"""
+        if self.count == 0:
+            return np.nan
+        return float(np.clip(self.sketch.quantile(q), self.min, self.max))
+
+    def count_below(self, values: np.ndarray) -> np.ndarray:
+        return self.sketch.count_below(values)
+
+    def count_equal(self, values: np.ndarray) -> np.ndarray:
+        """Recorded values equal to each value (exact for zero, 0 otherwise)"""
+        return np.where(np.asarray(values) == 0, float(self.zeros), 0.0)
+
+    def tie_term(self) -> float:
+        """Mann-Whitney tie term (sum of t**3 - t) of the exactly known ties"""
+        zeros = float(self.zeros)
+        return zeros ** 3 - zeros
+
+    def moments(self) -> Dict[str, float]:
+        """Exact mean/std/count, enough for perform_ttest_from_stats (Welch)"""
+        return {'mean': self.mean, 'std': self.std, 'count': self.count}
+
+    def stats(self) -> Dict[str, float]:
+        """Same keys as calculate_gmv_stats (median and quartiles approximate)"""
+        if self.count == 0:
+            return {'mean': 0, 'median': 0, 'std': 0, 'count': 0}
+        return {
+            'mean': self.mean,
+            'median': self.quantile(0.5),
+            'std': self.std,
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'q25': self.quantile(0.25),
+            'q75': self.quantile(0.75)
+        }
+
+
+def combine_accumulators(accumulators: Iterable[GMVAccumulator], k: int = DEFAULT_SKETCH_K) -> GMVAccumulator:
+    """
+    Merge many accumulators at once
+
+    Same result as chained merge() calls, but the moments are pooled in one
+    vectorized step and the sketch levels are concatenated before a single
+    compaction, so combining hundreds of small accumulators stays cheap.
+    """
+    accumulators = [a for a in accumulators if a.count > 0]
+    result = GMVAccumulator(sketch=KLLSketch(k=k))
+    if not accumulators:
+        return result
+
+    counts = np.array([a.count for a in accumulators], dtype=np.float64)
+    means = np.array([a.mean for a in accumulators])
+    result.count = int(counts.sum())
+    result.mean = float(counts @ means / counts.sum())
+    result.m2 = float(sum(a.m2 for a in accumulators) + counts @ (means - result.mean) ** 2)
+    result.min = min(a.min for a in accumulators)
+    result.max = max(a.max for a in accumulators)
+    result.zeros = sum(a.zeros for a in accumulators)
+
+    depth = max(len(a.sketch.levels) for a in accumulators)
+    result.sketch.levels = [
+        np.concatenate([a.sketch.levels[h] for a in accumulators if h < len(a.sketch.levels)])
+        for h in range(depth)
+    ]
+    result.sketch._compress()
+    return result
+
+
+def accumulate_gmv(
+    chunks: Iterable[Union[np.ndarray, pd.Series]],
+    max_workers: Optional[int] = None,
+    k: int = DEFAULT_SKETCH_K
+) -> GMVAccumulator:
+    """Summarise chunks of GMV values in parallel threads and merge the partial results"""
+    result = GMVAccumulator(sketch=KLLSketch(k=k))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for partial in executor.map(lambda chunk: GMVAccumulator.from_values(chunk, k), chunks):
+            result.merge(partial)
+    return result
@@ -0,0 +1,283 @@
+"""
+Bootstrap Module
+Percentile confidence intervals for lift, GMV difference and upgrade rate
+"""
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Optional, Tuple, Union
+from src.analysis.control_baseline import ControlBaseline
+
+
+DEFAULT_RESAMPLES = 10_000
+DEFAULT_CONFIDENCE = 0.95
+# Wall-clock budget: resampling stops early (with fewer resamples) past it
+DEFAULT_MAX_SECONDS = 5.0
+BOOTSTRAP_BATCH = 500
+BOOTSTRAP_WORKERS = min(4, os.cpu_count() or 1)
+
+# Groups larger than this are resampled over equal-weight bins of sorted values
+MAX_BINS = 1024
+
+
+@dataclass
+class ResampleBins:
+    """
+    A group of values compressed for bootstrap resampling
+
+    Sorted values are split into at most MAX_BINS bins of equal weight. A
+    resample draws how many values come from each bin (multinomial counts)
+    instead of drawing every value: the mean adds the bin means plus a normal
+    term for the spread inside the bins, and the median is interpolated
+    inside the bin that holds the middle value. Groups with at most MAX_BINS
+    values get one bin per value, i.e. the exact bootstrap.
+
+    When exact_mean/exact_std are set (bins built from a sketch, whose few
+    tail items misstate the mean), resampled means are re-centred and
+    re-scaled to them.
+    """
+    size: int
+    probabilities: np.ndarray
+    means: np.ndarray
+    variances: np.ndarray
+    lows: np.ndarray
+    highs: np.ndarray
+    exact_mean: Optional[float] = None
+    exact_std: Optional[float] = None
+
+    @classmethod
+    def from_sorted(
+        cls,
+        values: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+        max_bins: int = MAX_BINS
+    ) -> 'ResampleBins':
+        """Bins over sorted values (weights: how many values each one stands for)"""
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        total = weights.sum()
+
+        n_bins = min(max_bins, len(values))
+        before = np.cumsum(weights) - weights
+        bins = np.minimum((before * n_bins / total).astype(np.int64), n_bins - 1)
+
+        counts = np.bincount(bins, weights, n_bins)
+        sums = np.bincount(bins, weights * values, n_bins)
+        squares = np.bincount(bins, weights * values ** 2, n_bins)
+        used = counts > 0
+        counts, sums, squares = counts[used], sums[used], squares[used]
+
+        means = sums / counts
+        edges = np.flatnonzero(np.diff(bins, prepend=-1))
+        return cls(
+            size=int(round(total)),
+            probabilities=counts / total,
+            means=means,
+            variances=np.maximum(squares / counts - means ** 2, 0),
+            lows=values[edges],
+            highs=values[np.append(edges[1:], len(values)) - 1]
+        )
+
+    def resample(self, rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Means and medians of n bootstrap resamples"""
+        counts = rng.multinomial(self.size, self.probabilities, size=n).astype(np.float64)
+        spread = np.sqrt(counts @ self.variances) * rng.standard_normal(n)
+        means = (counts @ self.means + spread) / self.size
+        if self.exact_mean is not None:
+            binned_mean = self.probabilities @ self.means
+            binned_std = np.sqrt(self.probabilities @ (self.variances + (self.means - binned_mean) ** 2))
+            means = self.exact_mean + (means - binned_mean) * (self.exact_std / binned_std)
+
+        cumulative = np.cumsum(counts, axis=1)
+        half = self.size / 2
+        middle = (cumulative < half).sum(axis=1)
+        rows = np.arange(n)
+        in_bin = counts[rows, middle]
+        fraction = (half - cumulative[rows, middle] + in_bin) / in_bin
+        medians = self.lows[middle] + fraction * (self.highs[middle] - self.lows[middle])
+        return means, medians
+
+
+def control_resample_bins(control: ControlBaseline, gmv_col: str) -> ResampleBins:
+    """ResampleBins for the control GMV (from the sketch when the baseline was streamed)"""
+    if control.has_values(gmv_col):
+        return ResampleBins.from_sorted(control.gmv_values(gmv_col))
+    accumulator = control.gmv_sketches[gmv_col]
+    bins = ResampleBins.from_sorted(*accumulator.sketch.weighted_items())
+    bins.exact_mean, bins.exact_std = accumulator.mean, accumulator.std
+    return bins
+
+
+def _run_batches(
+    draw: Callable[[np.random.Generator, int], np.ndarray],
+    n_resamples: int,
+    seed: int,
+    max_seconds: float,
+    workers: int
+) -> Tuple[np.ndarray, bool]:
+    """
+    Run draw(rng, n) over fixed-size batches in parallel threads
+
+    Each batch gets its own child of SeedSequence(seed), so results do not
+    depend on the number of workers. Batches still pending when max_seconds
+    runs out are cancelled (at least one batch always completes). Returns the
+    stacked draws and whether the budget cut the run short.
+    """
+    start = time.perf_counter()
+    sizes = [BOOTSTRAP_BATCH] * (n_resamples // BOOTSTRAP_BATCH)
+    if n_resamples % BOOTSTRAP_BATCH:
+        sizes.append(n_resamples % BOOTSTRAP_BATCH)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    results = []
+    truncated = False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(draw, np.random.default_rng(child), size)
+            for child, size in zip(seeds, sizes)
+        ]
+        for future in futures:
+            remaining = max_seconds - (time.perf_counter() - start)
+            try:
+                results.append(future.result(timeout=max(remaining, 0) if results else None))
+            except TimeoutError:
+                truncated = True
+                break
+        if truncated:
+            for future in futures:
+                future.cancel()
+
+    return np.concatenate(results), truncated
+
+
+def _interval(estimate: Optional[float], samples: np.ndarray, confidence: float) -> Dict[str, Any]:
+    """Percentile interval of the finite bootstrap samples around a point estimate"""
+    samples = samples[np.isfinite(samples)]
+    if estimate is None or len(samples) == 0:
+        return {'estimate': estimate, 'ci_low': None, 'ci_high': None}
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(samples, [alpha, 1 - alpha])
+    return {'estimate': estimate, 'ci_low': float(low), 'ci_high': float(high)}
+
+
+def _run_info(n_samples: int, truncated: bool, confidence: float, seed: int, start: float) -> Dict[str, Any]:
+    return {
+        'n_resamples': n_samples,
+        'truncated': truncated,
+        'confidence': confidence,
+        'seed': seed,
+        'seconds': time.perf_counter() - start
+    }
+
+
+def bootstrap_lift(
+    converted: int,
+    total: int,
+    control_sellers: int,
+    control_total: int,
+    n_resamples: int = DEFAULT_RESAMPLES,
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: int = 0,
+    max_seconds: float = DEFAULT_MAX_SECONDS,
+    workers: int = BOOTSTRAP_WORKERS
+) -> Dict[str, Any]:
+    """
+    Bootstrap interval for the H1 lift (% over the control seller rate)
+
+    Resampling a binary outcome only changes how many successes are drawn,
+    so each group is resampled with one binomial draw.
+    """
+    start = time.perf_counter()
+    if total == 0 or control_total == 0 or control_sellers == 0:
+        return {'lift': _interval(None, np.empty(0), confidence), **_run_info(0, False, confidence, seed, start)}
+
+    p_rate = converted / total
+    c_rate = control_sellers / control_total
+
+    def draw(rng, n):
+        p = rng.binomial(total, p_rate, n) / total
+        c = rng.binomial(control_total, c_rate, n) / control_total
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return ((p - c) / c * 100)[:, np.newaxis]
+
+    samples, truncated = _run_batches(draw, n_resamples, seed, max_seconds, workers)
+    return {
+        'lift': _interval((p_rate - c_rate) / c_rate * 100, samples[:, 0], confidence),
+        **_run_info(len(samples), truncated, confidence, seed, start)
+    }
+
+
+def bootstrap_upgrade_rate(
+    upgrades: int,
+    valid_transitions: int,
+    n_resamples: int = DEFAULT_RESAMPLES,
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: int = 0,
+    max_seconds: float = DEFAULT_MAX_SECONDS,
+    workers: int = BOOTSTRAP_WORKERS
+) -> Dict[str, Any]:
+    """Bootstrap interval for the H3 upgrade rate (%)"""
+    start = time.perf_counter()
+    if valid_transitions == 0:
+        return {'upgrade_rate': _interval(None, np.empty(0), confidence), **_run_info(0, False, confidence, seed, start)}
+
+    rate = upgrades / valid_transitions
+
+    def draw(rng, n):
+        return (rng.binomial(valid_transitions, rate, n) / valid_transitions * 100)[:, np.newaxis]
+
+    samples, truncated = _run_batches(draw, n_resamples, seed, max_seconds, workers)
+    return {
+        'upgrade_rate': _interval(rate * 100, samples[:, 0], confidence),
+        **_run_info(len(samples), truncated, confidence, seed, start)
+    }
+
+
+def bootstrap_gmv_difference(
+    participants_values: Union[pd.Series, np.ndarray],
+    control: ControlBaseline,
+    gmv_col: str = 'gmv_d30',
+    n_resamples: int = DEFAULT_RESAMPLES,
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: int = 0,
+    max_seconds: float = DEFAULT_MAX_SECONDS,
+    workers: int = BOOTSTRAP_WORKERS
+) -> Dict[str, Any]:
+    """
+    Bootstrap intervals for the H2 mean difference (%) and median difference
+
+    Both groups are resampled independently over their ResampleBins; the
+    point estimates are the ones analyze_gmv_comparison reports.
+    """
+    start = time.perf_counter()
+    p_sorted = np.sort(pd.Series(participants_values).dropna().to_numpy(dtype=np.float64))
+    c_stats = control.gmv_stats.get(gmv_col, {})
+    if len(p_sorted) == 0 or c_stats.get('count', 0) == 0:
+        empty = _interval(None, np.empty(0), confidence)
+        return {'mean_diff_pct': empty, 'median_diff': empty, **_run_info(0, False, confidence, seed, start)}
+
+    p_bins = ResampleBins.from_sorted(p_sorted)
+    c_bins = control_resample_bins(control, gmv_col)
+
+    def draw(rng, n):
+        p_means, p_medians = p_bins.resample(rng, n)
+        c_means, c_medians = c_bins.resample(rng, n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_diff_pct = (p_means - c_means) / c_means * 100
+        return np.column_stack([mean_diff_pct, p_medians - c_medians])
+
+    samples, truncated = _run_batches(draw, n_resamples, seed, max_seconds, workers)
+
+    p_mean = p_sorted.mean()
+    mean_diff_pct = (
+        (p_mean - c_stats['mean']) / c_stats['mean'] * 100
+        if c_stats['mean'] > 0 else None
+    )
+    return {
+        'mean_diff_pct': _interval(mean_diff_pct, samples[:, 0], confidence),
+        'median_diff': _interval(np.median(p_sorted) - c_stats['median'], samples[:, 1], confidence),
+        **_run_info(len(samples), truncated, confidence, seed, start)
+    }
@@ -0,0 +1,115 @@
+"""
+Contingency Module
+Chi-square tests for many 2xK tables in one vectorized pass
+"""
+import numpy as np
+from scipy import stats
+from typing import Dict, Any
+
+
+# 2x2 tables with an expected count below this use Fisher's exact test
+FISHER_MIN_EXPECTED = 5.0
+# Display name of each 'method' a result can report
+TEST_NAMES = {'chi2': 'Teste Chi-quadrado', 'fisher': 'Teste Exato de Fisher'}
+
+
+def stack_2x2(a, b, c, d) -> np.ndarray:
+    """Stack 2x2 tables [[a, b], [c, d]] (arrays or scalars, broadcast) into shape (N, 2, 2)"""
+    a, b, c, d = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=np.float64)) for x in (a, b, c, d)))
+    return np.stack([np.stack([a, b], axis=-1), np.stack([c, d], axis=-1)], axis=1)
+
+
+def chi2_contingency_batch(
+    tables: np.ndarray,
+    correction: bool = True,
+    fisher_min_expected: float = FISHER_MIN_EXPECTED
+) -> Dict[str, np.ndarray]:
+    """
+    Test a stack of 2xK contingency tables (shape (N, 2, K), or a single (2, K))
+
+    Columns that are empty in a table are ignored, so tables with different
+    numbers of categories can share K. Per table, the returned arrays hold:
+
+    - statistic / chi2_p_value: what scipy's chi2_contingency reports (Yates'
+      correction when the table has one degree of freedom and correction=True)
+    - statistic_uncorrected / p_value_uncorrected: plain Pearson chi-square
+    - dof, expected (N, 2, K) and min_expected
+    - fisher_p_value: Fisher's exact test for 2x2 tables whose smallest
+      expected count is below fisher_min_expected (NaN otherwise)
+    - p_value / method: Fisher where it applies, chi-square otherwise
+    - valid: False when a row is empty or fewer than two columns are used
+      (every statistic is NaN then)
+    """
+    observed = np.asarray(tables, dtype=np.float64)
+    if observed.ndim == 2:
+        observed = observed[np.newaxis]
+
+    row_totals = observed.sum(axis=2, keepdims=True)
+    col_totals = observed.sum(axis=1, keepdims=True)
+    total = observed.sum(axis=(1, 2), keepdims=True)
+    used = col_totals[:, 0, :] > 0
+
+    dof = (used.sum(axis=1) - 1) * (observed.shape[1] - 1)
+    valid = (row_totals[:, :, 0] > 0).all(axis=1) & (dof >= 1)
+    dof = np.where(valid, dof, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = row_totals * col_totals / total
+        cells = expected > 0
+        uncorrected = np.where(cells, np.square(observed - expected) / expected, 0).sum(axis=(1, 2))
+
+        # Yates: move each cell up to 0.5 towards its expected count
+        diff = expected - observed
+        adjusted = observed + np.sign(diff) * np.minimum(0.5, np.abs(diff))
+        yates = np.where(cells, np.square(adjusted - expected) / expected, 0).sum(axis=(1, 2))
+
+    statistic = np.where(correction & (dof == 1), yates, uncorrected)
+    statistic = np.where(valid, statistic, np.nan)
+    uncorrected = np.where(valid, uncorrected, np.nan)
+    chi2_p_value = np.where(valid, stats.chi2.sf(statistic, np.maximum(dof, 1)), np.nan)
+    p_value_uncorrected = np.where(valid, stats.chi2.sf(uncorrected, np.maximum(dof, 1)), np.nan)
+
+    min_expected = np.where(used[:, np.newaxis, :], expected, np.inf).min(axis=(1, 2))
+    min_expected = np.where(valid, min_expected, np.nan)
+
+    # Exact test only where the chi-square approximation is unreliable
+    fisher_p_value = np.full(len(observed), np.nan)
+    small = np.flatnonzero(valid & (dof == 1) & (min_expected < fisher_min_expected))
+    for i in small:
+        _, fisher_p_value[i] = stats.fisher_exact(observed[i][:, used[i]])
+
+    use_fisher = ~np.isnan(fisher_p_value)
+    return {
+        'statistic': statistic,
+        'chi2_p_value': chi2_p_value,
+        'statistic_uncorrected': uncorrected,
+        'p_value_uncorrected': p_value_uncorrected,
+        'dof': dof,
+        'expected': expected,
+        'min_expected': min_expected,
+        'fisher_p_value': fisher_p_value,
+        'p_value': np.where(use_fisher, fisher_p_value, chi2_p_value),
+        'method': np.where(use_fisher, 'fisher', 'chi2'),
+        'valid': valid
+    }
+
+
+def contingency_result(batch: Dict[str, np.ndarray], i: int = 0) -> Dict[str, Any]:
+    """One table's result from chi2_contingency_batch, in the analyses' test dict format"""
+    if not batch['valid'][i]:
+        return {
+            'statistic': None,
+            'p_value': None,
+            'significant': None,
+            'error': 'Dados insuficientes para teste estatístico'
+        }
+
+    p_value = float(batch['p_value'][i])
+    return {
+        'statistic': float(batch['statistic'][i]),
+        'p_value': p_value,
+        'degrees_of_freedom': int(batch['dof'][i]),
+        'significant': p_value < 0.05,
+        'method': str(batch['method'][i]),
+        'min_expected': float(batch['min_expected'][i])
+    }
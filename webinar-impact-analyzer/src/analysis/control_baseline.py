@@ -0,0 +1,299 @@
+"""
+Control Baseline Module
+Precomputes every control-group artifact the hypotheses need, once per store file
+"""
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple, Union
+from src.data_processor import NO_SELLER_STATUSES
+from src.analysis.accumulators import GMVAccumulator
+
+
+GMV_COLUMNS = ['gmv_d30', 'gmv_d90']
+# A tuple segments by the combination of its columns (status x age)
+SEGMENT_COLUMNS = ['current_status', 'age_category', ('current_status', 'age_category')]
+
+Segment = Union[str, Tuple[str, ...]]
+
+
+def _sorted_quantile(sorted_values: np.ndarray, q: float) -> float:
+    """Linear-interpolated quantile of an already sorted array"""
+    position = (len(sorted_values) - 1) * q
+    lower = int(np.floor(position))
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return float(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction)
+
+
+def gmv_stats_from_sorted(sorted_values: np.ndarray) -> Dict[str, float]:
+    """Same statistics as calculate_gmv_stats, read off a sorted array"""
+    if len(sorted_values) == 0:
+        return {'mean': 0, 'median': 0, 'std': 0, 'count': 0}
+
+    total = float(sorted_values.sum())
+    return {
+        'mean': total / len(sorted_values),
+        'median': _sorted_quantile(sorted_values, 0.5),
+        'std': float(sorted_values.std(ddof=1)) if len(sorted_values) > 1 else np.nan,
+        'count': len(sorted_values),
+        'sum': total,
+        'min': float(sorted_values[0]),
+        'max': float(sorted_values[-1]),
+        'q25': _sorted_quantile(sorted_values, 0.25),
+        'q75': _sorted_quantile(sorted_values, 0.75)
+    }
+
+
+def segment_columns(segment: Segment) -> List[str]:
+    """Columns of a segment key (a column name or a tuple of names)"""
+    return [segment] if isinstance(segment, str) else list(segment)
+
+
+def segment_groupby_key(segment: Segment) -> Union[str, List[str]]:
+    """groupby key for a segment (a list yields tuple group keys)"""
+    return segment if isinstance(segment, str) else list(segment)
+
+
+def has_segment(df: pd.DataFrame, segment: Segment) -> bool:
+    return all(col in df.columns for col in segment_columns(segment))
+
+
+def segment_gmv_table(df: pd.DataFrame, segment: Segment, gmv_col: str) -> pd.DataFrame:
+    """
+    calculate_gmv_stats for every segment in one grouped pass
+
+    Returns one row per segment value (a tuple of values when segment names
+    several columns) with the calculate_gmv_stats keys as columns.
+    """
+    cols = segment_columns(segment)
+    valid = df[cols + [gmv_col]].dropna()
+    if len(valid) == 0:
+        return pd.DataFrame()
+
+    grouped = valid.groupby(segment_groupby_key(segment), observed=True)[gmv_col]
+    table = grouped.agg(['mean', 'median', 'std', 'count', 'sum', 'min', 'max'])
+    table['q25'] = grouped.quantile(0.25)
+    table['q75'] = grouped.quantile(0.75)
+    return table
+
+
+def _group_summary(df: pd.DataFrame, group_col: str, gmv_col: str, label: str) -> List[Dict[str, Any]]:
+    """Mean/median/count of GMV per group, in the analyze_gmv_comparison record format"""
+    summary = df.groupby(group_col, observed=True)[gmv_col].agg(['mean', 'median', 'count']).reset_index()
+    summary.columns = [label, 'mean_gmv', 'median_gmv', 'count']
+    return summary.to_dict('records')
+
+
+@dataclass
+class ControlBaseline:
+    """
+    Control-group aggregates that do not depend on the sidebar filters
+
+    Built once per store file so filter changes only pay for the participant
+    subset. Sorted GMV arrays are kept for rank-based tests and charts; a
+    baseline streamed in chunks keeps GMVAccumulator sketches instead.
+    """
+    total: int
+    sellers: int
+    status_distribution: Dict[str, int]
+    sorted_gmv: Dict[str, np.ndarray] = field(default_factory=dict)
+    gmv_ties: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = field(default_factory=dict)
+    gmv_stats: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    by_status: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    by_age: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    segment_stats: Dict[Segment, Dict[str, Dict[Any, Dict[str, float]]]] = field(default_factory=dict)
+    gmv_sketches: Dict[str, GMVAccumulator] = field(default_factory=dict)
+
+    @property
+    def seller_rate(self) -> float:
+        """Share of control stores that are sellers today (%)"""
+        if self.total == 0:
+            return 0.0
+        return self.sellers / self.total * 100
+
+    def gmv_values(self, gmv_col: str) -> np.ndarray:
+        """Sorted, NaN-free GMV values for the control group"""
+        return self.sorted_gmv[gmv_col]
+
+    def has_values(self, gmv_col: str) -> bool:
+        """Whether the individual control values are kept (False when streamed)"""
+        return gmv_col in self.sorted_gmv
+
+    def gmv_quantile(self, gmv_col: str, q: float) -> float:
+        """Quantile of the control GMV (from the sketch when streamed)"""
+        if self.has_values(gmv_col):
+            return _sorted_quantile(self.sorted_gmv[gmv_col], q)
+        return self.gmv_sketches[gmv_col].quantile(q)
+
+    def gmv_points(self, gmv_col: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Sorted control GMV values, or the sketch items and their weights when streamed"""
+        if self.has_values(gmv_col):
+            return self.sorted_gmv[gmv_col], None
+        return self.gmv_sketches[gmv_col].sketch.weighted_items()
+
+
+def build_control_baseline(
+    control_df: pd.DataFrame,
+    gmv_cols: List[str] = GMV_COLUMNS,
+    segment_cols: List[Segment] = SEGMENT_COLUMNS
+) -> ControlBaseline:
+    """Scan the control group once and keep every aggregate the analyses use"""
+    is_seller = ~control_df['current_status'].isin(NO_SELLER_STATUSES)
+
+    status_counts = control_df['current_status'].value_counts()
+    baseline = ControlBaseline(
+        total=len(control_df),
+        sellers=int(is_seller.sum()),
+        status_distribution=status_counts[status_counts > 0].to_dict()
+    )
+
+    for gmv_col in gmv_cols:
+        if gmv_col not in control_df.columns:
+            continue
+
+        values = np.sort(control_df[gmv_col].dropna().to_numpy(dtype=np.float64))
+        baseline.sorted_gmv[gmv_col] = values
+        baseline.gmv_stats[gmv_col] = gmv_stats_from_sorted(values)
+
+        # Tie structure for the Mann-Whitney variance correction
+        unique_values, counts = np.unique(values, return_counts=True)
+        counts = counts.astype(np.float64)
+        baseline.gmv_ties[gmv_col] = (unique_values, counts, float((counts ** 3 - counts).sum()))
+
+        baseline.by_status[gmv_col] = _group_summary(control_df, 'current_status', gmv_col, 'status')
+        if 'age_category' in control_df.columns:
+            baseline.by_age[gmv_col] = _group_summary(control_df, 'age_category', gmv_col, 'age_category')
+
+        for segment_col in segment_cols:
+            if has_segment(control_df, segment_col):
+                baseline.segment_stats.setdefault(segment_col, {})[gmv_col] = (
+                    segment_gmv_table(control_df, segment_col, gmv_col).to_dict('index')
+                )
+
+    return baseline
+
+
+def _ordered_keys(keys, categories) -> List[Any]:
+    """Group keys in category order (unknown labels last, sorted)"""
+    rank = {value: i for i, value in enumerate(categories)}
+    return sorted(keys, key=lambda k: (rank.get(k, len(rank)), str(k)))
+
+
+class ControlBaselineBuilder:
+    """
+    Build a ControlBaseline from control-group chunks
+
+    Only counts and GMVAccumulators are kept between chunks, so memory does
+    not grow with the store base. Means, standard deviations, counts, sums,
+    min and max are exact; medians and quartiles come from the sketches.
+    Builders fed with different chunks can be combined with merge().
+    """
+
+    def __init__(
+        self,
+        gmv_cols: List[str] = GMV_COLUMNS,
+        segment_cols: List[Segment] = SEGMENT_COLUMNS
+    ):
+        self.gmv_cols = list(gmv_cols)
+        self.segment_cols = list(segment_cols)
+        self.total = 0
+        self.sellers = 0
+        self.status_counts: Dict[str, int] = {}
+        self.category_order: Dict[str, List[Any]] = {}
+        self.gmv: Dict[str, GMVAccumulator] = {}
+        # segment column -> gmv column -> segment value -> accumulator
+        self.segments: Dict[Segment, Dict[str, Dict[Any, GMVAccumulator]]] = {}
+
+    def update(self, control_df: pd.DataFrame) -> 'ControlBaselineBuilder':
+        """Add one chunk of control stores (age_category already assigned)"""
+        self.total += len(control_df)
+        self.sellers += int((~control_df['current_status'].isin(NO_SELLER_STATUSES)).sum())
+        for status, count in control_df['current_status'].value_counts().items():
+            if count > 0:
+                self.status_counts[status] = self.status_counts.get(status, 0) + int(count)
+
+        for segment_col in self.segment_cols:
+            if isinstance(segment_col, str) and segment_col in control_df.columns \
+                    and segment_col not in self.category_order:
+                dtype = control_df[segment_col].dtype
+                if isinstance(dtype, pd.CategoricalDtype):
+                    self.category_order[segment_col] = list(dtype.categories)
+
+        for gmv_col in self.gmv_cols:
+            if gmv_col not in control_df.columns:
+                continue
+            self.gmv.setdefault(gmv_col, GMVAccumulator()).update(control_df[gmv_col])
+
+            for segment_col in self.segment_cols:
+                if not has_segment(control_df, segment_col):
+                    continue
+                groups = self.segments.setdefault(segment_col, {}).setdefault(gmv_col, {})
+                grouped = control_df.groupby(segment_groupby_key(segment_col), observed=True)[gmv_col]
+                for value, values in grouped:
+                    groups.setdefault(value, GMVAccumulator()).update(values)
+        return self
+
+    def merge(self, other: 'ControlBaselineBuilder') -> 'ControlBaselineBuilder':
+        """Combine with a builder that saw other chunks"""
+        self.total += other.total
+        self.sellers += other.sellers
+        for status, count in other.status_counts.items():
+            self.status_counts[status] = self.status_counts.get(status, 0) + count
+        for segment_col, order in other.category_order.items():
+            self.category_order.setdefault(segment_col, order)
+        for gmv_col, accumulator in other.gmv.items():
+            self.gmv.setdefault(gmv_col, GMVAccumulator()).merge(accumulator)
+        for segment_col, by_gmv in other.segments.items():
+            for gmv_col, groups in by_gmv.items():
+                mine = self.segments.setdefault(segment_col, {}).setdefault(gmv_col, {})
+                for value, accumulator in groups.items():
+                    mine.setdefault(value, GMVAccumulator()).merge(accumulator)
+        return self
+
+    def _summary(self, segment_col: str, gmv_col: str, label: str) -> List[Dict[str, Any]]:
+        """_group_summary records from the segment accumulators"""
+        groups = self.segments.get(segment_col, {}).get(gmv_col, {})
+        return [
+            {
+                label: value,
+                'mean_gmv': groups[value].mean,
+                'median_gmv': groups[value].quantile(0.5),
+                'count': groups[value].count
+            }
+            for value in _ordered_keys(groups, self.category_order.get(segment_col, []))
+        ]
+
+    def build(self) -> ControlBaseline:
+        """Freeze the accumulated chunks into a ControlBaseline"""
+        status_order = self.category_order.get('current_status', [])
+        baseline = ControlBaseline(
+            total=self.total,
+            sellers=self.sellers,
+            status_distribution={
+                status: self.status_counts[status]
+                for status in _ordered_keys(self.status_counts, status_order)
+            }
+        )
+
+        for gmv_col, accumulator in self.gmv.items():
+            baseline.gmv_sketches[gmv_col] = accumulator
+            baseline.gmv_stats[gmv_col] = accumulator.stats()
+            baseline.by_status[gmv_col] = self._summary('current_status', gmv_col, 'status')
+            if gmv_col in self.segments.get('age_category', {}):
+                baseline.by_age[gmv_col] = self._summary('age_category', gmv_col, 'age_category')
+
+            for segment_col, by_gmv in self.segments.items():
+                if gmv_col in by_gmv:
+                    baseline.segment_stats.setdefault(segment_col, {})[gmv_col] = {
+                        value: accumulator.stats() for value, accumulator in by_gmv[gmv_col].items()
+                    }
+
+        return baseline
+
+
+def as_control_baseline(control: Union[pd.DataFrame, ControlBaseline]) -> ControlBaseline:
+    """Accept either a raw control DataFrame or a prebuilt baseline"""
+    if isinstance(control, ControlBaseline):
+        return control
+    return build_control_baseline(control)
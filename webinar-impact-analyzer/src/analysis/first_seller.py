@@ -4,8 +4,9 @@ Hypothesis 1: Webinar participation increases conversion to first sale
 """
 import pandas as pd
 import numpy as np
-from scipy import stats
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Union
+from src.analysis.control_baseline import ControlBaseline, as_control_baseline
+from src.analysis.contingency import chi2_contingency_batch, contingency_result, stack_2x2
 
 
 def calculate_conversion_rate(df: pd.DataFrame, converted_col: str = 'had_first_sale_after') -> float:
@@ -15,20 +16,44 @@ def calculate_conversion_rate(df: pd.DataFrame, converted_col: str = 'had_first_
     return df[converted_col].sum() / len(df) * 100
 
 
+def _add_significance_vs_control(breakdown: pd.DataFrame, control: ControlBaseline) -> pd.DataFrame:
+    """
+    p-value/significant columns comparing each breakdown row with the control
+
+    Every row's 2x2 table (converted / not converted vs control sellers /
+    non-sellers) is tested in a single chi2_contingency_batch call.
+    """
+    converted = breakdown['converted'].to_numpy(dtype=np.float64)
+    tables = stack_2x2(
+        converted, breakdown['total'].to_numpy(dtype=np.float64) - converted,
+        control.sellers, control.total - control.sellers
+    )
+    
+    batch = chi2_contingency_batch(tables)
+    breakdown['p_value'] = batch['p_value']
+    breakdown['significant'] = np.where(batch['valid'], batch['p_value'] < 0.05, None)
+    breakdown['test'] = batch['method']
+    return breakdown
+
+
 def analyze_first_seller_conversion(
     participants_df: pd.DataFrame,
-    control_df: pd.DataFrame
+    control: Union[pd.DataFrame, ControlBaseline]
 ) -> Dict[str, Any]:
     """
     Analyze conversion to first seller between participants and control group
     
+    The control side is read from a ControlBaseline (a raw control DataFrame
+    is also accepted and summarised on the fly).
+    
     Returns:
         Dictionary with analysis results including:
         - conversion rates
-        - chi-square test results
-        - breakdown by segments
+        - chi-square test results (Fisher's exact test for small samples)
+        - breakdown by segments, each tested against the control
     """
     results = {}
+    control = as_control_baseline(control)
     
     # Filter to only stores that were no-seller at start
     # For participants: use status_at_webinar
@@ -39,16 +64,8 @@ def analyze_first_seller_conversion(
     # For control: we'll assume stores with current_status = no-seller never converted
     # and those with other status converted at some point
     # This is a simplification - ideally we'd have the same baseline
-    control_no_seller = control_df[
-        control_df['current_status'].isin(['', 'no-seller'])
-    ].copy()
-    
-    # For a fair comparison, we need to estimate which control stores 
-    # would have been no-seller at the same time period
-    # Since we don't have historical data, we'll use all control stores
-    # and mark those who are sellers as "converted"
-    control_df_analysis = control_df.copy()
-    control_df_analysis['had_first_sale_after'] = ~control_df_analysis['current_status'].isin(['', 'no-seller'])
+    # Since we don't have historical data, the baseline counts every control
+    # store that is a seller today as "converted"
     
     # Basic metrics
     results['participants'] = {
@@ -59,9 +76,9 @@ def analyze_first_seller_conversion(
     }
     
     results['control'] = {
-        'total': len(control_df),
-        'sellers': control_df_analysis['had_first_sale_after'].sum(),
-        'seller_rate': calculate_conversion_rate(control_df_analysis, 'had_first_sale_after')
+        'total': control.total,
+        'sellers': control.sellers,
+        'seller_rate': control.seller_rate
     }
     
     # Chi-square test
@@ -77,26 +94,13 @@ def analyze_first_seller_conversion(
     
     contingency_table = np.array([[a, b], [c, d]])
     
-    if a + b > 0 and c + d > 0 and a + c > 0 and b + d > 0:
-        chi2, p_value, dof, expected = stats.chi2_contingency(contingency_table)
-        results['chi_square'] = {
-            'statistic': chi2,
-            'p_value': p_value,
-            'degrees_of_freedom': dof,
-            'significant': p_value < 0.05,
-            'contingency_table': contingency_table.tolist()
-        }
-    else:
-        results['chi_square'] = {
-            'statistic': None,
-            'p_value': None,
-            'significant': None,
-            'error': 'Dados insuficientes para teste estatístico'
-        }
+    results['chi_square'] = contingency_result(chi2_contingency_batch(contingency_table))
+    if results['chi_square']['p_value'] is not None:
+        results['chi_square']['contingency_table'] = contingency_table.tolist()
     
     # Breakdown by webinar month
     if 'first_webinar_month' in participants_df.columns:
-        monthly_conversion = participants_df.groupby('first_webinar_month').agg({
+        monthly_conversion = participants_df.groupby('first_webinar_month', observed=True).agg({
             'store_id': 'count',
             'had_first_sale_after': 'sum'
         }).reset_index()
@@ -104,11 +108,12 @@ def analyze_first_seller_conversion(
         monthly_conversion['conversion_rate'] = (
             monthly_conversion['converted'] / monthly_conversion['total'] * 100
         ).round(2)
+        monthly_conversion = _add_significance_vs_control(monthly_conversion, control)
         results['by_month'] = monthly_conversion.to_dict('records')
     
     # Breakdown by store age
     if 'age_category' in participants_df.columns:
-        age_conversion = participants_df.groupby('age_category').agg({
+        age_conversion = participants_df.groupby('age_category', observed=True).agg({
             'store_id': 'count',
             'had_first_sale_after': 'sum'
         }).reset_index()
@@ -116,6 +121,7 @@ def analyze_first_seller_conversion(
         age_conversion['conversion_rate'] = (
             age_conversion['converted'] / age_conversion['total'] * 100
         ).round(2)
+        age_conversion = _add_significance_vs_control(age_conversion, control)
         results['by_age'] = age_conversion.to_dict('records')
     
     # Lift calculation
@@ -153,8 +159,16 @@ def get_first_seller_summary_text(results: Dict[str, Any]) -> str:
     if results.get('chi_square') and results['chi_square'].get('p_value') is not None:
         p = results['chi_square']['p_value']
         sig = "estatisticamente significativa" if p < 0.05 else "não é estatisticamente significativa"
-        summary.append(f"\n**Teste Chi-quadrado:**")
+        if results['chi_square'].get('method') == 'fisher':
+            summary.append(f"\n**Teste Exato de Fisher** (amostra pequena):")
+        else:
+            summary.append(f"\n**Teste Chi-quadrado:**")
         summary.append(f"- p-valor: {p:.4f}")
         summary.append(f"- A diferença {sig} (α = 0.05)")
     
+    by_month = [m for m in results.get('by_month', []) if m.get('significant')]
+    if by_month:
+        months = ", ".join(str(m['month']) for m in by_month)
+        summary.append(f"- Meses com diferença significativa vs controle: {months}")
+    
     return "\n".join(summary)
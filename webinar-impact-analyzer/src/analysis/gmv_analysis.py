@@ -6,7 +6,16 @@ Hypothesis 2: Webinar participants have higher GMV than control group
 import pandas as pd
 import numpy as np
 from scipy import stats
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
+from src.analysis.control_baseline import (
+    ControlBaseline, Segment, as_control_baseline, segment_gmv_table
+)
+
+
+# Outlier points drawn per box, so chart payloads do not grow with the data
+BOX_MAX_OUTLIERS = 200
+# Log-spaced bins of the distribution view
+DISTRIBUTION_BINS = 40
 
 
 def calculate_gmv_stats(df: pd.DataFrame, gmv_col: str = 'gmv_d30') -> Dict[str, float]:
@@ -28,6 +37,113 @@ def calculate_gmv_stats(df: pd.DataFrame, gmv_col: str = 'gmv_d30') -> Dict[str,
     }
 
 
+def gmv_box_summary(
+    gmv_stats: Dict[str, float],
+    points: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+    cap: float = np.inf,
+    max_outliers: int = BOX_MAX_OUTLIERS,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Box plot summary of a GMV group, of the same size whatever the group size
+    
+    Quartiles, median and mean are the calculate_gmv_stats ones. points are
+    the group's sorted values (or sketch items, with the number of values
+    each stands for in weights); whiskers end at the most extreme points
+    within 1.5 IQR of the quartiles and at most cap, and the points beyond
+    them (up to cap) are sampled down to max_outliers.
+    """
+    q1, q3 = gmv_stats['q25'], gmv_stats['q75']
+    iqr = q3 - q1
+    points = np.asarray(points, dtype=np.float64)
+    weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=np.float64)
+    kept = points <= cap
+    points, weights = points[kept], weights[kept]
+    
+    inside = (points >= q1 - 1.5 * iqr) & (points <= q3 + 1.5 * iqr)
+    outliers, outlier_weights = points[~inside], weights[~inside]
+    if len(outliers) > max_outliers:
+        chosen = np.random.default_rng(seed).choice(
+            len(outliers), max_outliers, replace=False, p=outlier_weights / outlier_weights.sum()
+        )
+        outliers = outliers[np.sort(chosen)]
+    
+    return {
+        'q1': q1,
+        'median': gmv_stats['median'],
+        'q3': q3,
+        'mean': gmv_stats['mean'],
+        'lowerfence': points[inside].min() if inside.any() else q1,
+        'upperfence': points[inside].max() if inside.any() else q3,
+        'outliers': outliers,
+        'outlier_count': int(round(outlier_weights.sum()))
+    }
+
+
+def gmv_distribution(
+    points: np.ndarray,
+    edges: np.ndarray,
+    weights: Optional[np.ndarray] = None
+) -> Dict[str, Any]:
+    """
+    Histogram and ECDF of a GMV group over the given bin edges
+    
+    points are the group's sorted values (weights as in gmv_box_summary).
+    Values <= 0, which a log axis cannot show, are reported apart as
+    zero_share. Shares and the ECDF (evaluated at every edge with
+    searchsorted) are percentages of the group.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=np.float64)
+    total = weights.sum()
+    if total == 0:
+        return {'count': 0}
+    
+    counts, _ = np.histogram(points, edges, weights=weights)
+    cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+    return {
+        'count': int(round(total)),
+        'shares': counts / total * 100,
+        'zero_share': cumulative[np.searchsorted(points, 0, side='right')] / total * 100,
+        'ecdf': cumulative[np.searchsorted(points, edges, side='right')] / total * 100
+    }
+
+
+def compare_gmv_distributions(
+    participants_df: pd.DataFrame,
+    control: Union[pd.DataFrame, ControlBaseline],
+    gmv_col: str = 'gmv_d30',
+    n_bins: int = DISTRIBUTION_BINS
+) -> Dict[str, Any]:
+    """
+    Log-binned histograms and ECDFs of participants and control on shared bins
+    
+    Edges are log-spaced from the smallest positive value to the largest
+    value of either group. The control side is binned from its sorted values
+    or, for a streamed baseline, from the sketch items; only the bin counts
+    need to reach the browser.
+    """
+    control = as_control_baseline(control)
+    groups = {
+        'participants': (np.sort(participants_df[gmv_col].dropna().to_numpy(dtype=np.float64)), None),
+        'control': control.gmv_points(gmv_col)
+    }
+    
+    positive = [points[points > 0] for points, _ in groups.values()]
+    positive = [points for points in positive if len(points) > 0]
+    if not positive:
+        return {'error': 'Sem valores de GMV positivos'}
+    low = min(points[0] for points in positive)
+    high = max(max(points[-1] for points in positive), low * 10)
+    edges = np.geomspace(low, high, n_bins + 1)
+    
+    results = {'edges': edges}
+    for name, (points, weights) in groups.items():
+        results[name] = gmv_distribution(points, edges, weights)
+    return results
+
+
 def perform_ttest(
     participants_values: pd.Series,
     control_values: pd.Series
@@ -57,6 +173,58 @@ def perform_ttest(
     }
 
 
+def perform_ttest_from_stats(
+    participants_stats: Dict[str, float],
+    control_stats: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    Welch's t-test from two calculate_gmv_stats results (same result as perform_ttest)
+    
+    Only mean, std and count are read, so GMVAccumulator.moments() merged
+    from chunks or parallel workers can be passed as well.
+    """
+    if participants_stats['count'] < 2 or control_stats['count'] < 2:
+        return {
+            'statistic': None,
+            'p_value': None,
+            'significant': None,
+            'error': 'Dados insuficientes para teste t'
+        }
+    
+    t_stat, p_value = stats.ttest_ind_from_stats(
+        participants_stats['mean'], participants_stats['std'], participants_stats['count'],
+        control_stats['mean'], control_stats['std'], control_stats['count'],
+        equal_var=False
+    )
+    
+    return {
+        'statistic': t_stat,
+        'p_value': p_value,
+        'significant': p_value < 0.05,
+        'participants_n': participants_stats['count'],
+        'control_n': control_stats['count']
+    }
+
+
+def perform_ttest_batch(
+    p_mean: np.ndarray, p_std: np.ndarray, p_count: np.ndarray,
+    c_mean: np.ndarray, c_std: np.ndarray, c_count: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Welch's t-test for many pairs of groups at once (arrays of moments)
+    
+    Same arithmetic as scipy's ttest_ind_from_stats(equal_var=False);
+    returns the t statistics and two-sided p-values.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_var = np.square(p_std) / p_count
+        c_var = np.square(c_std) / c_count
+        dof = np.square(p_var + c_var) / (np.square(p_var) / (p_count - 1) + np.square(c_var) / (c_count - 1))
+        t_stat = (p_mean - c_mean) / np.sqrt(p_var + c_var)
+        p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    return t_stat, p_value
+
+
 def perform_mannwhitney(
     participants_values: pd.Series,
     control_values: pd.Series
@@ -88,14 +256,98 @@ def perform_mannwhitney(
         }
 
 
+def perform_mannwhitney_vs_baseline(
+    participants_values: pd.Series,
+    control: ControlBaseline,
+    gmv_col: str = 'gmv_d30'
+) -> Dict[str, Any]:
+    """
+    Mann-Whitney U test against the control baseline's sorted GMV array
+    
+    Ranks come from binary searches into the sorted control values, so the
+    cost is proportional to the participant group. Statistic and asymptotic
+    p-value (tie and continuity corrected) match scipy's mannwhitneyu.
+    
+    A streamed baseline has no individual values: ranks are then read off
+    its GMV sketch and the result is flagged as approximate.
+    """
+    p_sorted = np.sort(participants_values.dropna().to_numpy(dtype=np.float64))
+    n1 = len(p_sorted)
+    approximate = not control.has_values(gmv_col)
+    
+    if approximate:
+        sketch = control.gmv_sketches[gmv_col]
+        n2 = sketch.count
+        less, equal = sketch.count_below(p_sorted), sketch.count_equal(p_sorted)
+        c_tie_term = sketch.tie_term()
+        control_ties = sketch.count_equal
+    else:
+        c_sorted = control.sorted_gmv[gmv_col]
+        n2 = len(c_sorted)
+        if n1 <= 8 or n2 <= 8:
+            # scipy may pick the exact distribution for tiny samples
+            return perform_mannwhitney(pd.Series(p_sorted), pd.Series(c_sorted))
+        
+        left = np.searchsorted(c_sorted, p_sorted, side='left')
+        right = np.searchsorted(c_sorted, p_sorted, side='right')
+        less, equal = left, right - left
+        
+        c_unique, c_counts, c_tie_term = control.gmv_ties[gmv_col]
+        
+        def control_ties(values):
+            idx = np.minimum(np.searchsorted(c_unique, values), len(c_unique) - 1)
+            return np.where(c_unique[idx] == values, c_counts[idx], 0.0)
+    
+    if n1 < 2 or n2 < 2:
+        return {
+            'statistic': None,
+            'p_value': None,
+            'significant': None,
+            'error': 'Dados insuficientes para teste'
+        }
+    
+    # U1 = pairs where the participant is larger + half of the ties
+    u_stat = float(less.sum() + 0.5 * equal.sum())
+    
+    # Tie term of the pooled sample, updated from the control's precomputed ties
+    p_unique, p_counts = np.unique(p_sorted, return_counts=True)
+    shared = control_ties(p_unique)
+    pooled = shared + p_counts
+    tie_term = c_tie_term - (shared ** 3 - shared).sum() + (pooled ** 3 - pooled).sum()
+    
+    n = n1 + n2
+    sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    if sigma == 0:
+        return {
+            'statistic': None,
+            'p_value': None,
+            'error': 'Variância nula entre os grupos'
+        }
+    
+    z = (max(u_stat, n1 * n2 - u_stat) - n1 * n2 / 2 - 0.5) / sigma
+    p_value = float(np.clip(2 * stats.norm.sf(z), 0, 1))
+    
+    results = {
+        'statistic': u_stat,
+        'p_value': p_value,
+        'significant': p_value < 0.05
+    }
+    if approximate:
+        results['approximate'] = True
+    return results
+
+
 def analyze_gmv_comparison(
     participants_df: pd.DataFrame,
-    control_df: pd.DataFrame,
+    control: Union[pd.DataFrame, ControlBaseline],
     gmv_col: str = 'gmv_d30'
 ) -> Dict[str, Any]:
     """
     Compare GMV between participants and control group
     
+    The control side is read from a ControlBaseline (a raw control DataFrame
+    is also accepted and summarised on the fly).
+    
     Returns:
         Dictionary with analysis results including:
         - GMV statistics for both groups
@@ -103,21 +355,20 @@ def analyze_gmv_comparison(
         - breakdown by segments
     """
     results = {}
+    control = as_control_baseline(control)
     
     # Overall GMV stats
     results['participants'] = calculate_gmv_stats(participants_df, gmv_col)
-    results['control'] = calculate_gmv_stats(control_df, gmv_col)
+    results['control'] = dict(control.gmv_stats[gmv_col])
     
     # T-test
-    results['ttest'] = perform_ttest(
-        participants_df[gmv_col],
-        control_df[gmv_col]
-    )
+    results['ttest'] = perform_ttest_from_stats(results['participants'], results['control'])
     
     # Mann-Whitney (more robust for non-normal distributions)
-    results['mannwhitney'] = perform_mannwhitney(
+    results['mannwhitney'] = perform_mannwhitney_vs_baseline(
         participants_df[gmv_col],
-        control_df[gmv_col]
+        control,
+        gmv_col
     )
     
     # Calculate lift/difference
@@ -131,64 +382,82 @@ def analyze_gmv_comparison(
     
     # Breakdown by status at webinar (for participants)
     if 'status_at_webinar' in participants_df.columns:
-        status_gmv = participants_df.groupby('status_at_webinar').agg({
+        status_gmv = participants_df.groupby('status_at_webinar', observed=True).agg({
             gmv_col: ['mean', 'median', 'count']
         }).reset_index()
         status_gmv.columns = ['status', 'mean_gmv', 'median_gmv', 'count']
         results['participants_by_status'] = status_gmv.to_dict('records')
     
     # Breakdown by current status (for control)
-    if 'current_status' in control_df.columns:
-        control_status_gmv = control_df.groupby('current_status').agg({
-            gmv_col: ['mean', 'median', 'count']
-        }).reset_index()
-        control_status_gmv.columns = ['status', 'mean_gmv', 'median_gmv', 'count']
-        results['control_by_status'] = control_status_gmv.to_dict('records')
+    if gmv_col in control.by_status:
+        results['control_by_status'] = control.by_status[gmv_col]
     
     # Breakdown by age category
     if 'age_category' in participants_df.columns:
-        age_gmv_participants = participants_df.groupby('age_category')[gmv_col].agg(['mean', 'median', 'count']).reset_index()
+        age_gmv_participants = participants_df.groupby('age_category', observed=True)[gmv_col].agg(['mean', 'median', 'count']).reset_index()
         age_gmv_participants.columns = ['age_category', 'mean_gmv', 'median_gmv', 'count']
         results['participants_by_age'] = age_gmv_participants.to_dict('records')
         
-    if 'age_category' in control_df.columns:
-        age_gmv_control = control_df.groupby('age_category')[gmv_col].agg(['mean', 'median', 'count']).reset_index()
-        age_gmv_control.columns = ['age_category', 'mean_gmv', 'median_gmv', 'count']
-        results['control_by_age'] = age_gmv_control.to_dict('records')
+    if gmv_col in control.by_age:
+        results['control_by_age'] = control.by_age[gmv_col]
     
     return results
 
 
 def analyze_gmv_by_segment(
     participants_df: pd.DataFrame,
-    control_df: pd.DataFrame,
-    segment_col: str,
+    control: Union[pd.DataFrame, ControlBaseline],
+    segment_col: Segment,
     gmv_col: str = 'gmv_d30'
 ) -> List[Dict[str, Any]]:
     """
     Compare GMV between groups within each segment
     Useful for controlling by initial status or age
+    
+    segment_col may also be a tuple of columns, e.g. ('current_status',
+    'age_category'); segments are then tuples of values. Participants are
+    grouped once, control segment statistics come precomputed from the
+    ControlBaseline and every segment's Welch test is evaluated as arrays.
     """
-    results = []
+    control = as_control_baseline(control)
+    control_segments = control.segment_stats.get(segment_col, {}).get(gmv_col, {})
     
-    # Get all segments
-    all_segments = set(participants_df[segment_col].dropna().unique()) | set(control_df[segment_col].dropna().unique())
+    p_table = segment_gmv_table(participants_df, segment_col, gmv_col)
+    if len(p_table) == 0 or not control_segments:
+        return []
     
-    for segment in all_segments:
-        if not segment:
-            continue
-            
-        p_segment = participants_df[participants_df[segment_col] == segment]
-        c_segment = control_df[control_df[segment_col] == segment]
-        
-        if len(p_segment) < 5 or len(c_segment) < 5:
-            continue
-        
+    c_table = pd.DataFrame.from_dict(control_segments, orient='index').reindex(p_table.index)
+    
+    # Skip blank labels (e.g. missing status) and segments too small to test
+    segments = p_table.index.to_flat_index()
+    labelled = np.array([
+        all(segment) if isinstance(segment, tuple) else bool(segment) for segment in segments
+    ])
+    keep = labelled & (p_table['count'] >= 5).to_numpy() & (c_table['count'].fillna(0) >= 5).to_numpy()
+    if not keep.any():
+        return []
+    
+    p_table, c_table, segments = p_table[keep], c_table[keep], segments[keep]
+    t_stat, p_value = perform_ttest_batch(
+        p_table['mean'].to_numpy(), p_table['std'].to_numpy(), p_table['count'].to_numpy(),
+        c_table['mean'].to_numpy(), c_table['std'].to_numpy(), c_table['count'].to_numpy()
+    )
+    
+    results = []
+    for i, segment in enumerate(segments):
+        p_stats = p_table.iloc[i].to_dict()
+        p_stats['count'] = int(p_stats['count'])
         segment_result = {
             'segment': segment,
-            'participants': calculate_gmv_stats(p_segment, gmv_col),
-            'control': calculate_gmv_stats(c_segment, gmv_col),
-            'ttest': perform_ttest(p_segment[gmv_col], c_segment[gmv_col])
+            'participants': p_stats,
+            'control': dict(control_segments[segment]),
+            'ttest': {
+                'statistic': t_stat[i],
+                'p_value': p_value[i],
+                'significant': p_value[i] < 0.05,
+                'participants_n': p_stats['count'],
+                'control_n': control_segments[segment]['count']
+            }
         }
         
         if segment_result['control']['mean'] > 0:
@@ -0,0 +1,105 @@
+"""
+Leaderboard Module
+Compares every webinar (or month) with the control group in one grouped pass
+"""
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List, Union
+from src.data_processor import NO_SELLER_STATUSES, calculate_status_changes
+from src.analysis.control_baseline import ControlBaseline, as_control_baseline
+from src.analysis.contingency import chi2_contingency_batch, stack_2x2
+
+
+STATUS_AT_WEBINAR = 'Máx. Seller Segment Mes Webinar'
+STORE_ATTRIBUTES = ['gmv_d30', 'gmv_d90', 'current_status', 'store_age_days']
+
+
+def analyze_leaderboard(
+    webinar_df: pd.DataFrame,
+    store_df: pd.DataFrame,
+    control: Union[pd.DataFrame, ControlBaseline],
+    group_col: str = 'webinar_name',
+    gmv_col: str = 'gmv_d30'
+) -> List[Dict[str, Any]]:
+    """
+    H1/H2/H3 headline metrics for every value of group_col at once
+
+    Each group's participants are the stores with a row for it (first row per
+    store, as when the group is picked in the sidebar filter), so the figures
+    match filtering by one webinar/month and running the full analyses:
+    conversion rate, lift and chi-square (or Fisher) p-value vs the control sellers,
+    mean/median GMV and their difference to the control, and upgrade rate.
+    """
+    if group_col not in webinar_df.columns:
+        return []
+    control = as_control_baseline(control)
+
+    # One participation per (group, store), then a single join with the store base
+    pairs = (
+        webinar_df[[group_col, 'store_id', STATUS_AT_WEBINAR]]
+        .dropna(subset=[group_col])
+        .drop_duplicates([group_col, 'store_id'])
+    )
+    merged = pairs.merge(store_df[['store_id'] + STORE_ATTRIBUTES], on='store_id', how='left')
+
+    status_before = merged[STATUS_AT_WEBINAR]
+    status_after = merged['current_status']
+    change = calculate_status_changes(status_before, status_after)
+
+    table = pd.DataFrame({
+        'group': merged[group_col],
+        'converted': status_before.isin(NO_SELLER_STATUSES) & ~status_after.isin(NO_SELLER_STATUSES),
+        'upgrade': change == 'upgrade',
+        'valid_transition': change != 'unknown',
+        'gmv': merged[gmv_col]
+    }).groupby('group', observed=True).agg(
+        participants=('converted', 'size'),
+        converted=('converted', 'sum'),
+        upgrades=('upgrade', 'sum'),
+        valid_transitions=('valid_transition', 'sum'),
+        gmv_mean=('gmv', 'mean'),
+        gmv_median=('gmv', 'median')
+    )
+    if len(table) == 0:
+        return []
+
+    participants = table['participants'].to_numpy()
+    converted = table['converted'].to_numpy()
+    conversion_rate = converted / participants * 100
+
+    # Every group's 2x2 table against the control in one batch
+    tables = stack_2x2(converted, participants - converted, control.sellers, control.total - control.sellers)
+    p_values = chi2_contingency_batch(tables)['p_value']
+
+    c_stats = control.gmv_stats[gmv_col]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        upgrade_rate = np.where(
+            table['valid_transitions'] > 0,
+            table['upgrades'] / table['valid_transitions'] * 100,
+            np.nan
+        )
+
+    records = []
+    for i, group in enumerate(table.index):
+        records.append({
+            'group': group,
+            'participants': int(participants[i]),
+            'converted': int(converted[i]),
+            'conversion_rate': conversion_rate[i],
+            'lift': (
+                (conversion_rate[i] - control.seller_rate) / control.seller_rate * 100
+                if control.seller_rate > 0 else None
+            ),
+            'p_value': None if np.isnan(p_values[i]) else p_values[i],
+            'significant': None if np.isnan(p_values[i]) else p_values[i] < 0.05,
+            'gmv_mean': table['gmv_mean'].iat[i],
+            'gmv_median': table['gmv_median'].iat[i],
+            'gmv_mean_diff_pct': (
+                (table['gmv_mean'].iat[i] - c_stats['mean']) / c_stats['mean'] * 100
+                if c_stats['mean'] > 0 else None
+            ),
+            'gmv_median_diff': table['gmv_median'].iat[i] - c_stats['median'],
+            'upgrade_rate': None if np.isnan(upgrade_rate[i]) else upgrade_rate[i]
+        })
+
+    return records
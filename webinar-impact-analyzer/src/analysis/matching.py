@@ -0,0 +1,188 @@
+"""
+Matching Module
+Nearest-neighbour matched control group built with a KD-tree
+"""
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field
+from scipy.spatial import cKDTree
+from typing import Dict, Iterable, List, Sequence, Tuple
+from src.analysis.control_baseline import ControlBaseline, build_control_baseline
+
+
+# Only characteristics fixed before the webinar can be matched on. Status and
+# GMV in the store base are measured today (they are the H1-H3 outcomes), so
+# matching on them would erase the effect being measured; store age is the
+# store's creation date, which the webinar cannot change.
+MATCH_FEATURES = ['store_age_days']
+DEFAULT_MATCH_K = 5
+# Relative tolerance under which two control stores are equally near
+TIE_TOLERANCE = 1e-9
+
+
+@dataclass
+class MatchedControl:
+    """
+    The k nearest control stores of every participant
+
+    neighbours[i] holds positions in `rows` (each matched control store kept
+    once) for participant_ids[i]. Matching is with replacement: a control
+    store that is a neighbour of several participants counts once per
+    participant, so baselines built from control_rows() are frequency
+    weighted like the usual matching estimator. Ties at the k-th distance
+    are broken by a seeded random draw per participant, not by file order.
+    """
+    participant_ids: np.ndarray
+    neighbours: np.ndarray
+    distances: np.ndarray
+    rows: pd.DataFrame
+    balance: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    @property
+    def k(self) -> int:
+        return self.neighbours.shape[1]
+
+    def control_rows(self, store_ids: Iterable) -> pd.DataFrame:
+        """Matched control rows for a subset of participants (one row per match)"""
+        selected = np.isin(self.participant_ids, pd.unique(np.asarray(store_ids)))
+        return self.rows.iloc[self.neighbours[selected].ravel()]
+
+    def baseline(self, store_ids: Iterable) -> ControlBaseline:
+        """ControlBaseline of the matched controls of a subset of participants"""
+        return build_control_baseline(self.control_rows(store_ids))
+
+
+def _balance(
+    participants: pd.DataFrame,
+    control: pd.DataFrame,
+    matched: pd.DataFrame,
+    features: Sequence[str]
+) -> Dict[str, Dict[str, float]]:
+    """Feature means and standardized mean differences before/after matching"""
+    balance = {}
+    for feature in features:
+        p_values = participants[feature].astype(np.float64)
+        c_values = control[feature].astype(np.float64)
+        m_values = matched[feature].astype(np.float64)
+        pooled_sd = np.sqrt((p_values.var() + c_values.var()) / 2)
+        balance[feature] = {
+            'participants_mean': p_values.mean(),
+            'control_mean': c_values.mean(),
+            'matched_mean': m_values.mean(),
+            'smd_before': (p_values.mean() - c_values.mean()) / pooled_sd if pooled_sd > 0 else 0.0,
+            'smd_after': (p_values.mean() - m_values.mean()) / pooled_sd if pooled_sd > 0 else 0.0
+        }
+    return balance
+
+
+def _query_random_ties(
+    tree: cKDTree,
+    c_points: np.ndarray,
+    p_points: np.ndarray,
+    k: int,
+    rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k nearest neighbours with ties at the k-th distance drawn at random
+
+    cKDTree breaks ties by row order, so participants at the same point
+    would all get the same neighbours. Controls strictly nearer than the
+    k-th distance are always kept; the remaining slots are drawn without
+    replacement, independently per participant, among the controls at
+    exactly that distance. Participants sharing a point share one ball query.
+    """
+    unique_points, inverse = np.unique(p_points, axis=0, return_inverse=True)
+    kth = np.asarray(tree.query(unique_points, k=k)[0]).reshape(len(unique_points), k)[:, -1]
+    tolerance = kth * TIE_TOLERANCE + 1e-12
+    balls = tree.query_ball_point(unique_points, r=kth + tolerance)
+
+    neighbours = np.empty((len(p_points), k), dtype=np.int64)
+    distances = np.empty((len(p_points), k))
+    for u, members in pd.Series(inverse.ravel()).groupby(inverse.ravel()).indices.items():
+        candidates = np.asarray(balls[u], dtype=np.int64)
+        candidate_distances = np.linalg.norm(c_points[candidates] - unique_points[u], axis=1)
+        tied = np.abs(candidate_distances - kth[u]) <= tolerance[u]
+        nearer = np.argsort(candidate_distances[~tied], kind='stable')
+        ties = candidates[tied]
+        n_nearer = len(nearer)
+        draws = np.argpartition(rng.random((len(members), len(ties))), k - n_nearer - 1, axis=1)
+
+        neighbours[members, :n_nearer] = candidates[~tied][nearer]
+        neighbours[members, n_nearer:] = ties[draws[:, :k - n_nearer]]
+        distances[members, :n_nearer] = candidate_distances[~tied][nearer]
+        distances[members, n_nearer:] = kth[u]
+    return distances, neighbours
+
+
+def match_control(
+    participants_df: pd.DataFrame,
+    control_df: pd.DataFrame,
+    k: int = DEFAULT_MATCH_K,
+    features: Sequence[str] = MATCH_FEATURES,
+    exact: Sequence[str] = (),
+    seed: int = 0
+) -> MatchedControl:
+    """
+    Find the k nearest control stores of every participant
+
+    Features are scaled by the control group's standard deviation and
+    searched with one cKDTree per stratum of the `exact` columns (a single
+    tree when there are none), so each participant costs O(k log n).
+    Equidistant controls are drawn at random (seeded), so the match does
+    not depend on file order and participants sharing a feature value do
+    not all reuse the same controls. Participants or controls with missing
+    features are left out.
+    """
+    features, exact = list(features), list(exact)
+    participants = participants_df.drop_duplicates('store_id').dropna(subset=features + exact)
+    control = control_df.dropna(subset=features + exact)
+
+    scale = control[features].astype(np.float64).std().replace(0, 1).fillna(1).to_numpy()
+    p_points = participants[features].to_numpy(dtype=np.float64) / scale
+    c_points = control[features].to_numpy(dtype=np.float64) / scale
+
+    if exact:
+        p_strata = participants.groupby(exact, observed=True).indices
+        c_strata = control.groupby(exact, observed=True).indices
+    else:
+        p_strata = {(): np.arange(len(participants))}
+        c_strata = {(): np.arange(len(control))}
+
+    matched_participants: List[np.ndarray] = []
+    matched_positions: List[np.ndarray] = []
+    matched_distances: List[np.ndarray] = []
+    rng = np.random.default_rng(seed)
+    for stratum, p_index in p_strata.items():
+        c_index = c_strata.get(stratum)
+        if c_index is None or len(c_index) < k:
+            continue
+        stratum_points = c_points[c_index]
+        distances, neighbours = _query_random_ties(
+            cKDTree(stratum_points), stratum_points, p_points[p_index], k, rng
+        )
+        matched_participants.append(p_index)
+        matched_positions.append(c_index[neighbours])
+        matched_distances.append(distances)
+
+    if matched_participants:
+        p_index = np.concatenate(matched_participants)
+        positions = np.concatenate(matched_positions)
+        distances = np.concatenate(matched_distances)
+    else:
+        p_index = np.empty(0, dtype=np.int64)
+        positions = np.empty((0, k), dtype=np.int64)
+        distances = np.empty((0, k))
+
+    # Keep each matched control store once and point the neighbours at it
+    unique_positions, neighbours = np.unique(positions, return_inverse=True)
+    rows = control.iloc[unique_positions]
+    neighbours = neighbours.reshape(positions.shape)
+
+    participants = participants.iloc[p_index]
+    return MatchedControl(
+        participant_ids=participants['store_id'].to_numpy(),
+        neighbours=neighbours,
+        distances=distances,
+        rows=rows,
+        balance=_balance(participants, control, rows.iloc[neighbours.ravel()], features)
+    )
@@ -0,0 +1,307 @@
+"""
+Permutation Module
+Monte Carlo permutation tests for H1, H2 and H3 with sequential early stopping
+"""
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from scipy import stats
+from typing import Callable, Dict, Any, List, Sequence, Union
+from src.analysis.control_baseline import ControlBaseline
+from src.analysis.contingency import chi2_contingency_batch
+
+
+PERMUTATION_WORKERS = min(4, os.cpu_count() or 1)
+PERMUTATION_BATCH = 1000
+# Batches per sequential round of the GMV test, whatever the worker count, so
+# a seeded result (and where it stops) does not depend on the machine
+ROUND_BATCHES = 4
+MAX_PERMUTATIONS = 20_000
+DEFAULT_MAX_SECONDS = 10.0
+DEFAULT_ALPHA = 0.05
+# Stop once the p-value is this many Monte Carlo standard errors away from alpha
+DECISION_Z = 3.0
+
+# Relative tolerance so permutations tying the observed statistic count as extreme
+_TIE_TOLERANCE = 1e-9
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_permutation_pool(workers: int = PERMUTATION_WORKERS) -> ProcessPoolExecutor:
+    """
+    Process pool kept for the life of the process (one per worker count)
+
+    Workers are spawned (not forked) because the dashboard runs threads, and
+    are reused across reruns so only the first test pays the start-up.
+    Creation is locked so concurrent sessions share a single pool.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+            _pools[workers] = pool
+        return pool
+
+
+def discard_permutation_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next get_permutation_pool call starts a new one"""
+    with _pools_lock:
+        for workers, current in list(_pools.items()):
+            if current is pool:
+                del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _p_value_result(extreme: int, n: int, observed: float, alpha: float) -> Dict[str, Any]:
+    """Monte Carlo p-value (k + 1) / (n + 1) with its standard error"""
+    p_value = (extreme + 1) / (n + 1)
+    return {
+        'statistic': observed,
+        'p_value': p_value,
+        'mc_error': float(np.sqrt(p_value * (1 - p_value) / n)),
+        'n_permutations': n,
+        'significant': p_value < alpha
+    }
+
+
+def _sequential_test(
+    run_round: Callable[[List[np.random.SeedSequence], List[int]], np.ndarray],
+    observed: Sequence[float],
+    round_batches: int,
+    seed: int,
+    alpha: float,
+    max_permutations: int,
+    max_seconds: float
+) -> List[Dict[str, Any]]:
+    """
+    Sequential Monte Carlo: run rounds of batches until every p-value is decided
+
+    run_round(seeds, sizes) returns how many permutations in those batches
+    reached each observed statistic. After every round the p-value and its
+    Monte Carlo standard error are updated; sampling stops when all p-values
+    are DECISION_Z standard errors away from alpha, at max_permutations or
+    when max_seconds runs out.
+    """
+    start = time.perf_counter()
+    seeds = iter(np.random.SeedSequence(seed).spawn(-(-max_permutations // PERMUTATION_BATCH)))
+    extreme = np.zeros(len(observed), dtype=np.int64)
+    n = 0
+    decided = truncated = False
+
+    while n < max_permutations:
+        sizes = []
+        while len(sizes) < round_batches and n + sum(sizes) < max_permutations:
+            sizes.append(min(PERMUTATION_BATCH, max_permutations - n - sum(sizes)))
+        extreme += run_round([next(seeds) for _ in sizes], sizes)
+        n += sum(sizes)
+
+        p_values = (extreme + 1) / (n + 1)
+        errors = np.sqrt(p_values * (1 - p_values) / n)
+        if (np.abs(p_values - alpha) > DECISION_Z * errors).all():
+            decided = True
+            break
+        if time.perf_counter() - start > max_seconds:
+            truncated = True
+            break
+
+    results = []
+    for i, value in enumerate(observed):
+        result = _p_value_result(int(extreme[i]), n, value, alpha)
+        result['stopped_early'] = decided and n < max_permutations
+        result['truncated'] = truncated
+        result['seconds'] = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+def permutation_test_conversion(
+    converted: int,
+    total: int,
+    control_sellers: int,
+    control_total: int,
+    seed: int = 0,
+    alpha: float = DEFAULT_ALPHA,
+    max_permutations: int = MAX_PERMUTATIONS,
+    max_seconds: float = DEFAULT_MAX_SECONDS
+) -> Dict[str, Any]:
+    """
+    Permutation test for H1: difference in conversion rate vs the control
+
+    Shuffling the group labels of a binary outcome leaves the participants
+    with a hypergeometric number of conversions, so each permutation is a
+    single hypergeometric draw.
+    """
+    if total == 0 or control_total == 0:
+        return {'p_value': None, 'error': 'Dados insuficientes para teste estatístico'}
+
+    successes = converted + control_sellers
+    n_total = total + control_total
+
+    def rate_diff(x):
+        return np.abs(x / total - (successes - x) / control_total)
+
+    observed = float(rate_diff(np.float64(converted)))
+    threshold = observed * (1 - _TIE_TOLERANCE)
+
+    def run_round(seeds, sizes):
+        draws = np.concatenate([
+            np.random.default_rng(s).hypergeometric(successes, n_total - successes, total, size)
+            for s, size in zip(seeds, sizes)
+        ])
+        return np.array([np.count_nonzero(rate_diff(draws.astype(np.float64)) >= threshold)])
+
+    return _sequential_test(run_round, [observed], 1, seed, alpha, max_permutations, max_seconds)[0]
+
+
+def permutation_test_status_distribution(
+    participant_counts: Sequence[int],
+    control_counts: Sequence[int],
+    seed: int = 0,
+    alpha: float = DEFAULT_ALPHA,
+    max_permutations: int = MAX_PERMUTATIONS,
+    max_seconds: float = DEFAULT_MAX_SECONDS
+) -> Dict[str, Any]:
+    """
+    Permutation test for H3: participants' vs control status distribution
+
+    Under shuffled labels the participants' status counts follow a
+    multivariate hypergeometric distribution; every permuted table's
+    chi-square statistic comes from one chi2_contingency_batch call.
+    """
+    participant_counts = np.asarray(participant_counts, dtype=np.int64)
+    colors = participant_counts + np.asarray(control_counts, dtype=np.int64)
+    observed_batch = chi2_contingency_batch(np.array([participant_counts, colors - participant_counts]))
+    if not observed_batch['valid'][0]:
+        return {'p_value': None, 'error': 'Dados insuficientes para teste estatístico'}
+
+    observed = float(observed_batch['statistic_uncorrected'][0])
+    threshold = observed * (1 - _TIE_TOLERANCE)
+    n_sample = int(participant_counts.sum())
+
+    def run_round(seeds, sizes):
+        draws = np.concatenate([
+            np.random.default_rng(s).multivariate_hypergeometric(colors, n_sample, size, method='marginals')
+            for s, size in zip(seeds, sizes)
+        ])
+        tables = np.stack([draws, colors - draws], axis=1)
+        statistics = chi2_contingency_batch(tables, fisher_min_expected=0)['statistic_uncorrected']
+        return np.array([np.count_nonzero(statistics >= threshold)])
+
+    return _sequential_test(run_round, [observed], 1, seed, alpha, max_permutations, max_seconds)[0]
+
+
+def _gmv_permutation_batch(
+    shm_name: str,
+    n_total: int,
+    n_participants: int,
+    seed: np.random.SeedSequence,
+    size: int,
+    thresholds: np.ndarray
+) -> np.ndarray:
+    """
+    One batch of GMV permutations, run in a pool worker
+
+    The pooled values and their ranks are read from shared memory, so only
+    the segment name crosses the process boundary. Each permutation sums
+    values and ranks of a random participant-sized subset.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pooled = np.ndarray((2, n_total), dtype=np.float64, buffer=shm.buf)
+        values, ranks = pooled[0], pooled[1]
+        value_total = values.sum()
+        rng = np.random.default_rng(seed)
+
+        mean_diffs = np.empty(size)
+        rank_sums = np.empty(size)
+        for i in range(size):
+            chosen = rng.choice(n_total, n_participants, replace=False, shuffle=False)
+            chosen_sum = values[chosen].sum()
+            mean_diffs[i] = chosen_sum / n_participants - (value_total - chosen_sum) / (n_total - n_participants)
+            rank_sums[i] = ranks[chosen].sum()
+        del values, ranks, pooled
+    finally:
+        shm.close()
+
+    expected_rank_sum = n_participants * (n_total + 1) / 2
+    return np.array([
+        np.count_nonzero(np.abs(mean_diffs) >= thresholds[0]),
+        np.count_nonzero(np.abs(rank_sums - expected_rank_sum) >= thresholds[1])
+    ])
+
+
+def permutation_test_gmv(
+    participants_values: Union[pd.Series, np.ndarray],
+    control: ControlBaseline,
+    gmv_col: str = 'gmv_d30',
+    seed: int = 0,
+    alpha: float = DEFAULT_ALPHA,
+    max_permutations: int = MAX_PERMUTATIONS,
+    max_seconds: float = DEFAULT_MAX_SECONDS,
+    workers: int = PERMUTATION_WORKERS
+) -> Dict[str, Any]:
+    """
+    Permutation tests for H2 on the pooled GMV values
+
+    Returns 'mean_diff' (difference in means, the permutation analogue of
+    the t-test) and 'rank_sum' (participants' rank sum, the analogue of
+    Mann-Whitney), both from the same permutations. Pooled values and ranks
+    live in one shared-memory block read by a process pool; with a single
+    worker, or when the pool breaks (e.g. a worker killed for memory), the
+    batches run in this process. Needs the control values, so a streamed
+    baseline is not supported.
+    """
+    if not control.has_values(gmv_col):
+        return {'error': 'indisponível no modo streaming (requer os valores de GMV do controle)'}
+
+    p_values = pd.Series(participants_values).dropna().to_numpy(dtype=np.float64)
+    c_values = control.gmv_values(gmv_col)
+    if len(p_values) < 2 or len(c_values) < 2:
+        return {'error': 'Dados insuficientes para teste estatístico'}
+
+    n_participants = len(p_values)
+    n_total = n_participants + len(c_values)
+    pooled = np.concatenate([p_values, c_values])
+    ranks = stats.rankdata(pooled)
+
+    observed_mean_diff = p_values.mean() - c_values.mean()
+    observed_rank_sum = ranks[:n_participants].sum()
+    observed = np.array([
+        abs(observed_mean_diff),
+        abs(observed_rank_sum - n_participants * (n_total + 1) / 2)
+    ])
+    thresholds = observed * (1 - _TIE_TOLERANCE)
+
+    shm = shared_memory.SharedMemory(create=True, size=2 * n_total * 8)
+    try:
+        block = np.ndarray((2, n_total), dtype=np.float64, buffer=shm.buf)
+        block[0] = pooled
+        block[1] = ranks
+        del block
+
+        def run_round(seeds, sizes):
+            args = [(shm.name, n_total, n_participants, s, size, thresholds) for s, size in zip(seeds, sizes)]
+            if workers > 1:
+                pool = get_permutation_pool(workers)
+                try:
+                    return np.sum(list(pool.map(_gmv_permutation_batch, *zip(*args))), axis=0)
+                except BrokenProcessPool:
+                    discard_permutation_pool(pool)
+            return np.sum([_gmv_permutation_batch(*a) for a in args], axis=0)
+
+        mean_result, rank_result = _sequential_test(
+            run_round, [observed_mean_diff, observed_rank_sum],
+            ROUND_BATCHES, seed, alpha, max_permutations, max_seconds
+        )
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return {'mean_diff': mean_result, 'rank_sum': rank_result}
@@ -4,9 +4,10 @@ Hypothesis 3: Webinar participants show better status evolution than control
 """
 import pandas as pd
 import numpy as np
-from scipy import stats
-from typing import Dict, Any, List, Tuple
-from src.data_loader import get_status_order, status_to_numeric
+from typing import Dict, Any, List, Tuple, Union
+from src.data_loader import status_to_numeric, encode_status
+from src.analysis.control_baseline import ControlBaseline, as_control_baseline
+from src.analysis.contingency import TEST_NAMES, chi2_contingency_batch, contingency_result
 
 
 def calculate_status_transition(
@@ -37,6 +38,25 @@ def calculate_status_transition(
         return 'maintained', 0
 
 
+def calculate_status_transitions(
+    status_before: pd.Series,
+    status_after: pd.Series
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized calculate_status_transition for whole columns"""
+    before_num = encode_status(status_before).astype(np.int64)
+    after_num = encode_status(status_after).astype(np.int64)
+    
+    unknown = (before_num < 0) | (after_num < 0)
+    magnitude = np.where(unknown, 0, after_num - before_num)
+    transition_type = np.select(
+        [unknown, magnitude > 0, magnitude < 0],
+        ['unknown', 'upgrade', 'downgrade'],
+        default='maintained'
+    ).astype(object)
+    
+    return transition_type, magnitude
+
+
 def create_transition_matrix(
     df: pd.DataFrame,
     status_before_col: str,
@@ -70,15 +90,17 @@ def create_transition_matrix(
 
 def analyze_status_evolution(
     participants_df: pd.DataFrame,
-    control_df: pd.DataFrame
+    control: Union[pd.DataFrame, ControlBaseline]
 ) -> Dict[str, Any]:
     """
     Analyze status evolution for participants vs control
     
     For participants: compare status_at_webinar vs current_status
     For control: we only have current_status, so we'll compare distributions
+    (read from the precomputed ControlBaseline)
     """
     results = {}
+    control = as_control_baseline(control)
     
     # Calculate transitions for participants
     participants_with_status = participants_df[
@@ -89,15 +111,12 @@ def analyze_status_evolution(
     ].copy()
     
     if len(participants_with_status) > 0:
-        participants_with_status['transition_type'], participants_with_status['transition_magnitude'] = zip(*
-            participants_with_status.apply(
-                lambda row: calculate_status_transition(
-                    row['status_at_webinar'],
-                    row['current_status']
-                ),
-                axis=1
-            )
+        transition_type, transition_magnitude = calculate_status_transitions(
+            participants_with_status['status_at_webinar'],
+            participants_with_status['current_status']
         )
+        participants_with_status['transition_type'] = transition_type
+        participants_with_status['transition_magnitude'] = transition_magnitude
         
         # Count transitions
         transition_counts = participants_with_status['transition_type'].value_counts()
@@ -139,32 +158,37 @@ def analyze_status_evolution(
             'current_status'
         ).to_dict()
         
-        # Breakdown by initial status
+        # Breakdown by initial status (one crosstab instead of a filter per status)
+        status_counts = pd.crosstab(
+            participants_with_status['status_at_webinar'],
+            participants_with_status['transition_type']
+        ).reindex(columns=['upgrade', 'downgrade', 'maintained', 'unknown'], fill_value=0)
+        
         status_breakdown = []
         for status in participants_with_status['status_at_webinar'].unique():
             if not status:
                 continue
-            status_df = participants_with_status[participants_with_status['status_at_webinar'] == status]
-            counts = status_df['transition_type'].value_counts()
-            total = len(status_df[status_df['transition_type'] != 'unknown'])
+            counts = status_counts.loc[status]
+            total = counts['upgrade'] + counts['downgrade'] + counts['maintained']
             
             if total > 0:
                 status_breakdown.append({
                     'initial_status': status,
-                    'total': len(status_df),
-                    'upgrade_rate': counts.get('upgrade', 0) / total * 100,
-                    'downgrade_rate': counts.get('downgrade', 0) / total * 100,
-                    'maintained_rate': counts.get('maintained', 0) / total * 100
+                    'total': int(counts.sum()),
+                    'upgrade_rate': counts['upgrade'] / total * 100,
+                    'downgrade_rate': counts['downgrade'] / total * 100,
+                    'maintained_rate': counts['maintained'] / total * 100
                 })
         
         results['by_initial_status'] = status_breakdown
     
     # Control group status distribution
-    control_status = control_df['current_status'].value_counts()
-    results['control_distribution'] = control_status.to_dict()
+    control_status = control.status_distribution
+    results['control_distribution'] = dict(control_status)
     
     # Participants current status distribution
     participants_current = participants_df['current_status'].value_counts()
+    participants_current = participants_current[participants_current > 0]
     results['participants_current_distribution'] = participants_current.to_dict()
     
     # Chi-square test comparing distributions
@@ -175,28 +199,10 @@ def analyze_status_evolution(
     p_counts = [participants_current.get(s, 0) for s in status_order]
     c_counts = [control_status.get(s, 0) for s in status_order]
     
-    # Only include statuses with data in both groups
-    valid_indices = [i for i in range(len(status_order)) 
-                     if p_counts[i] > 0 or c_counts[i] > 0]
-    
-    if len(valid_indices) >= 2:
-        contingency = np.array([
-            [p_counts[i] for i in valid_indices],
-            [c_counts[i] for i in valid_indices]
-        ])
-        
-        try:
-            chi2, p_value, dof, expected = stats.chi2_contingency(contingency)
-            results['distribution_chi_square'] = {
-                'statistic': chi2,
-                'p_value': p_value,
-                'degrees_of_freedom': dof,
-                'significant': p_value < 0.05
-            }
-        except Exception as e:
-            results['distribution_chi_square'] = {
-                'error': str(e)
-            }
+    # Statuses empty in both groups are ignored by the contingency engine
+    contingency = np.array([p_counts, c_counts])
+    if np.count_nonzero(contingency.sum(axis=0)) >= 2:
+        results['distribution_chi_square'] = contingency_result(chi2_contingency_batch(contingency))
     
     return results
 
@@ -225,7 +231,7 @@ def get_sankey_data(
     all_labels = before_labels + after_labels
     
     # Count transitions
-    transitions = valid_df.groupby(['status_at_webinar', 'current_status']).size().reset_index(name='count')
+    transitions = valid_df.groupby(['status_at_webinar', 'current_status'], observed=True).size().reset_index(name='count')
     
     source = []
     target = []
@@ -271,11 +277,11 @@ def get_status_summary_text(results: Dict[str, Any]) -> str:
                 else:
                     summary.append(f"\n**Magnitude média:** {avg:.2f} níveis")
     
-    if 'distribution_chi_square' in results and 'p_value' in results['distribution_chi_square']:
+    if 'distribution_chi_square' in results and results['distribution_chi_square'].get('p_value') is not None:
         chi = results['distribution_chi_square']
         sig = "significativamente diferente" if chi['significant'] else "não significativamente diferente"
         summary.append(f"\n**Distribuição de status atual:**")
         summary.append(f"- Participantes vs Controle: {sig}")
-        summary.append(f"- p-valor: {chi['p_value']:.4f}")
+        summary.append(f"- p-valor: {chi['p_value']:.4f} ({TEST_NAMES[chi['method']]})")
     
     return "\n".join(summary)
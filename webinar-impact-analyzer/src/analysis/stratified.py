@@ -0,0 +1,166 @@
+"""
+Stratified Analysis Module
+Coarsened-exact-matching style GMV effect over age (× month) strata
+"""
+import pandas as pd
+import numpy as np
+from scipy import stats
+from typing import Dict, Any, Iterable, List, Optional, Union
+from src.analysis.control_baseline import GMV_COLUMNS, ControlBaseline, as_control_baseline
+
+
+# The participant table also keeps the status at the webinar so the sidebar
+# status filter can select its rows, but the effect is only stratified on
+# store age: the control group's status is measured today, an outcome tied
+# to GMV (see MATCH_FEATURES in matching.py), so it cannot stand in for a
+# pre-treatment status.
+PARTICIPANT_STRATA = ['status_at_webinar', 'age_category', 'first_webinar_month']
+CONTROL_STRATA = 'age_category'
+STRATUM_NAMES = ['status', 'age_category', 'month']
+
+
+def participant_strata_table(
+    participants_df: pd.DataFrame,
+    gmv_cols: List[str] = GMV_COLUMNS
+) -> pd.DataFrame:
+    """
+    Count, mean and sum of squared deviations of each GMV column per stratum
+
+    One grouped aggregation over status × age × month. The table is small and
+    can be cached: a status filter only selects rows of it, and rows combine
+    exactly (collapse_strata) without going back to the stores.
+    """
+    strata = [col for col in PARTICIPANT_STRATA if col in participants_df.columns]
+    grouped = participants_df.groupby(strata, observed=True)
+    table = pd.DataFrame(index=grouped.size().index)
+    for gmv_col in gmv_cols:
+        if gmv_col not in participants_df.columns:
+            continue
+        values = grouped[gmv_col]
+        table[f'{gmv_col}_count'] = values.count()
+        table[f'{gmv_col}_mean'] = values.mean()
+        table[f'{gmv_col}_m2'] = values.var(ddof=0) * table[f'{gmv_col}_count']
+    table.index.names = STRATUM_NAMES[:len(strata)]
+    return table
+
+
+def select_strata(
+    table: pd.DataFrame,
+    statuses: Optional[Iterable[str]] = None,
+    age_categories: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """Rows of a participant strata table for the sidebar status and age filters (None keeps all)"""
+    mask = np.ones(len(table), dtype=bool)
+    for level, values in (('status', statuses), ('age_category', age_categories)):
+        if values is not None:
+            mask &= table.index.get_level_values(level).isin(list(values))
+    return table[mask]
+
+
+def collapse_strata(table: pd.DataFrame, gmv_col: str, levels: List[str]) -> pd.DataFrame:
+    """Combine strata rows into coarser strata (Chan et al. pooled moments)"""
+    count = table[f'{gmv_col}_count']
+    mean = table[f'{gmv_col}_mean']
+    frame = pd.DataFrame({'count': count, 'sum': count * mean, 'm2': table[f'{gmv_col}_m2']})
+
+    grouped = frame.groupby(level=levels, observed=True)
+    pooled_mean = grouped['sum'].transform('sum') / grouped['count'].transform('sum')
+    frame['m2'] += count * (mean - pooled_mean) ** 2
+
+    result = frame.groupby(level=levels, observed=True).sum()
+    result = result[result['count'] > 0]
+    result['mean'] = result['sum'] / result['count']
+    return result[['count', 'mean', 'm2']]
+
+
+def _control_strata(control: ControlBaseline, gmv_col: str) -> pd.DataFrame:
+    """Control count/mean/std per age stratum, from the cached baseline"""
+    segment = control.segment_stats.get(CONTROL_STRATA, {}).get(gmv_col, {})
+    if not segment:
+        return pd.DataFrame(columns=['count', 'mean', 'std'])
+    table = pd.DataFrame.from_dict(segment, orient='index')[['count', 'mean', 'std']]
+    table.index.name = 'age_category'
+    return table
+
+
+def analyze_stratified(
+    participant_table: pd.DataFrame,
+    control: Union[pd.DataFrame, ControlBaseline],
+    gmv_col: str = 'gmv_d30',
+    by_month: bool = False
+) -> Dict[str, Any]:
+    """
+    Effect of participation on mean GMV within store age strata
+
+    Each stratum's difference in means is weighted by its share of the
+    participants (the effect on the treated, ATT); participants in strata
+    with fewer than two control stores are pruned, as in coarsened exact
+    matching. With by_month the strata are also split by webinar month
+    (the control side is the same for every month). Only pre-treatment
+    variables define the strata; status is left out because the control
+    group only has today's status.
+
+    Returns:
+        Dictionary with the per-stratum records and the overall weighted
+        effect, its standard error, 95% interval and normal p-value
+    """
+    control = as_control_baseline(control)
+    levels = ['age_category'] + (['month'] if by_month else [])
+    if f'{gmv_col}_count' not in participant_table.columns or len(participant_table) == 0:
+        return {'error': 'Dados insuficientes para análise estratificada'}
+
+    strata = collapse_strata(participant_table, gmv_col, [l for l in levels if l in participant_table.index.names])
+    c_table = _control_strata(control, gmv_col)
+
+    age = strata.index.get_level_values('age_category')
+    c_rows = c_table.reindex(age)
+
+    p_count = strata['count'].to_numpy(dtype=np.float64)
+    c_count = c_rows['count'].fillna(0).to_numpy(dtype=np.float64)
+    matched = (p_count > 0) & (c_count >= 2)
+    if not matched.any():
+        return {'error': 'Nenhum estrato com participantes e controle'}
+
+    p_mean = strata['mean'].to_numpy()
+    c_mean = c_rows['mean'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_var = np.where(p_count > 1, strata['m2'].to_numpy() / (p_count - 1), 0.0)
+        variance = p_var / p_count + c_rows['std'].to_numpy() ** 2 / c_count
+    diff = p_mean - c_mean
+
+    weights = np.where(matched, p_count, 0) / p_count[matched].sum()
+    att = float(np.sum(weights[matched] * diff[matched]))
+    att_se = float(np.sqrt(np.sum(weights[matched] ** 2 * variance[matched])))
+    control_mean = float(np.sum(weights[matched] * c_mean[matched]))
+    p_value = float(2 * stats.norm.sf(abs(att) / att_se)) if att_se > 0 else None
+
+    records = []
+    for i, key in enumerate(strata.index):
+        key = key if isinstance(key, tuple) else (key,)
+        record = dict(zip(strata.index.names, key))
+        record.update({
+            'participants': int(p_count[i]),
+            'control': int(c_count[i]),
+            'participants_mean': p_mean[i],
+            'control_mean': c_mean[i] if matched[i] else None,
+            'diff': diff[i] if matched[i] else None,
+            'se': float(np.sqrt(variance[i])) if matched[i] else None,
+            'weight': weights[i],
+            'matched': bool(matched[i])
+        })
+        records.append(record)
+
+    return {
+        'strata': records,
+        'att': att,
+        'att_se': att_se,
+        'att_pct': att / control_mean * 100 if control_mean > 0 else None,
+        'ci_low': att - 1.96 * att_se,
+        'ci_high': att + 1.96 * att_se,
+        'p_value': p_value,
+        'significant': p_value < 0.05 if p_value is not None else None,
+        'control_mean_reweighted': control_mean,
+        'matched_participants': int(p_count[matched].sum()),
+        'pruned_participants': int(p_count[~matched].sum()),
+        'n_strata': int(matched.sum())
+    }
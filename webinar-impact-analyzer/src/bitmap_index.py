@@ -0,0 +1,75 @@
+"""
+Bitmap index module for Webinar Impact Analyzer
+Per-value bitmaps over a table, so any filter combination is a few AND/ORs
+"""
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+
+@dataclass
+class BitmapIndex:
+    """
+    One packed bitmap (np.packbits, a bit per row) per distinct value of each
+    indexed column
+
+    A multi-select filter is the OR of its values' bitmaps and filters on
+    different columns are ANDed, so selecting rows never scans the table.
+    Rows with a missing value are in no bitmap.
+    """
+    size: int
+    bitmaps: Dict[str, Dict[Any, np.ndarray]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, columns: Dict[str, str]) -> 'BitmapIndex':
+        """Index the given columns ({name: column}) with one sort per column"""
+        bitmaps = {}
+        for name, col in columns.items():
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+            column_bitmaps = {}
+            for i, value in enumerate(uniques):
+                bits = np.zeros(len(df), dtype=bool)
+                bits[order[bounds[i]:bounds[i + 1]]] = True
+                column_bitmaps[value] = np.packbits(bits)
+            bitmaps[name] = column_bitmaps
+        return cls(size=len(df), bitmaps=bitmaps)
+
+    def values(self, name: str) -> List[Any]:
+        """Indexed values of a column, sorted"""
+        return list(self.bitmaps.get(name, {}))
+
+    def everything(self) -> np.ndarray:
+        return np.packbits(np.ones(self.size, dtype=bool))
+
+    def any_of(self, name: str, values: Iterable) -> np.ndarray:
+        """OR of the bitmaps of the given values (unknown values match nothing)"""
+        column = self.bitmaps.get(name, {})
+        result = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for value in values:
+            if value in column:
+                np.bitwise_or(result, column[value], out=result)
+        return result
+
+    def select(self, **filters: Optional[Iterable]) -> np.ndarray:
+        """
+        AND of any_of over the given columns
+
+        A filter of None keeps every row, as does a column that is not
+        indexed (e.g. absent from the uploaded base).
+        """
+        result = self.everything()
+        for name, values in filters.items():
+            if values is None or name not in self.bitmaps:
+                continue
+            np.bitwise_and(result, self.any_of(name, values), out=result)
+        return result
+
+    def rows(self, bitmap: np.ndarray) -> np.ndarray:
+        """Sorted row positions set in a bitmap"""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.size))
@@ -0,0 +1,287 @@
+"""
+Cache module for Webinar Impact Analyzer
+Content-addressed LRU cache shared by every session of the app
+"""
+import dataclasses
+import hashlib
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Memory budget for cached frames (override with WEBINAR_CACHE_MAX_MB)
+DEFAULT_MAX_BYTES = int(os.environ.get('WEBINAR_CACHE_MAX_MB', '1024')) * 1024 * 1024
+# Separate budget for serialised figures (override with WEBINAR_FIGURE_CACHE_MAX_MB)
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get('WEBINAR_FIGURE_CACHE_MAX_MB', '64')) * 1024 * 1024
+
+# Read uploaded files in blocks while hashing to avoid a second full copy
+_HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def _hash_stream(file) -> str:
+    """Hash a file-like object from the start, restoring its position"""
+    digest = hashlib.blake2b(digest_size=16)
+    position = file.tell() if hasattr(file, 'tell') else 0
+    file.seek(0)
+    while True:
+        block = file.read(_HASH_BLOCK_SIZE)
+        if not block:
+            break
+        digest.update(block if isinstance(block, bytes) else block.encode('utf-8'))
+    file.seek(position)
+    return digest.hexdigest()
+
+
+_fingerprints: Dict[Hashable, str] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(file) -> str:
+    """
+    Return a content hash for an uploaded file
+
+    Streamlit uploads carry a ``file_id`` that is stable for the lifetime of
+    the upload, so the content is only hashed once per upload.
+    """
+    upload_id = getattr(file, 'file_id', None)
+    if upload_id is not None:
+        with _fingerprints_lock:
+            cached = _fingerprints.get(upload_id)
+        if cached is not None:
+            return cached
+
+    if hasattr(file, 'getbuffer'):
+        with file.getbuffer() as view:
+            fingerprint = hashlib.blake2b(view, digest_size=16).hexdigest()
+    else:
+        fingerprint = _hash_stream(file)
+
+    if upload_id is not None:
+        with _fingerprints_lock:
+            _fingerprints[upload_id] = fingerprint
+    return fingerprint
+
+
+def _update_fingerprint(digest, value: Any) -> None:
+    """Feed a value's type and content into a running hash"""
+    digest.update(type(value).__name__.encode('utf-8'))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().data)
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(f'{value.dtype}{value.shape}'.encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, np.ndarray):
+        _update_fingerprint(digest, value.tolist())
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _update_fingerprint(digest, key)
+            _update_fingerprint(digest, item)
+    elif isinstance(value, (list, tuple)):
+        digest.update(str(len(value)).encode('utf-8'))
+        for item in value:
+            _update_fingerprint(digest, item)
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        digest.update(_dataclass_fingerprint(value).encode('utf-8'))
+    else:
+        digest.update(repr(value).encode('utf-8'))
+
+
+_dataclass_fingerprints: Dict[int, Tuple[weakref.ref, str]] = {}
+
+
+def _dataclass_fingerprint(value: Any) -> str:
+    """
+    Fingerprint of a dataclass instance, hashed once per object
+
+    Dataclasses here (ControlBaseline, MatchedControl, ...) are built once
+    and then read-only like every cached value, so the hash of a large
+    baseline is not recomputed on every rerun.
+    """
+    entry = _dataclass_fingerprints.get(id(value))
+    if entry is not None and entry[0]() is value:
+        return entry[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    for f in dataclasses.fields(value):
+        _update_fingerprint(digest, getattr(value, f.name))
+    result = digest.hexdigest()
+
+    key = id(value)
+    _dataclass_fingerprints[key] = (
+        weakref.ref(value, lambda _: _dataclass_fingerprints.pop(key, None)),
+        result
+    )
+    return result
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Return a content hash for a nested value
+
+    Handles dicts, lists, tuples, NumPy arrays, pandas objects, dataclasses
+    and scalars, so caches can be keyed on analysis results themselves.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_fingerprint(digest, value)
+    return digest.hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory footprint (bytes) of a cached value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(
+            estimate_size(getattr(value, f.name)) for f in dataclasses.fields(value)
+        )
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by an approximate memory budget
+
+    Values are returned by reference: callers must treat cached DataFrames
+    as read-only and copy before mutating.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value and mark it as most recently used"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        """Store a value, evicting least recently used entries over budget"""
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            # Never let a single oversized entry flush the whole cache
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(old_key)
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        keep: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Return the cached value for ``key``, computing it on a miss
+
+        Concurrent sessions asking for the same key wait for the first one
+        instead of repeating the parse/merge work. When ``keep`` is given, a
+        computed value is only stored if keep(value) is true.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            value = self.get(key, missing)
+            if value is missing:
+                value = compute()
+                if keep is None or keep(value):
+                    self.put(key, value)
+
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def clear(self) -> None:
+        """Remove every cached entry"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache usage statistics"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+_shared_cache: Optional[LRUCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> LRUCache:
+    """Return the process-wide cache shared by all sessions"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LRUCache()
+        return _shared_cache
+
+
+_figure_cache: Optional[LRUCache] = None
+
+
+def get_figure_cache() -> LRUCache:
+    """Return the process-wide cache of serialised figures (own memory budget)"""
+    global _figure_cache
+    with _shared_cache_lock:
+        if _figure_cache is None:
+            _figure_cache = LRUCache(FIGURE_CACHE_MAX_BYTES)
+        return _figure_cache
@@ -0,0 +1,133 @@
+"""
+Cube module for Webinar Impact Analyzer
+Pre-aggregated participation cells so any filter selection is a sum of cells
+"""
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterable, Optional, Tuple
+from src.data_processor import NO_SELLER_STATUSES, calculate_status_changes, categorize_store_ages
+from src.analysis.accumulators import GMVAccumulator, combine_accumulators
+from src.analysis.control_baseline import GMV_COLUMNS
+from src.analysis.leaderboard import STATUS_AT_WEBINAR, STORE_ATTRIBUTES
+
+
+MONTH_COLUMN = 'Data do Webinar (mês)'
+CUBE_DIMENSIONS = ['month', 'webinar', 'webinar_status', 'status', 'age_category']
+COUNT_COLUMNS = ['participations', 'converted', 'upgrade', 'downgrade', 'maintained', 'unknown']
+
+# Cells are small, so the sketches can be too (exact below this many values)
+CUBE_SKETCH_K = 500
+
+
+@dataclass
+class ParticipationCube:
+    """
+    Sufficient statistics per (month, webinar, webinar status, status at
+    the webinar, store age category) cell
+
+    The grain is one participation: a store attending a webinar (first row
+    per webinar and store, as in the leaderboard). A single webinar's cells
+    therefore match the filtered analyses exactly; selections spanning
+    several webinars count a store once per webinar it attended.
+    """
+    cells: pd.DataFrame
+    gmv: Dict[Tuple, Dict[str, GMVAccumulator]] = field(default_factory=dict)
+
+    def select(
+        self,
+        months: Optional[Iterable] = None,
+        webinars: Optional[Iterable] = None,
+        statuses: Optional[Iterable] = None,
+        webinar_statuses: Optional[Iterable] = None,
+        age_categories: Optional[Iterable] = None
+    ) -> pd.DataFrame:
+        """Cells matching every given list of values (None keeps a dimension whole)"""
+        filters = {
+            'month': months, 'webinar': webinars, 'webinar_status': webinar_statuses,
+            'status': statuses, 'age_category': age_categories
+        }
+        mask = np.ones(len(self.cells), dtype=bool)
+        for level, values in filters.items():
+            if values is not None:
+                mask &= self.cells.index.get_level_values(level).isin(list(values))
+        return self.cells[mask]
+
+    def query(
+        self,
+        months: Optional[Iterable] = None,
+        webinars: Optional[Iterable] = None,
+        statuses: Optional[Iterable] = None,
+        webinar_statuses: Optional[Iterable] = None,
+        age_categories: Optional[Iterable] = None,
+        gmv_cols: Iterable[str] = GMV_COLUMNS
+    ) -> Dict[str, Any]:
+        """
+        Headline H1/H2/H3 metrics of a selection, summed from its cells
+
+        Returns participations, conversions and conversion rate, transition
+        counts and rates, and calculate_gmv_stats-style GMV statistics (mean
+        and std exact, median and quartiles from the merged sketches).
+        """
+        cells = self.select(months, webinars, statuses, webinar_statuses, age_categories)
+        totals = {col: int(cells[col].sum()) for col in COUNT_COLUMNS}
+
+        participations = totals['participations']
+        valid = totals['upgrade'] + totals['downgrade'] + totals['maintained']
+        result = {
+            **totals,
+            'conversion_rate': totals['converted'] / participations * 100 if participations else 0.0,
+            'valid_transitions': valid,
+            'upgrade_rate': totals['upgrade'] / valid * 100 if valid else None,
+            'downgrade_rate': totals['downgrade'] / valid * 100 if valid else None,
+            'maintained_rate': totals['maintained'] / valid * 100 if valid else None,
+            'cells': len(cells)
+        }
+        for gmv_col in gmv_cols:
+            accumulators = [self.gmv[key][gmv_col] for key in cells.index if gmv_col in self.gmv.get(key, {})]
+            result[gmv_col] = combine_accumulators(accumulators, CUBE_SKETCH_K).stats()
+        return result
+
+
+def build_cube(
+    webinar_df: pd.DataFrame,
+    store_df: pd.DataFrame,
+    gmv_cols: Iterable[str] = GMV_COLUMNS
+) -> ParticipationCube:
+    """Aggregate every participation into cube cells in one grouped pass"""
+    dims = {
+        'month': MONTH_COLUMN, 'webinar': 'webinar_name', 'webinar_status': 'webinar_status',
+        'status': STATUS_AT_WEBINAR, 'age_category': 'age_category'
+    }
+    source = [col for col in dims.values() if col in webinar_df.columns]
+    key = ['webinar_name', 'store_id'] if 'webinar_name' in source else ['store_id']
+    pairs = webinar_df[['store_id'] + source].drop_duplicates(key)
+    merged = pairs.merge(store_df[['store_id'] + STORE_ATTRIBUTES], on='store_id', how='left')
+    merged['age_category'] = categorize_store_ages(merged['store_age_days'])
+
+    # Missing dimension values become '' so every cell key is hashable and comparable
+    frame = pd.DataFrame({
+        name: merged[col].astype(object).where(merged[col].notna(), '') if col in merged.columns else ''
+        for name, col in dims.items()
+    }, index=merged.index)
+    status_before = frame['status']
+    status_after = merged['current_status']
+    change = pd.Series(calculate_status_changes(status_before, status_after), index=merged.index)
+
+    frame['participations'] = 1
+    frame['converted'] = status_before.isin(NO_SELLER_STATUSES) & ~status_after.isin(NO_SELLER_STATUSES)
+    for transition in ('upgrade', 'downgrade', 'maintained', 'unknown'):
+        frame[transition] = change == transition
+
+    grouped = frame.groupby(CUBE_DIMENSIONS, observed=True)
+    cells = grouped[COUNT_COLUMNS].sum().astype(np.int64)
+
+    gmv = {}
+    gmv_cols = [col for col in gmv_cols if col in merged.columns]
+    for key, index in grouped.indices.items():
+        gmv[key] = {
+            gmv_col: GMVAccumulator.from_values(merged[gmv_col].to_numpy()[index], CUBE_SKETCH_K)
+            for gmv_col in gmv_cols
+        }
+
+    return ParticipationCube(cells=cells, gmv=gmv)
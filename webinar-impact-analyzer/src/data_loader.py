@@ -3,9 +3,41 @@ Data loader module for Webinar Impact Analyzer
 Handles file upload and validation
 """
 import pandas as pd
-import streamlit as st
-from typing import Tuple, Optional
-from datetime import datetime
+import numpy as np
+import time
+from typing import Tuple, Optional, Dict, Any, Union
+from datetime import date, datetime
+from src.file_readers import read_table
+from src.schema import apply_webinar_schema, apply_store_schema
+
+
+# Columns read from each upload (everything else is skipped at parse time)
+WEBINAR_COLUMNS = [
+    'store_id',
+    'Data do Webinar (mês)',
+    'webinar_name',
+    'webinar_status',
+    'first_seller_at',
+    'created_at',
+    'Máx. Seller Segment Mes Webinar',
+    'Máx. Seller Segment Mes-1 Webinar'
+]
+
+STORE_COLUMN_NAMES = {
+    '<Coluna 1>': 'gmv_d30',
+    '<Coluna 2>': 'gmv_d90',
+    '<Coluna 3>': 'current_status',
+    '<Coluna 4>': 'store_age_days'
+}
+STORE_COLUMNS = ['store_id'] + list(STORE_COLUMN_NAMES) + list(STORE_COLUMN_NAMES.values())
+
+# Store exports without a header row follow the documented column order
+STORE_POSITIONAL_COLUMNS = ['store_id'] + list(STORE_COLUMN_NAMES)
+
+DATE_FORMAT = '%d/%m/%Y'
+
+# Number of offending raw values kept in a parse report
+REPORT_EXAMPLES = 5
 
 
 def parse_date(date_str: str) -> Optional[datetime]:
@@ -41,10 +73,77 @@ def parse_webinar_month(month_str: str) -> Optional[str]:
     return None
 
 
-def load_webinar_data(file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+def _parse_report(raw: pd.Series, blank: pd.Series, parsed: pd.Series) -> Dict[str, Any]:
+    """Summarise the rows that had a value but could not be parsed"""
+    invalid = parsed.isna() & ~blank
+    return {
+        'rows': len(raw),
+        'invalid': int(invalid.sum()),
+        'examples': raw[invalid].drop_duplicates().head(REPORT_EXAMPLES).tolist()
+    }
+
+
+def parse_date_column(values: pd.Series) -> Tuple[pd.Series, Dict[str, Any]]:
+    """
+    Vectorized parse_date for a whole column
+    
+    Returns the parsed datetimes (NaT when missing/invalid) and a report of
+    the rows that had a value but did not match DATE_FORMAT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # Already typed (e.g. real date cells from Excel)
+        return values, _parse_report(values, values.isna(), values)
+    
+    raw = values.astype('string').str.strip()
+    blank = raw.isna() | (raw == '')
+    parsed = pd.to_datetime(raw, format=DATE_FORMAT, errors='coerce')
+    
+    # Spreadsheets mix date cells with text: convert the non-text leftovers
+    leftover = parsed.isna() & ~blank
+    if values.dtype == object and leftover.any():
+        candidates = values[leftover]
+        is_date = candidates.map(lambda v: isinstance(v, (date, datetime)))
+        if is_date.any():
+            parsed[candidates.index[is_date]] = pd.to_datetime(candidates[is_date])
+    
+    return parsed, _parse_report(raw, blank, parsed)
+
+
+def parse_webinar_month_column(values: pd.Series) -> Tuple[pd.Series, Dict[str, Any]]:
+    """
+    Vectorized parse_webinar_month: each distinct label is parsed once
+    
+    Returns the YYYY-MM strings (None when missing/invalid) and a parse report.
+    """
+    codes, uniques = pd.factorize(values)
+    # Trailing None so the NaN sentinel code (-1) maps to None
+    lookup = np.array([parse_webinar_month(u) for u in uniques] + [None], dtype=object)
+    parsed = pd.Series(lookup[codes], index=values.index, name=values.name)
+    
+    raw = values.astype('string')
+    blank = raw.isna() | (raw.str.strip() == '')
+    return parsed, _parse_report(raw, blank, parsed)
+
+
+def _finish_load_metrics(df: pd.DataFrame, load_metrics: Dict[str, Any], start: float) -> None:
+    """Attach read + normalisation timings to the loaded frame"""
+    df.attrs['load_metrics'] = dict(
+        load_metrics,
+        total_seconds=time.perf_counter() - start,
+        memory_bytes=int(df.memory_usage(index=True, deep=True).sum())
+    )
+
+
+def load_webinar_data(
+    file,
+    sheet_name: Optional[Union[str, int]] = None
+) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """
     Load and validate webinar participation data
     
+    Accepts CSV/TSV, Excel (sheet_name selects the sheet), Parquet and
+    Arrow IPC/Feather; only WEBINAR_COLUMNS are read.
+    
     Expected columns:
     - store_id
     - Data do Webinar (mês)
@@ -53,14 +152,14 @@ def load_webinar_data(file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     - first_seller_at
     - Máx. Seller Segment Mes Webinar
     - Máx. Seller Segment Mes-1 Webinar
+    
+    Values that could not be parsed are summarised per column in
+    df.attrs['parse_report']; timings are in df.attrs['load_metrics'].
     """
+    start = time.perf_counter()
     try:
-        # Try different separators
-        try:
-            df = pd.read_csv(file, sep='\t', encoding='utf-8')
-        except Exception:
-            file.seek(0)
-            df = pd.read_csv(file, sep=',', encoding='utf-8')
+        df = read_table(file, WEBINAR_COLUMNS, sheet_name)
+        load_metrics = df.attrs.get('load_metrics', {})
         
         # Check required columns
         required_cols = ['store_id']
@@ -68,16 +167,24 @@ def load_webinar_data(file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
         if missing:
             return None, f"Colunas obrigatórias faltando: {missing}"
         
+        parse_report = {}
+        
         # Parse dates
         if 'first_seller_at' in df.columns:
-            df['first_seller_at_parsed'] = df['first_seller_at'].apply(parse_date)
+            df['first_seller_at_parsed'], parse_report['first_seller_at'] = (
+                parse_date_column(df['first_seller_at'])
+            )
         
         if 'created_at' in df.columns:
-            df['created_at_parsed'] = df['created_at'].apply(parse_date)
+            df['created_at_parsed'], parse_report['created_at'] = (
+                parse_date_column(df['created_at'])
+            )
         
         # Parse webinar month
         if 'Data do Webinar (mês)' in df.columns:
-            df['webinar_month'] = df['Data do Webinar (mês)'].apply(parse_webinar_month)
+            df['webinar_month'], parse_report['Data do Webinar (mês)'] = (
+                parse_webinar_month_column(df['Data do Webinar (mês)'])
+            )
         
         # Normalize status columns
         status_cols = ['Máx. Seller Segment Mes Webinar', 'Máx. Seller Segment Mes-1 Webinar']
@@ -85,16 +192,63 @@ def load_webinar_data(file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
             if col in df.columns:
                 df[col] = df[col].fillna('').str.strip().str.lower()
         
+        df = apply_webinar_schema(df)
+        df.attrs['parse_report'] = parse_report
+        _finish_load_metrics(df, load_metrics, start)
         return df, None
         
     except Exception as e:
         return None, f"Erro ao carregar arquivo: {str(e)}"
 
 
-def load_store_data(file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+def normalize_store_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Rename, type and compact a frame read from the store base
+    
+    Applied to the whole file by load_store_data and to each chunk in
+    streaming mode. Returns the frame and an error message (None when valid).
+    """
+    # Rename columns for clarity
+    # (only the projected columns are read, so match them by name)
+    cols = df.columns.tolist()
+    rename_map = {
+        source: target for source, target in STORE_COLUMN_NAMES.items()
+        if source in cols
+    }
+    
+    if rename_map:
+        df = df.rename(columns=rename_map)
+    
+    # Check required columns
+    if 'store_id' not in df.columns:
+        return df, "Coluna 'store_id' não encontrada"
+    
+    # Convert GMV columns to numeric
+    for col in ['gmv_d30', 'gmv_d90']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    
+    # Convert store age to numeric
+    if 'store_age_days' in df.columns:
+        df['store_age_days'] = pd.to_numeric(df['store_age_days'], errors='coerce').fillna(0)
+    
+    # Normalize status
+    if 'current_status' in df.columns:
+        df['current_status'] = df['current_status'].fillna('').str.strip().str.lower()
+    
+    return apply_store_schema(df), None
+
+
+def load_store_data(
+    file,
+    sheet_name: Optional[Union[str, int]] = None
+) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """
     Load and validate store data (total base)
     
+    Accepts CSV/TSV, Excel (sheet_name selects the sheet), Parquet and
+    Arrow IPC/Feather; only STORE_COLUMNS are read.
+    
     Expected columns:
     - store_id
     - <Coluna 1> (GMV D-30)
@@ -102,49 +256,16 @@ def load_store_data(file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     - <Coluna 3> (current_status)
     - <Coluna 4> (store_age)
     """
+    start = time.perf_counter()
     try:
-        # Try different separators
-        try:
-            df = pd.read_csv(file, sep='\t', encoding='utf-8')
-        except Exception:
-            file.seek(0)
-            df = pd.read_csv(file, sep=',', encoding='utf-8')
-        
-        # Rename columns for clarity
-        cols = df.columns.tolist()
-        rename_map = {}
+        df = read_table(file, STORE_COLUMNS, sheet_name, default_names=STORE_POSITIONAL_COLUMNS)
+        load_metrics = df.attrs.get('load_metrics', {})
         
-        if len(cols) >= 5:
-            # Assuming standard format from Nuvemshop export
-            if '<Coluna 1>' in cols:
-                rename_map['<Coluna 1>'] = 'gmv_d30'
-            if '<Coluna 2>' in cols:
-                rename_map['<Coluna 2>'] = 'gmv_d90'
-            if '<Coluna 3>' in cols:
-                rename_map['<Coluna 3>'] = 'current_status'
-            if '<Coluna 4>' in cols:
-                rename_map['<Coluna 4>'] = 'store_age_days'
-        
-        if rename_map:
-            df = df.rename(columns=rename_map)
-        
-        # Check required columns
-        if 'store_id' not in df.columns:
-            return None, "Coluna 'store_id' não encontrada"
-        
-        # Convert GMV columns to numeric
-        for col in ['gmv_d30', 'gmv_d90']:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        
-        # Convert store age to numeric
-        if 'store_age_days' in df.columns:
-            df['store_age_days'] = pd.to_numeric(df['store_age_days'], errors='coerce').fillna(0)
-        
-        # Normalize status
-        if 'current_status' in df.columns:
-            df['current_status'] = df['current_status'].fillna('').str.strip().str.lower()
+        df, error = normalize_store_data(df)
+        if error:
+            return None, error
         
+        _finish_load_metrics(df, load_metrics, start)
         return df, None
         
     except Exception as e:
@@ -165,7 +286,27 @@ def get_status_order():
     }
 
 
+_STATUS_ORDER = get_status_order()
+
+
 def status_to_numeric(status: str) -> int:
     """Convert status string to numeric value"""
-    order = get_status_order()
-    return order.get(str(status).lower().strip(), -1)
+    return _STATUS_ORDER.get(str(status).lower().strip(), -1)
+
+
+def encode_status(statuses: pd.Series) -> np.ndarray:
+    """
+    Vectorized status_to_numeric for a whole column
+    
+    Only the distinct values go through status_to_numeric; rows are mapped
+    back through their factorized codes. Missing/unknown statuses get -1.
+    """
+    statuses = pd.Series(statuses, copy=False)
+    if isinstance(statuses.dtype, pd.CategoricalDtype):
+        # Categorical columns already carry their codes
+        codes, uniques = statuses.cat.codes.to_numpy(), statuses.cat.categories
+    else:
+        codes, uniques = pd.factorize(statuses)
+    # Trailing -1 so the NaN sentinel code (-1) also maps to -1
+    lookup = np.array([status_to_numeric(u) for u in uniques] + [-1], dtype=np.int8)
+    return lookup[codes]
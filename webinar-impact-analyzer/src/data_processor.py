@@ -4,8 +4,16 @@ Handles data matching and control group creation
 """
 import pandas as pd
 import numpy as np
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
 from datetime import datetime
+from src.data_loader import status_to_numeric, encode_status
+
+
+# Upper bounds (inclusive, in days) of each store age category
+AGE_BINS = [90, 180, 365, 730]
+AGE_LABELS = ['0-3 meses', '3-6 meses', '6-12 meses', '1-2 anos', '2+ anos']
+NO_SELLER_STATUSES = ['', 'no-seller']
+STORE_COLUMNS = ['gmv_d30', 'gmv_d90', 'current_status', 'store_age_days']
 
 
 def create_participant_summary(webinar_df: pd.DataFrame) -> pd.DataFrame:
@@ -34,6 +42,16 @@ def create_participant_summary(webinar_df: pd.DataFrame) -> pd.DataFrame:
     return participants
 
 
+def merge_participants(webinar_df: pd.DataFrame, store_df: pd.DataFrame) -> pd.DataFrame:
+    """Participant summary joined with the store data (no control group)"""
+    participants = create_participant_summary(webinar_df)
+    return participants.merge(
+        store_df[['store_id'] + STORE_COLUMNS],
+        on='store_id',
+        how='left'
+    )
+
+
 def merge_datasets(
     webinar_df: pd.DataFrame, 
     store_df: pd.DataFrame
@@ -42,18 +60,11 @@ def merge_datasets(
     Merge webinar participation data with store data
     Returns: (participants_df, control_df)
     """
-    # Create participant summary
-    participants = create_participant_summary(webinar_df)
+    # Merge participants with store data
+    participants_merged = merge_participants(webinar_df, store_df)
     
     # Get list of participant store_ids
-    participant_ids = set(participants['store_id'].unique())
-    
-    # Merge participants with store data
-    participants_merged = participants.merge(
-        store_df[['store_id', 'gmv_d30', 'gmv_d90', 'current_status', 'store_age_days']],
-        on='store_id',
-        how='left'
-    )
+    participant_ids = set(participants_merged['store_id'].unique())
     
     # Create control group (stores that didn't participate)
     control_df = store_df[~store_df['store_id'].isin(participant_ids)].copy()
@@ -61,10 +72,23 @@ def merge_datasets(
     return participants_merged, control_df
 
 
+def subset_participants(webinar_df: pd.DataFrame, participants_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepared participants of a subset of the webinar rows
+    
+    Only the per-store summary (first webinar, status at it, count) depends
+    on the subset. The store columns are looked up by store_id in the
+    already merged participants_df (every participant, prepared), so the
+    store base is not joined again.
+    """
+    participants = create_participant_summary(webinar_df)
+    store_columns = participants_df.set_index('store_id')[STORE_COLUMNS]
+    participants = participants.join(store_columns, on='store_id')
+    return prepare_analysis_data(participants)['participants']
+
+
 def calculate_status_change(status_before: str, status_after: str) -> str:
     """Calculate if status improved, declined, or stayed the same"""
-    from src.data_loader import status_to_numeric
-    
     before_num = status_to_numeric(status_before)
     after_num = status_to_numeric(status_after)
     
@@ -78,6 +102,18 @@ def calculate_status_change(status_before: str, status_after: str) -> str:
         return 'maintained'
 
 
+def calculate_status_changes(status_before: pd.Series, status_after: pd.Series) -> np.ndarray:
+    """Vectorized calculate_status_change for whole columns"""
+    before_num = encode_status(status_before)
+    after_num = encode_status(status_after)
+    
+    return np.select(
+        [(before_num < 0) | (after_num < 0), after_num > before_num, after_num < before_num],
+        ['unknown', 'upgrade', 'downgrade'],
+        default='maintained'
+    ).astype(object)
+
+
 def categorize_store_age(age_days: float) -> str:
     """Categorize store by age in days"""
     if pd.isna(age_days) or age_days < 0:
@@ -94,36 +130,46 @@ def categorize_store_age(age_days: float) -> str:
         return '2+ anos'
 
 
+def categorize_store_ages(age_days: pd.Series) -> pd.Series:
+    """Vectorized categorize_store_age using the AGE_BINS edges (ordered categorical)"""
+    values = pd.to_numeric(age_days, errors='coerce').to_numpy(dtype=np.float64)
+    
+    # side='left' keeps each bin's upper bound inclusive (age <= 90 -> bin 0)
+    bins = np.searchsorted(AGE_BINS, values, side='left')
+    bins[np.isnan(values) | (values < 0)] = len(AGE_LABELS)
+    
+    categories = pd.Categorical.from_codes(bins, categories=AGE_LABELS + ['unknown'], ordered=True)
+    return pd.Series(categories, index=age_days.index, name=age_days.name)
+
+
 def prepare_analysis_data(
     participants_df: pd.DataFrame,
-    control_df: pd.DataFrame
+    control_df: Optional[pd.DataFrame] = None
 ) -> Dict[str, pd.DataFrame]:
     """
     Prepare data for all three hypothesis analyses
+    
+    Pass control_df=None when the control group is already summarised in a
+    ControlBaseline; only the participants are prepared then.
     """
     # Add status change for participants
     participants_df = participants_df.copy()
-    participants_df['status_change'] = participants_df.apply(
-        lambda row: calculate_status_change(
-            row.get('status_at_webinar', ''),
-            row.get('current_status', '')
-        ),
-        axis=1
+    participants_df['status_change'] = calculate_status_changes(
+        participants_df['status_at_webinar'],
+        participants_df['current_status']
     )
     
     # Add age category
-    participants_df['age_category'] = participants_df['store_age_days'].apply(categorize_store_age)
-    control_df = control_df.copy()
-    control_df['age_category'] = control_df['store_age_days'].apply(categorize_store_age)
+    participants_df['age_category'] = categorize_store_ages(participants_df['store_age_days'])
+    if control_df is not None:
+        control_df = control_df.copy()
+        control_df['age_category'] = categorize_store_ages(control_df['store_age_days'])
     
     # Identify first sellers (converted after webinar)
     # We'll mark stores that had no seller status at webinar but now have sales
-    participants_df['had_first_sale_after'] = participants_df.apply(
-        lambda row: (
-            row.get('status_at_webinar', '') in ['', 'no-seller'] and 
-            row.get('current_status', '') not in ['', 'no-seller']
-        ),
-        axis=1
+    participants_df['had_first_sale_after'] = (
+        participants_df['status_at_webinar'].isin(NO_SELLER_STATUSES) &
+        ~participants_df['current_status'].isin(NO_SELLER_STATUSES)
     )
     
     return {
@@ -140,10 +186,25 @@ def get_webinar_list(webinar_df: pd.DataFrame) -> List[str]:
 
 
 def get_month_list(webinar_df: pd.DataFrame) -> List[str]:
-    """Get unique list of months"""
-    if 'Data do Webinar (mês)' in webinar_df.columns:
-        return sorted(webinar_df['Data do Webinar (mês)'].dropna().unique().tolist())
-    return []
+    """
+    Get unique list of months in calendar order
+
+    The labels ("Month 09 - September 2025") do not sort across a year
+    boundary, so they are ordered by the parsed webinar_month (YYYY-MM);
+    labels that did not parse go last.
+    """
+    if 'Data do Webinar (mês)' not in webinar_df.columns:
+        return []
+    labels = webinar_df['Data do Webinar (mês)'].astype(object)
+    if 'webinar_month' not in webinar_df.columns:
+        return sorted(labels.dropna().unique().tolist())
+
+    months = pd.DataFrame({
+        'label': labels,
+        'month': webinar_df['webinar_month'].astype(object)
+    }).dropna(subset=['label']).drop_duplicates('label')
+    months['month'] = months['month'].fillna('9999-99')
+    return months.sort_values(['month', 'label'])['label'].tolist()
 
 
 def filter_by_webinar(webinar_df: pd.DataFrame, webinar_name: str) -> pd.DataFrame:
@@ -0,0 +1,642 @@
+"""
+Engine module for Webinar Impact Analyzer
+Headless load -> merge -> filter -> analyze pipeline with typed results
+
+Nothing here imports Streamlit: the dashboard, batch jobs and scripts all
+drive the same WebinarImpactEngine.
+"""
+import dataclasses
+import os
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from src.cache import LRUCache, file_fingerprint, get_shared_cache
+from src.bitmap_index import BitmapIndex
+from src.cube import ParticipationCube, build_cube
+from src.data_loader import load_webinar_data, load_store_data, get_status_order
+from src.schema import apply_webinar_schema, apply_store_schema
+from src.streaming import stream_store_data
+from src.data_processor import (
+    merge_datasets, merge_participants, prepare_analysis_data, subset_participants,
+    get_webinar_list, get_month_list
+)
+from src.analysis.control_baseline import GMV_COLUMNS, ControlBaseline, build_control_baseline
+from src.analysis.first_seller import analyze_first_seller_conversion
+from src.analysis.gmv_analysis import (
+    analyze_gmv_comparison,
+    analyze_gmv_by_segment,
+    compare_gmv_distributions
+)
+from src.analysis.status_evolution import analyze_status_evolution, get_sankey_data
+from src.analysis.leaderboard import analyze_leaderboard
+from src.analysis.matching import MatchedControl, match_control
+from src.analysis.stratified import participant_strata_table, select_strata, analyze_stratified
+from src.analysis.bootstrap import bootstrap_lift, bootstrap_gmv_difference, bootstrap_upgrade_rate
+from src.analysis.permutation import (
+    permutation_test_conversion,
+    permutation_test_gmv,
+    permutation_test_status_distribution
+)
+
+
+# Filter name -> indexed column
+WEBINAR_FILTER_COLUMNS = {
+    'month': 'Data do Webinar (mês)',
+    'webinar': 'webinar_name',
+    'webinar_status': 'webinar_status'
+}
+PARTICIPANT_FILTER_COLUMNS = {'status': 'status_at_webinar', 'age_category': 'age_category'}
+
+Source = Union[str, os.PathLike, Any]
+
+
+class DataLoadError(Exception):
+    """A base could not be loaded; the message is ready to show to the user"""
+
+
+@dataclass(frozen=True)
+class Filters:
+    """
+    A filter selection; None keeps every value of a dimension
+
+    Webinar filters (months, webinars, webinar statuses) select participation
+    rows, so they change each store's first webinar and status at it;
+    participant filters (initial status, store age) select stores.
+    """
+    months: Optional[Tuple[str, ...]] = None
+    webinars: Optional[Tuple[str, ...]] = None
+    webinar_statuses: Optional[Tuple[str, ...]] = None
+    statuses: Optional[Tuple[str, ...]] = None
+    age_categories: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def of(cls, **values: Optional[Iterable[str]]) -> 'Filters':
+        """Build from any iterables (an empty selection means all values)"""
+        return cls(**{name: tuple(v) if v else None for name, v in values.items()})
+
+    def webinar_filters(self) -> Dict[str, Optional[Tuple[str, ...]]]:
+        return {'month': self.months, 'webinar': self.webinars, 'webinar_status': self.webinar_statuses}
+
+    def participant_filters(self) -> Dict[str, Optional[Tuple[str, ...]]]:
+        return {'status': self.statuses, 'age_category': self.age_categories}
+
+
+def _selection_key(filters: Dict[str, Optional[Tuple[str, ...]]]) -> Tuple:
+    """Cache key part for the active filters"""
+    return tuple((name, tuple(values)) for name, values in filters.items() if values is not None)
+
+
+def _completed(result: Dict[str, Any]) -> bool:
+    """
+    Whether a time-budgeted run (bootstrap, permutation) finished in full
+
+    A run cut short by max_seconds depends on the server load at the time,
+    so it is returned but not cached.
+    """
+    parts = [result] + [value for value in result.values() if isinstance(value, dict)]
+    return not any(part.get('truncated') for part in parts)
+
+
+@dataclass
+class Dataset:
+    """
+    The two bases of one upload, with participants merged and the control summarised
+
+    store_df only holds the participants' rows when the store base was
+    streamed. With a matched control, `control` is the baseline of every
+    participant's nearest neighbours.
+    """
+    key: Tuple
+    webinar_df: pd.DataFrame
+    store_df: pd.DataFrame
+    participants: pd.DataFrame
+    control: ControlBaseline
+    matched: Optional[MatchedControl] = None
+    streamed: bool = False
+
+    @property
+    def webinar_count(self) -> int:
+        return self.webinar_df['webinar_name'].nunique() if 'webinar_name' in self.webinar_df.columns else 0
+
+    @property
+    def month_count(self) -> int:
+        column = WEBINAR_FILTER_COLUMNS['month']
+        return self.webinar_df[column].nunique() if column in self.webinar_df.columns else 0
+
+
+@dataclass
+class Selection:
+    """Participants and control group of one filter selection"""
+    key: Tuple
+    filters: Filters
+    participants: pd.DataFrame
+    control: ControlBaseline
+    strata_table: pd.DataFrame
+
+
+@dataclass
+class FirstSellerResult:
+    """H1: conversion to first sale, participants vs control seller rate"""
+    participants: int
+    converted: int
+    conversion_rate: float
+    control_seller_rate: float
+    lift: Optional[float]
+    p_value: Optional[float]
+    significant: Optional[bool]
+    details: Dict[str, Any] = field(repr=False)
+
+    @classmethod
+    def from_details(cls, details: Dict[str, Any]) -> 'FirstSellerResult':
+        test = details.get('chi_square') or {}
+        return cls(
+            participants=int(details['participants']['total']),
+            converted=int(details['participants']['converted']),
+            conversion_rate=float(details['participants']['conversion_rate']),
+            control_seller_rate=float(details['control']['seller_rate']),
+            lift=details.get('lift'),
+            p_value=test.get('p_value'),
+            significant=test.get('significant'),
+            details=details
+        )
+
+
+@dataclass
+class GMVResult:
+    """H2: GMV of participants vs control for one period"""
+    gmv_col: str
+    participants_mean: float
+    participants_median: float
+    control_mean: float
+    control_median: float
+    mean_diff_pct: Optional[float]
+    p_value: Optional[float]
+    significant: Optional[bool]
+    mannwhitney_p_value: Optional[float]
+    details: Dict[str, Any] = field(repr=False)
+
+    @classmethod
+    def from_details(cls, gmv_col: str, details: Dict[str, Any]) -> 'GMVResult':
+        ttest = details.get('ttest') or {}
+        mannwhitney = details.get('mannwhitney') or {}
+        return cls(
+            gmv_col=gmv_col,
+            participants_mean=float(details['participants']['mean']),
+            participants_median=float(details['participants']['median']),
+            control_mean=float(details['control']['mean']),
+            control_median=float(details['control']['median']),
+            mean_diff_pct=details.get('mean_diff_pct'),
+            p_value=ttest.get('p_value'),
+            significant=ttest.get('significant'),
+            mannwhitney_p_value=mannwhitney.get('p_value'),
+            details=details
+        )
+
+
+@dataclass
+class StatusEvolutionResult:
+    """H3: status transitions of participants and current status vs control"""
+    valid_transitions: int
+    upgrade_rate: Optional[float]
+    downgrade_rate: Optional[float]
+    maintained_rate: Optional[float]
+    p_value: Optional[float]
+    significant: Optional[bool]
+    details: Dict[str, Any] = field(repr=False)
+
+    @classmethod
+    def from_details(cls, details: Dict[str, Any]) -> 'StatusEvolutionResult':
+        transitions = details.get('participants_transitions') or {}
+        test = details.get('distribution_chi_square') or {}
+        return cls(
+            valid_transitions=int(transitions.get('valid_transitions', 0)),
+            upgrade_rate=transitions.get('upgrade_rate'),
+            downgrade_rate=transitions.get('downgrade_rate'),
+            maintained_rate=transitions.get('maintained_rate'),
+            p_value=test.get('p_value'),
+            significant=test.get('significant'),
+            details=details
+        )
+
+
+@dataclass
+class AnalysisReport:
+    """The three hypotheses for one filter selection"""
+    filters: Filters
+    participants: int
+    control_total: int
+    first_seller: FirstSellerResult
+    gmv: Dict[str, GMVResult]
+    status_evolution: StatusEvolutionResult
+
+    def to_dict(self, details: bool = False) -> Dict[str, Any]:
+        """Plain dictionary of the report (the full analysis outputs only with details=True)"""
+        report = dataclasses.asdict(self)
+        if not details:
+            report['first_seller'].pop('details')
+            report['status_evolution'].pop('details')
+            for result in report['gmv'].values():
+                result.pop('details')
+        return report
+
+
+@contextmanager
+def _opened(source: Source):
+    """Yield a binary file for a path, or the file-like object itself (e.g. an upload)"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield file
+    else:
+        yield source
+
+
+def _source_name(file) -> str:
+    """File name of a source, for error messages"""
+    return os.path.basename(getattr(file, 'name', '') or '') or '?'
+
+
+class WebinarImpactEngine:
+    """
+    Loading, merging, filtering and the three hypotheses behind one API
+
+    Every step is memoised in a content-keyed LRU cache (the process-wide
+    shared cache by default), so repeated calls with the same files and
+    selections are free and concurrent users share the work. Returned
+    frames and results are cached by reference: treat them as read-only.
+    """
+
+    def __init__(self, cache: Optional[LRUCache] = None):
+        self.cache = cache if cache is not None else get_shared_cache()
+
+    def _load(self, loader, file, **options):
+        """Run a loader once per file content and parse options"""
+        key = (loader.__name__, file_fingerprint(file), tuple(sorted(options.items())))
+
+        def compute():
+            file.seek(0)
+            return loader(file, **options)
+
+        return self.cache.get_or_compute(key, compute)
+
+    def load(
+        self,
+        webinar_source: Source,
+        store_source: Source,
+        webinar_sheet: Optional[str] = None,
+        store_sheet: Optional[str] = None,
+        stream_store: bool = False,
+        match_k: Optional[int] = None
+    ) -> Dataset:
+        """
+        Load both bases (paths or file-like objects) and prepare the analysis data
+
+        With stream_store the store base is read in chunks and the control
+        group only kept as aggregates; a matched control (match_k) needs the
+        control rows, so it is ignored then. Raises DataLoadError when a base
+        cannot be read.
+        """
+        if stream_store:
+            match_k = None
+
+        with _opened(webinar_source) as webinar_file, _opened(store_source) as store_file:
+            key = (
+                file_fingerprint(webinar_file), webinar_sheet,
+                file_fingerprint(store_file), store_sheet,
+                stream_store, match_k
+            )
+
+            webinar_df, error = self._load(load_webinar_data, webinar_file, sheet_name=webinar_sheet)
+            if error:
+                raise DataLoadError(f"Erro ao carregar base de webinar: {error}")
+
+            streamed_control = None
+            if stream_store:
+                def stream():
+                    store_file.seek(0)
+                    return stream_store_data(store_file, webinar_df['store_id'].unique(), sheet_name=store_sheet)
+
+                store_df, streamed_control, error = self.cache.get_or_compute(
+                    ('stream_store_data',) + key[:5], stream
+                )
+            else:
+                store_df, error = self._load(load_store_data, store_file, sheet_name=store_sheet)
+            if error:
+                raise DataLoadError(f"Erro ao carregar base de lojas: {error}")
+
+        return self._dataset(key, webinar_df, store_df, streamed_control, match_k)
+
+    def load_many(
+        self,
+        webinar_sources: Sequence[Source],
+        store_sources: Sequence[Source],
+        match_k: Optional[int] = None
+    ) -> Dataset:
+        """
+        Load several exports of each base (e.g. one file per month) as one dataset
+
+        Webinar files are stacked; store files are stacked too, and a store
+        in more than one keeps its row from the last file, so pass snapshots
+        oldest first. Raises DataLoadError naming the file that failed.
+        """
+        with ExitStack() as stack:
+            webinar_files = [stack.enter_context(_opened(source)) for source in webinar_sources]
+            store_files = [stack.enter_context(_opened(source)) for source in store_sources]
+            key = (
+                tuple(file_fingerprint(file) for file in webinar_files), None,
+                tuple(file_fingerprint(file) for file in store_files), None,
+                False, match_k
+            )
+
+            webinar_frames = []
+            for file in webinar_files:
+                df, error = self._load(load_webinar_data, file, sheet_name=None)
+                if error:
+                    raise DataLoadError(f"Erro ao carregar base de webinar ({_source_name(file)}): {error}")
+                webinar_frames.append(df)
+
+            store_frames = []
+            for file in store_files:
+                df, error = self._load(load_store_data, file, sheet_name=None)
+                if error:
+                    raise DataLoadError(f"Erro ao carregar base de lojas ({_source_name(file)}): {error}")
+                store_frames.append(df)
+
+        def stack_frames():
+            if len(webinar_frames) == 1 and len(store_frames) == 1:
+                return webinar_frames[0], store_frames[0]
+            # Categories differ between files, so the compact dtypes are re-applied
+            webinar_df = apply_webinar_schema(pd.concat(webinar_frames, ignore_index=True))
+            store_df = pd.concat(store_frames, ignore_index=True).drop_duplicates('store_id', keep='last')
+            return webinar_df, apply_store_schema(store_df.reset_index(drop=True))
+
+        webinar_df, store_df = self.cache.get_or_compute(('stacked',) + key, stack_frames)
+        return self._dataset(key, webinar_df, store_df, None, match_k)
+
+    def _dataset(
+        self,
+        key: Tuple,
+        webinar_df: pd.DataFrame,
+        store_df: pd.DataFrame,
+        streamed_control: Optional[ControlBaseline],
+        match_k: Optional[int]
+    ) -> Dataset:
+        """Prepare (once per key) the analysis data of loaded bases"""
+        analysis_data = self.cache.get_or_compute(
+            ('analysis_data',) + key,
+            lambda: self._prepare(webinar_df, store_df, streamed_control, match_k)
+        )
+        return Dataset(
+            key=key,
+            webinar_df=webinar_df,
+            store_df=store_df,
+            participants=analysis_data['participants'],
+            control=analysis_data['control'],
+            matched=analysis_data.get('matched'),
+            streamed=streamed_control is not None
+        )
+
+    @staticmethod
+    def _prepare(
+        webinar_df: pd.DataFrame,
+        store_df: pd.DataFrame,
+        control: Optional[ControlBaseline],
+        match_k: Optional[int]
+    ) -> Dict[str, Any]:
+        """
+        Merge and prepare the participants and reduce the control group
+
+        The control group becomes a ControlBaseline right away, so the full
+        control frame is never kept in the cache. With match_k, only the
+        participants' k nearest control stores are kept (as a MatchedControl)
+        and the baseline is built from them.
+        """
+        if control is not None:
+            participants_df = merge_participants(webinar_df, store_df)
+            return {
+                'participants': prepare_analysis_data(participants_df)['participants'],
+                'control': control
+            }
+        participants_df, control_df = merge_datasets(webinar_df, store_df)
+        analysis_data = prepare_analysis_data(participants_df, control_df)
+        if match_k:
+            matched = match_control(analysis_data['participants'], analysis_data['control'], match_k)
+            return {
+                'participants': analysis_data['participants'],
+                'control': matched.baseline(matched.participant_ids),
+                'matched': matched
+            }
+        return {
+            'participants': analysis_data['participants'],
+            'control': build_control_baseline(analysis_data['control'])
+        }
+
+    def webinar_index(self, dataset: Dataset) -> BitmapIndex:
+        """Per-value bitmaps over the webinar rows, built once per upload"""
+        return self.cache.get_or_compute(
+            ('webinar_index',) + dataset.key,
+            lambda: BitmapIndex.build(dataset.webinar_df, WEBINAR_FILTER_COLUMNS)
+        )
+
+    def filter_options(self, dataset: Dataset) -> Dict[str, List[str]]:
+        """Values each webinar filter can take (months in calendar order)"""
+        return {
+            'months': get_month_list(dataset.webinar_df),
+            'webinars': get_webinar_list(dataset.webinar_df),
+            'webinar_statuses': self.webinar_index(dataset).values('webinar_status')
+        }
+
+    def select(self, dataset: Dataset, filters: Filters = Filters()) -> Selection:
+        """
+        Participants and control group of a filter selection
+
+        Webinar filters are evaluated on the bitmap index of the webinar rows
+        and the selected rows re-summarised per store against the already
+        merged participants; participant filters then select stores through
+        a bitmap index of that participant table. A selection of webinar rows
+        that matches nothing keeps every participant. A matched control
+        follows the selected participants.
+        """
+        participants = dataset.participants
+        filter_key = dataset.key + _selection_key(filters.webinar_filters())
+
+        if filter_key != dataset.key:
+            index = self.webinar_index(dataset)
+            rows = index.rows(index.select(**filters.webinar_filters()))
+            if len(rows) > 0:
+                participants = self.cache.get_or_compute(
+                    ('participants',) + filter_key,
+                    lambda: subset_participants(dataset.webinar_df.iloc[rows], dataset.participants)
+                )
+
+        # Initial status and age are strata, so the strata table is built
+        # before those filters and they only select its rows
+        strata_table = self.cache.get_or_compute(
+            ('participant_strata',) + filter_key,
+            lambda: participant_strata_table(participants)
+        )
+
+        participants_key = filter_key + _selection_key(filters.participant_filters())
+        if participants_key != filter_key:
+            participant_index = self.cache.get_or_compute(
+                ('participant_index',) + filter_key,
+                lambda: BitmapIndex.build(participants, PARTICIPANT_FILTER_COLUMNS)
+            )
+            participants = participants.iloc[
+                participant_index.rows(participant_index.select(**filters.participant_filters()))
+            ]
+            strata_table = select_strata(strata_table, filters.statuses, filters.age_categories)
+
+        control = dataset.control
+        if dataset.matched is not None and participants_key != dataset.key:
+            control = self.cache.get_or_compute(
+                ('matched_baseline',) + participants_key,
+                lambda: dataset.matched.baseline(participants['store_id'])
+            )
+
+        return Selection(
+            key=participants_key,
+            filters=filters,
+            participants=participants,
+            control=control,
+            strata_table=strata_table
+        )
+
+    def cube(self, dataset: Dataset) -> ParticipationCube:
+        """Pre-aggregated participation cube of the upload"""
+        return self.cache.get_or_compute(
+            ('cube',) + dataset.key,
+            lambda: build_cube(dataset.webinar_df, dataset.store_df)
+        )
+
+    def first_seller(self, selection: Selection) -> FirstSellerResult:
+        """H1 for a selection"""
+        details = self.cache.get_or_compute(
+            ('h1',) + selection.key,
+            lambda: analyze_first_seller_conversion(selection.participants, selection.control)
+        )
+        return FirstSellerResult.from_details(details)
+
+    def gmv(self, selection: Selection, gmv_col: str = 'gmv_d30') -> GMVResult:
+        """H2 for a selection and GMV period"""
+        details = self.cache.get_or_compute(
+            ('h2',) + selection.key + (gmv_col,),
+            lambda: analyze_gmv_comparison(selection.participants, selection.control, gmv_col)
+        )
+        return GMVResult.from_details(gmv_col, details)
+
+    def status_evolution(self, selection: Selection) -> StatusEvolutionResult:
+        """H3 for a selection"""
+        details = self.cache.get_or_compute(
+            ('h3',) + selection.key,
+            lambda: analyze_status_evolution(selection.participants, selection.control)
+        )
+        return StatusEvolutionResult.from_details(details)
+
+    def analyze(self, selection: Selection, gmv_cols: Iterable[str] = GMV_COLUMNS) -> AnalysisReport:
+        """All three hypotheses for a selection (H2 for every GMV period)"""
+        return AnalysisReport(
+            filters=selection.filters,
+            participants=len(selection.participants),
+            control_total=selection.control.total,
+            first_seller=self.first_seller(selection),
+            gmv={gmv_col: self.gmv(selection, gmv_col) for gmv_col in gmv_cols},
+            status_evolution=self.status_evolution(selection)
+        )
+
+    def gmv_by_segment(self, selection: Selection, segment, gmv_col: str = 'gmv_d30') -> List[Dict[str, Any]]:
+        """GMV comparison within each segment (status, age or status x age)"""
+        return self.cache.get_or_compute(
+            ('gmv_segment',) + selection.key + (segment, gmv_col),
+            lambda: analyze_gmv_by_segment(selection.participants, selection.control, segment, gmv_col)
+        )
+
+    def stratified(self, selection: Selection, gmv_col: str = 'gmv_d30', by_month: bool = False) -> Dict[str, Any]:
+        """Stratified (store age, optionally x month) GMV effect"""
+        return self.cache.get_or_compute(
+            ('stratified',) + selection.key + (gmv_col, by_month),
+            lambda: analyze_stratified(selection.strata_table, selection.control, gmv_col, by_month=by_month)
+        )
+
+    def gmv_distribution(self, selection: Selection, gmv_col: str = 'gmv_d30') -> Dict[str, Any]:
+        """Log-binned histograms and ECDFs of participants and control"""
+        return self.cache.get_or_compute(
+            ('gmv_distribution',) + selection.key + (gmv_col,),
+            lambda: compare_gmv_distributions(selection.participants, selection.control, gmv_col)
+        )
+
+    def sankey(self, selection: Selection) -> Dict[str, List]:
+        """Sankey data of the participants' status transitions"""
+        return self.cache.get_or_compute(
+            ('sankey',) + selection.key,
+            lambda: get_sankey_data(selection.participants)
+        )
+
+    def leaderboard(self, dataset: Dataset, group_col: str = 'webinar_name', gmv_col: str = 'gmv_d30') -> List[Dict[str, Any]]:
+        """Every webinar (or month) against the control group, without filters"""
+        return self.cache.get_or_compute(
+            ('leaderboard',) + dataset.key + (group_col, gmv_col),
+            lambda: analyze_leaderboard(dataset.webinar_df, dataset.store_df, dataset.control, group_col, gmv_col)
+        )
+
+    def bootstrap_lift(self, selection: Selection) -> Dict[str, Any]:
+        """Bootstrap interval of the H1 lift"""
+        h1 = self.first_seller(selection)
+        control = h1.details['control']
+        return self.cache.get_or_compute(
+            ('bootstrap_lift',) + selection.key,
+            lambda: bootstrap_lift(h1.converted, h1.participants, control['sellers'], control['total']),
+            keep=_completed
+        )
+
+    def bootstrap_gmv(self, selection: Selection, gmv_col: str = 'gmv_d30') -> Dict[str, Any]:
+        """Bootstrap intervals of the H2 mean and median differences"""
+        return self.cache.get_or_compute(
+            ('bootstrap_gmv',) + selection.key + (gmv_col,),
+            lambda: bootstrap_gmv_difference(selection.participants[gmv_col], selection.control, gmv_col),
+            keep=_completed
+        )
+
+    def bootstrap_upgrade_rate(self, selection: Selection) -> Dict[str, Any]:
+        """Bootstrap interval of the H3 upgrade rate"""
+        transitions = self.status_evolution(selection).details.get('participants_transitions', {})
+        return self.cache.get_or_compute(
+            ('bootstrap_upgrade',) + selection.key,
+            lambda: bootstrap_upgrade_rate(
+                int(transitions.get('upgrade_count', 0)), transitions.get('valid_transitions', 0)
+            ),
+            keep=_completed
+        )
+
+    def permutation_conversion(self, selection: Selection) -> Dict[str, Any]:
+        """Permutation test of the H1 conversion difference"""
+        h1 = self.first_seller(selection)
+        control = h1.details['control']
+        return self.cache.get_or_compute(
+            ('permutation_conversion',) + selection.key,
+            lambda: permutation_test_conversion(h1.converted, h1.participants, control['sellers'], control['total']),
+            keep=_completed
+        )
+
+    def permutation_gmv(self, selection: Selection, gmv_col: str = 'gmv_d30') -> Dict[str, Any]:
+        """Permutation tests of the H2 mean difference and rank sum"""
+        return self.cache.get_or_compute(
+            ('permutation_gmv',) + selection.key + (gmv_col,),
+            lambda: permutation_test_gmv(selection.participants[gmv_col], selection.control, gmv_col),
+            keep=_completed
+        )
+
+    def permutation_status(self, selection: Selection) -> Dict[str, Any]:
+        """Permutation test of the H3 status distribution"""
+        details = self.status_evolution(selection).details
+        status_order = [s for s in get_status_order() if s]
+        return self.cache.get_or_compute(
+            ('permutation_status',) + selection.key,
+            lambda: permutation_test_status_distribution(
+                [details['participants_current_distribution'].get(s, 0) for s in status_order],
+                [details['control_distribution'].get(s, 0) for s in status_order]
+            ),
+            keep=_completed
+        )
@@ -0,0 +1,421 @@
+"""
+File readers module for Webinar Impact Analyzer
+Detects the upload format and reads only the columns the analyses use
+"""
+import codecs
+import csv
+import os
+import time
+import pandas as pd
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+PARQUET_MAGIC = b'PAR1'
+ARROW_MAGIC = b'ARROW1'
+FEATHER_V1_MAGIC = b'FEA1'
+XLSX_MAGIC = b'PK\x03\x04'
+XLS_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+FORMAT_BY_EXTENSION = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.csv': 'csv',
+    '.tsv': 'csv',
+    '.txt': 'csv',
+    '.xlsx': 'xlsx',
+    '.xlsm': 'xlsx',
+    '.xls': 'xls'
+}
+
+COLUMNAR_EXTENSIONS = ['parquet', 'pq', 'arrow', 'feather', 'ipc']
+EXCEL_FORMATS = ['xlsx', 'xls']
+
+# Excel engines in order of preference: calamine (Rust) is several times
+# faster than the pure-Python readers, which remain as fallbacks
+EXCEL_ENGINES = {
+    'xlsx': ['calamine', 'openpyxl'],
+    'xls': ['calamine', 'xlrd']
+}
+
+# Delimited exports are sniffed from their first bytes before the single parse
+SNIFF_BYTES = 64 * 1024
+SNIFF_LINES = 50
+DELIMITERS = ['\t', ',', ';', '|']
+
+
+def _peek(file, size: int) -> bytes:
+    """Read the first bytes of a file without moving its position"""
+    position = file.tell()
+    file.seek(0)
+    head = file.read(size)
+    file.seek(position)
+    return head if isinstance(head, bytes) else head.encode('utf-8')
+
+
+def detect_format(file) -> str:
+    """Detect the file format from its name, falling back to magic bytes"""
+    extension = os.path.splitext(getattr(file, 'name', '') or '')[1].lower()
+    if extension in FORMAT_BY_EXTENSION:
+        return FORMAT_BY_EXTENSION[extension]
+
+    head = _peek(file, 8)
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if head.startswith(ARROW_MAGIC) or head.startswith(FEATHER_V1_MAGIC):
+        return 'arrow'
+    if head.startswith(XLSX_MAGIC):
+        return 'xlsx'
+    if head.startswith(XLS_MAGIC):
+        return 'xls'
+    return 'csv'
+
+
+def _column_filter(columns: Optional[Iterable[str]]) -> Callable[[str], bool]:
+    """Predicate selecting the projected columns (all columns when None)"""
+    if columns is None:
+        return lambda name: True
+    wanted = set(columns)
+    return lambda name: name in wanted
+
+
+def _import_pyarrow():
+    """Import pyarrow, which is only required for columnar inputs"""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Leitura de Parquet/Arrow requer o pacote 'pyarrow' (pip install pyarrow)"
+        ) from e
+    return pyarrow
+
+
+def _arrow_to_pandas(table) -> pd.DataFrame:
+    """Convert an Arrow table keeping strings Arrow-backed (numbers stay NumPy)"""
+    pa = _import_pyarrow()
+    string_dtype = pd.StringDtype('pyarrow')
+
+    def types_mapper(arrow_type):
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return string_dtype
+        return None
+
+    return table.to_pandas(types_mapper=types_mapper)
+
+
+def _projected(names: List[str], columns: Optional[Iterable[str]]) -> List[str]:
+    """Schema columns that survive the projection, in file order"""
+    keep = _column_filter(columns)
+    return [name for name in names if keep(name)]
+
+
+def read_parquet(file, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Read a Parquet file, decoding only the projected columns"""
+    _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    file.seek(0)
+    parquet_file = pq.ParquetFile(file)
+    table = parquet_file.read(columns=_projected(parquet_file.schema_arrow.names, columns))
+    return _arrow_to_pandas(table)
+
+
+def read_arrow(file, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Read an Arrow IPC / Feather file, decoding only the projected columns"""
+    pa = _import_pyarrow()
+    import pyarrow.feather as feather
+
+    file.seek(0)
+    if _peek(file, 8).startswith(ARROW_MAGIC):
+        names = pa.ipc.open_file(file).schema.names
+    else:
+        # Feather V1 has no IPC footer: read it whole and project afterwards
+        names = None
+    file.seek(0)
+
+    table = feather.read_table(
+        file,
+        columns=_projected(names, columns) if names is not None else None
+    )
+    if names is None:
+        table = table.select(_projected(table.column_names, columns))
+    return _arrow_to_pandas(table)
+
+
+def _with_excel_engine(file, file_format: str, read: Callable[[str], object]) -> Tuple[object, str]:
+    """
+    Run read(engine) with the first installed Excel engine that can parse the file
+
+    An engine that fails to parse falls through to the next one; when none
+    succeeds the last parse error is raised.
+    """
+    missing = []
+    error = None
+    for engine in EXCEL_ENGINES[file_format]:
+        file.seek(0)
+        try:
+            return read(engine), engine
+        except ImportError:
+            missing.append(engine)
+        except Exception as e:
+            error = e
+    if error is not None:
+        raise error
+    raise ImportError(
+        f"Leitura de Excel requer um destes pacotes: {', '.join(missing)}"
+    )
+
+
+def list_excel_sheets(file) -> List[str]:
+    """Return the sheet names of an Excel upload (empty for other formats)"""
+    file_format = detect_format(file)
+    if file_format not in EXCEL_FORMATS:
+        return []
+
+    sheets, _ = _with_excel_engine(
+        file, file_format,
+        lambda engine: pd.ExcelFile(file, engine=engine).sheet_names
+    )
+    file.seek(0)
+    return sheets
+
+
+def read_excel(
+    file,
+    columns: Optional[Iterable[str]] = None,
+    sheet_name: Optional[Union[str, int]] = None
+) -> Tuple[pd.DataFrame, str]:
+    """Read one Excel sheet, parsing only the projected columns"""
+    file_format = detect_format(file)
+    usecols = _column_filter(columns)
+    return _with_excel_engine(
+        file, file_format,
+        lambda engine: pd.read_excel(
+            file,
+            sheet_name=0 if sheet_name is None else sheet_name,
+            engine=engine,
+            usecols=usecols
+        )
+    )
+
+
+def _detect_encoding(head: bytes) -> str:
+    """UTF-8 (with or without BOM) when the sample decodes, else Latin-1"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut by the sample boundary is still UTF-8
+        if not (len(head) == SNIFF_BYTES and e.start >= len(head) - 3):
+            return 'latin-1'
+    return 'utf-8'
+
+
+def _detect_delimiter(lines: List[str]) -> str:
+    """Pick the delimiter that splits every sample line into the same, widest shape"""
+    best_delimiter, best_key = ',', None
+    for delimiter in DELIMITERS:
+        widths = [len(row) for row in csv.reader(lines, delimiter=delimiter)]
+        if not widths or widths[0] < 2:
+            continue
+        consistency = sum(width == widths[0] for width in widths) / len(widths)
+        key = (consistency >= 0.95, widths[0], consistency)
+        if best_key is None or key > best_key:
+            best_delimiter, best_key = delimiter, key
+    return best_delimiter
+
+
+def sniff_delimited(file, columns: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Detect encoding, delimiter and header from the first SNIFF_BYTES of a file
+
+    With columns given, the first row is a header when it names any of them;
+    otherwise csv.Sniffer decides.
+    """
+    head = _peek(file, SNIFF_BYTES)
+    encoding = _detect_encoding(head)
+    lines = head.decode(encoding, errors='replace').splitlines()
+    if len(head) == SNIFF_BYTES and len(lines) > 1:
+        lines = lines[:-1]  # last line may be cut by the sample boundary
+    lines = [line for line in lines[:SNIFF_LINES] if line.strip()]
+
+    delimiter = _detect_delimiter(lines)
+    first_row = next(csv.reader(lines[:1], delimiter=delimiter), [])
+
+    if columns is not None:
+        wanted = set(columns)
+        header = any(name.strip() in wanted for name in first_row)
+    else:
+        try:
+            header = csv.Sniffer().has_header('\n'.join(lines))
+        except csv.Error:
+            header = True
+
+    return {
+        'encoding': encoding,
+        'delimiter': delimiter,
+        'header': header,
+        'columns': first_row if header else None,
+        'width': len(first_row)
+    }
+
+
+def _csv_engine() -> str:
+    """Fastest installed CSV parser"""
+    try:
+        import pyarrow  # noqa: F401
+        return 'pyarrow'
+    except ImportError:
+        return 'c'
+
+
+def _delimited_options(
+    dialect: Dict[str, Any],
+    columns: Optional[Iterable[str]],
+    default_names: Optional[List[str]]
+) -> Dict[str, Any]:
+    """read_csv options for a sniffed dialect"""
+    options = {'sep': dialect['delimiter'], 'encoding': dialect['encoding']}
+
+    if dialect['header']:
+        options['usecols'] = _projected(dialect['columns'], columns)
+    else:
+        options['header'] = None
+        if default_names:
+            extra = range(len(default_names), dialect['width'])
+            names = (list(default_names) + [f'column_{i}' for i in extra])[:dialect['width']]
+            # (pandas' pyarrow engine mishandles usecols together with names,
+            # so headerless files are projected after the parse)
+            options['names'] = names
+    return options
+
+
+def read_delimited(
+    file,
+    columns: Optional[Iterable[str]] = None,
+    default_names: Optional[List[str]] = None
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Read a CSV/TSV export in a single parse, using the sniffed dialect
+
+    default_names are applied positionally when the file has no header row.
+    Returns the frame and the dialect (plus the engine that parsed it).
+    """
+    dialect = sniff_delimited(file, columns)
+    options = _delimited_options(dialect, columns, default_names)
+
+    engine = _csv_engine()
+    file.seek(0)
+    try:
+        df = pd.read_csv(file, engine=engine, **options)
+    except Exception:
+        if engine == 'c':
+            raise
+        # pyarrow rejects some malformed exports the C parser tolerates
+        engine = 'c'
+        file.seek(0)
+        df = pd.read_csv(file, engine=engine, **options)
+
+    if not dialect['header'] and columns is not None:
+        df = df[_projected(df.columns.tolist(), columns)]
+    return df, dict(dialect, engine=engine)
+
+
+def iter_table_chunks(
+    file,
+    columns: Optional[Iterable[str]] = None,
+    chunksize: int = 250_000,
+    sheet_name: Optional[Union[str, int]] = None,
+    default_names: Optional[List[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Read an uploaded file as a sequence of frames of at most ~chunksize rows
+
+    Same formats and projection as read_table. Delimited files are parsed
+    incrementally, Parquet by record batches and Arrow IPC by its own
+    batches; Excel workbooks (at most ~1M rows) and Feather V1 files cannot
+    be read partially, so they are loaded once and then sliced.
+    """
+    file_format = detect_format(file)
+
+    if file_format == 'parquet':
+        _import_pyarrow()
+        import pyarrow.parquet as pq
+
+        file.seek(0)
+        parquet_file = pq.ParquetFile(file)
+        projected = _projected(parquet_file.schema_arrow.names, columns)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=projected):
+            yield _arrow_to_pandas(batch)
+        return
+
+    if file_format == 'arrow' and _peek(file, 8).startswith(ARROW_MAGIC):
+        pa = _import_pyarrow()
+        file.seek(0)
+        reader = pa.ipc.open_file(file)
+        projected = _projected(reader.schema.names, columns)
+        for i in range(reader.num_record_batches):
+            yield _arrow_to_pandas(reader.get_batch(i).select(projected))
+        return
+
+    if file_format == 'csv':
+        dialect = sniff_delimited(file, columns)
+        options = _delimited_options(dialect, columns, default_names)
+        file.seek(0)
+        # pandas' pyarrow engine has no chunked mode, so the C parser is used
+        for chunk in pd.read_csv(file, engine='c', chunksize=chunksize, **options):
+            if not dialect['header'] and columns is not None:
+                chunk = chunk[_projected(chunk.columns.tolist(), columns)]
+            yield chunk
+        return
+
+    df = read_table(file, columns, sheet_name, default_names)
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize].copy()
+
+
+def read_table(
+    file,
+    columns: Optional[Iterable[str]] = None,
+    sheet_name: Optional[Union[str, int]] = None,
+    default_names: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Read an uploaded file in any supported format
+
+    columns lists the names worth reading; columns missing from the file are
+    ignored here and reported by the loaders' own validation. sheet_name only
+    applies to Excel files (first sheet by default); default_names only to
+    delimited files without a header row.
+
+    Read metrics (format, engine, rows, seconds) are stored in
+    df.attrs['load_metrics'].
+    """
+    start = time.perf_counter()
+    file_format = detect_format(file)
+    engine = 'pyarrow'
+    dialect = {}
+
+    if file_format == 'parquet':
+        df = read_parquet(file, columns)
+    elif file_format == 'arrow':
+        df = read_arrow(file, columns)
+    elif file_format in EXCEL_FORMATS:
+        df, engine = read_excel(file, columns, sheet_name)
+    else:
+        df, dialect = read_delimited(file, columns, default_names)
+        engine = dialect.pop('engine')
+
+    df.attrs['load_metrics'] = {
+        'format': file_format,
+        'engine': engine,
+        'dialect': {k: dialect[k] for k in ('encoding', 'delimiter', 'header') if k in dialect},
+        'rows': len(df),
+        'columns': len(df.columns),
+        'bytes': getattr(file, 'size', None),
+        'read_seconds': time.perf_counter() - start
+    }
+    return df
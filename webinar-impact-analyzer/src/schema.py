@@ -0,0 +1,104 @@
+"""
+Schema module for Webinar Impact Analyzer
+Converts loaded frames to compact dtypes (categoricals, small integers)
+"""
+import pandas as pd
+import numpy as np
+from typing import Iterable, List
+
+
+# Fixed, ordered status categories (same order as get_status_order)
+STATUS_CATEGORIES = [
+    '',
+    'no-seller',
+    'struggling-seller',
+    'tiny-seller',
+    'small-seller',
+    'medium-seller',
+    'large-seller',
+    'top-seller'
+]
+
+WEBINAR_STATUS_COLUMNS = ['Máx. Seller Segment Mes Webinar', 'Máx. Seller Segment Mes-1 Webinar']
+WEBINAR_LABEL_COLUMNS = [
+    'Data do Webinar (mês)',
+    'webinar_name',
+    'webinar_status',
+    # raw date text is kept for reference only; few distinct values per export
+    'first_seller_at',
+    'created_at'
+]
+GMV_COLUMNS = ['gmv_d30', 'gmv_d90']
+
+
+def to_status_category(values: pd.Series) -> pd.Series:
+    """
+    Ordered status categorical using STATUS_CATEGORIES
+
+    Unrecognised labels are kept as extra categories after the known ones,
+    so nothing is lost; encode_status still maps them to -1.
+    """
+    observed = pd.unique(values.dropna())
+    extra = sorted(str(v) for v in observed if v not in STATUS_CATEGORIES)
+    dtype = pd.CategoricalDtype(STATUS_CATEGORIES + extra, ordered=True)
+    return values.astype(dtype)
+
+
+def to_label_category(values: pd.Series) -> pd.Series:
+    """Unordered categorical for repeated labels (webinar names, months)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    return values.astype('category')
+
+
+def to_compact_id(values: pd.Series) -> pd.Series:
+    """Store ids as the smallest integer type that holds them (unchanged if not numeric)"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.isna().any() or not np.all(np.mod(numeric, 1) == 0):
+        return values
+    return pd.to_numeric(numeric.astype(np.int64), downcast='integer')
+
+
+def downcast_numeric(values: pd.Series) -> pd.Series:
+    """
+    Downcast only when no value changes
+
+    Integral columns become the smallest integer type; other floats stay
+    float64, since float32 would round GMV cents on large stores.
+    """
+    if not pd.api.types.is_numeric_dtype(values) or values.isna().any():
+        return values
+    array = values.to_numpy()
+    if pd.api.types.is_float_dtype(values) and not np.all(np.mod(array, 1) == 0):
+        return values
+    return pd.to_numeric(values.astype(np.int64), downcast='integer')
+
+
+def _present(df: pd.DataFrame, columns: Iterable[str]) -> List[str]:
+    return [col for col in columns if col in df.columns]
+
+
+def apply_webinar_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Compact dtypes for the webinar participation frame"""
+    df['store_id'] = to_compact_id(df['store_id'])
+    for col in _present(df, WEBINAR_STATUS_COLUMNS):
+        df[col] = to_status_category(df[col])
+    for col in _present(df, WEBINAR_LABEL_COLUMNS):
+        df[col] = to_label_category(df[col])
+    if 'webinar_month' in df.columns:
+        # YYYY-MM labels sort chronologically, so min/max keep working
+        months = sorted(pd.unique(df['webinar_month'].dropna()))
+        df['webinar_month'] = df['webinar_month'].astype(
+            pd.CategoricalDtype(months, ordered=True)
+        )
+    return df
+
+
+def apply_store_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Compact dtypes for the store base frame"""
+    df['store_id'] = to_compact_id(df['store_id'])
+    if 'current_status' in df.columns:
+        df['current_status'] = to_status_category(df['current_status'])
+    for col in _present(df, GMV_COLUMNS + ['store_age_days']):
+        df[col] = downcast_numeric(df[col])
+    return df
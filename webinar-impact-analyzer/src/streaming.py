@@ -0,0 +1,115 @@
+"""
+Streaming module for Webinar Impact Analyzer
+Reads the store base in chunks so the full control group is never held in memory
+"""
+import os
+import time
+import pandas as pd
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple, Union
+from src.file_readers import detect_format, iter_table_chunks
+from src.data_loader import (
+    STORE_COLUMNS, STORE_POSITIONAL_COLUMNS,
+    normalize_store_data, _finish_load_metrics
+)
+from src.data_processor import categorize_store_ages
+from src.schema import apply_store_schema
+from src.analysis.control_baseline import ControlBaseline, ControlBaselineBuilder
+
+
+# Rows per chunk: peak memory is about STREAM_WORKERS chunks of the store base
+STREAM_CHUNK_ROWS = 250_000
+STREAM_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _split_chunk(
+    chunk: pd.DataFrame,
+    participant_ids: np.ndarray
+) -> Tuple[int, Optional[pd.DataFrame], Optional[ControlBaselineBuilder], Optional[str]]:
+    """Normalise a chunk, keep its participant rows and summarise its control rows"""
+    chunk, error = normalize_store_data(chunk)
+    if error:
+        return 0, None, None, error
+
+    is_participant = chunk['store_id'].isin(participant_ids).to_numpy()
+    control_chunk = chunk[~is_participant]
+    if 'store_age_days' in control_chunk.columns:
+        control_chunk = control_chunk.assign(
+            age_category=categorize_store_ages(control_chunk['store_age_days'])
+        )
+    return len(chunk), chunk[is_participant], ControlBaselineBuilder().update(control_chunk), None
+
+
+def stream_store_data(
+    file,
+    participant_ids: Iterable,
+    sheet_name: Optional[Union[str, int]] = None,
+    chunksize: int = STREAM_CHUNK_ROWS,
+    workers: int = STREAM_WORKERS
+) -> Tuple[Optional[pd.DataFrame], Optional[ControlBaseline], Optional[str]]:
+    """
+    Stream the store base, splitting each chunk by participation
+
+    Participant rows are kept (they are few); control rows only update a
+    ControlBaselineBuilder and are dropped. Chunks are summarised by up to
+    `workers` threads while the next ones are read, and the partial
+    builders are merged. Returns the participants' store rows (same columns
+    as load_store_data), the control baseline and an error message.
+    """
+    start = time.perf_counter()
+    participant_ids = pd.unique(np.asarray(participant_ids))
+    builder = ControlBaselineBuilder()
+    participant_chunks = []
+    rows = chunks = 0
+
+    def collect(future) -> Optional[str]:
+        nonlocal rows, chunks
+        chunk_rows, participants, partial, error = future.result()
+        if error is None:
+            rows += chunk_rows
+            chunks += 1
+            participant_chunks.append(participants)
+            builder.merge(partial)
+        return error
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in iter_table_chunks(
+                file, STORE_COLUMNS, chunksize, sheet_name,
+                default_names=STORE_POSITIONAL_COLUMNS
+            ):
+                pending.append(executor.submit(_split_chunk, chunk, participant_ids))
+                # Bounded in-flight work keeps memory at ~workers chunks
+                while len(pending) >= workers or (pending and pending[0].done()):
+                    error = collect(pending.popleft())
+                    if error:
+                        return None, None, error
+
+            while pending:
+                error = collect(pending.popleft())
+                if error:
+                    return None, None, error
+
+        if not participant_chunks:
+            return None, None, "Base de lojas vazia"
+
+        # Chunks may carry different compact dtypes: concatenate, then re-apply
+        store_df = apply_store_schema(pd.concat(participant_chunks, ignore_index=True))
+        baseline = builder.build()
+
+    except Exception as e:
+        return None, None, f"Erro ao carregar arquivo: {str(e)}"
+
+    load_metrics = {
+        'format': detect_format(file),
+        'engine': f'streaming, {chunks} blocos',
+        'rows': rows,
+        'columns': len(store_df.columns),
+        'bytes': getattr(file, 'size', None),
+        'read_seconds': time.perf_counter() - start
+    }
+    _finish_load_metrics(store_df, load_metrics, start)
+    return store_df, baseline, None
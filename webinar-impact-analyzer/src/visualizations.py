@@ -2,12 +2,17 @@
 Visualizations module for Webinar Impact Analyzer
 Creates interactive Plotly charts for all analyses
 """
+import functools
+import json
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Union
+from src.cache import fingerprint, get_figure_cache
+from src.analysis.control_baseline import ControlBaseline, as_control_baseline
+from src.analysis.gmv_analysis import calculate_gmv_stats, gmv_box_summary
 
 
 # Color palette
@@ -36,6 +41,33 @@ STATUS_COLORS = {
 }
 
 
+def cached_figure(create):
+    """
+    Memoise a create_* function on the content of its arguments
+    
+    The figure is kept as JSON in the figure cache (LRU, sized by the JSON)
+    and rebuilt on a hit, so an unchanged chart skips its computations and
+    Plotly validation: it was validated when first built. Calls returning
+    None are not cached.
+    """
+    @functools.wraps(create)
+    def wrapper(*args, **kwargs):
+        key = (create.__name__, fingerprint((args, kwargs)))
+        cache = get_figure_cache()
+        spec = cache.get(key)
+        if spec is not None:
+            return go.Figure(json.loads(spec), _validate=False)
+        
+        fig = create(*args, **kwargs)
+        if fig is not None:
+            spec = fig.to_json()
+            cache.put(key, spec, size=len(spec))
+        return fig
+    
+    return wrapper
+
+
+@cached_figure
 def create_conversion_comparison_chart(results: Dict[str, Any]) -> go.Figure:
     """Create bar chart comparing conversion rates"""
     fig = go.Figure()
@@ -69,6 +101,7 @@ def create_conversion_comparison_chart(results: Dict[str, Any]) -> go.Figure:
     return fig
 
 
+@cached_figure
 def create_conversion_funnel(results: Dict[str, Any]) -> go.Figure:
     """Create funnel chart for conversion"""
     p = results['participants']
@@ -89,6 +122,7 @@ def create_conversion_funnel(results: Dict[str, Any]) -> go.Figure:
     return fig
 
 
+@cached_figure
 def create_conversion_by_month_chart(results: Dict[str, Any]) -> go.Figure:
     """Create line chart showing conversion by webinar month"""
     if 'by_month' not in results or not results['by_month']:
@@ -115,7 +149,10 @@ def create_conversion_by_month_chart(results: Dict[str, Any]) -> go.Figure:
             x=df['month'],
             y=df['conversion_rate'],
             mode='lines+markers+text',
-            text=[f"{v:.1f}%" for v in df['conversion_rate']],
+            text=[
+                f"{v:.1f}%{'*' if sig is True else ''}"
+                for v, sig in zip(df['conversion_rate'], df.get('significant', [None] * len(df)))
+            ],
             textposition='top center',
             line=dict(color=COLORS['success'], width=3),
             marker=dict(size=10)
@@ -124,7 +161,7 @@ def create_conversion_by_month_chart(results: Dict[str, Any]) -> go.Figure:
     )
     
     fig.update_layout(
-        title='Conversão por Mês do Webinar',
+        title='Conversão por Mês do Webinar (* diferença significativa vs controle)',
         height=400,
         showlegend=True
     )
@@ -134,6 +171,7 @@ def create_conversion_by_month_chart(results: Dict[str, Any]) -> go.Figure:
     return fig
 
 
+@cached_figure
 def create_gmv_comparison_chart(results: Dict[str, Any], metric: str = 'mean') -> go.Figure:
     """Create bar chart comparing GMV between groups"""
     fig = go.Figure()
@@ -170,39 +208,70 @@ def create_gmv_comparison_chart(results: Dict[str, Any], metric: str = 'mean') -
     return fig
 
 
+@cached_figure
 def create_gmv_distribution_chart(
     participants_df: pd.DataFrame,
-    control_df: pd.DataFrame,
-    gmv_col: str = 'gmv_d30'
+    control: Union[pd.DataFrame, ControlBaseline],
+    gmv_col: str = 'gmv_d30',
+    results: Optional[Dict[str, Any]] = None
 ) -> go.Figure:
-    """Create box plot comparing GMV distributions"""
+    """
+    Create box plot comparing GMV distributions
+    
+    Boxes are drawn from precomputed quartiles (the analyze_gmv_comparison
+    results when given) plus a sample of outliers, so the figure stays small
+    for any group size and also works with a streamed control baseline.
+    """
     fig = go.Figure()
+    control = as_control_baseline(control)
     
-    # Filter out zeros and extreme outliers for better visualization
-    p_values = participants_df[gmv_col].dropna()
-    c_values = control_df[gmv_col].dropna()
+    p_values = np.sort(participants_df[gmv_col].dropna().to_numpy(dtype=np.float64))
+    if results is None:
+        results = {
+            'participants': calculate_gmv_stats(participants_df, gmv_col),
+            'control': control.gmv_stats[gmv_col]
+        }
     
     # Cap at 99th percentile for visualization
-    p_cap = p_values.quantile(0.99)
-    c_cap = c_values.quantile(0.99)
-    cap = max(p_cap, c_cap)
-    
-    p_values_capped = p_values[p_values <= cap]
-    c_values_capped = c_values[c_values <= cap]
-    
-    fig.add_trace(go.Box(
-        y=p_values_capped,
-        name='Participantes',
-        marker_color=COLORS['participants'],
-        boxmean=True
-    ))
-    
-    fig.add_trace(go.Box(
-        y=c_values_capped,
-        name='Controle',
-        marker_color=COLORS['control'],
-        boxmean=True
-    ))
+    caps = []
+    if len(p_values) > 0:
+        caps.append(np.quantile(p_values, 0.99))
+    if results['control']['count'] > 0:
+        caps.append(control.gmv_quantile(gmv_col, 0.99))
+    cap = max(caps) if caps else np.inf
+    
+    groups = [
+        ('Participantes', results['participants'], (p_values, None), COLORS['participants']),
+        ('Controle', results['control'], control.gmv_points(gmv_col), COLORS['control'])
+    ]
+    for name, group_stats, (points, weights), color in groups:
+        if group_stats['count'] == 0:
+            continue
+        box = gmv_box_summary(group_stats, points, weights, cap)
+        
+        fig.add_trace(go.Box(
+            x=[name],
+            q1=[box['q1']],
+            median=[box['median']],
+            q3=[box['q3']],
+            lowerfence=[box['lowerfence']],
+            upperfence=[box['upperfence']],
+            mean=[box['mean']],
+            name=name,
+            marker_color=color,
+            boxpoints=False
+        ))
+        
+        if len(box['outliers']) > 0:
+            fig.add_trace(go.Scatter(
+                x=[name] * len(box['outliers']),
+                y=box['outliers'],
+                mode='markers',
+                name=f'{name} (outliers)',
+                marker=dict(color=color, size=4, opacity=0.5),
+                showlegend=False,
+                hovertemplate=f'%{{y:,.2f}}<extra>{box["outlier_count"]:,} outliers</extra>'
+            ))
     
     fig.update_layout(
         title='Distribuição de GMV (até percentil 99)',
@@ -214,6 +283,70 @@ def create_gmv_distribution_chart(
     return fig
 
 
+@cached_figure
+def create_gmv_histogram_chart(distribution: Dict[str, Any]) -> go.Figure:
+    """Create log-scale GMV histogram (share of each group per bin) from precomputed bins"""
+    fig = go.Figure()
+    edges = distribution['edges']
+    
+    for key, name in (('participants', 'Participantes'), ('control', 'Controle')):
+        group = distribution[key]
+        if group['count'] == 0:
+            continue
+        fig.add_trace(go.Scatter(
+            x=edges,
+            y=np.append(group['shares'], group['shares'][-1]),
+            name=f"{name} ({group['zero_share']:.1f}% com GMV zero)",
+            mode='lines',
+            line=dict(color=COLORS[key], shape='hv'),
+            fill='tozeroy',
+            hovertemplate='A partir de R$ %{x:,.0f}: %{y:.2f}%<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title='Histograma de GMV (escala log)',
+        xaxis_title='GMV (R$)',
+        yaxis_title='% do grupo',
+        xaxis_type='log',
+        showlegend=True,
+        height=400
+    )
+    
+    return fig
+
+
+@cached_figure
+def create_gmv_ecdf_chart(distribution: Dict[str, Any]) -> go.Figure:
+    """Create ECDF chart (% of each group with GMV up to x) from precomputed bins"""
+    fig = go.Figure()
+    
+    for key, name in (('participants', 'Participantes'), ('control', 'Controle')):
+        group = distribution[key]
+        if group['count'] == 0:
+            continue
+        fig.add_trace(go.Scatter(
+            x=distribution['edges'],
+            y=group['ecdf'],
+            name=name,
+            mode='lines',
+            line=dict(color=COLORS[key]),
+            hovertemplate='Até R$ %{x:,.0f}: %{y:.1f}%<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title='Distribuição Acumulada de GMV (escala log)',
+        xaxis_title='GMV (R$)',
+        yaxis_title='% do grupo com GMV até o valor',
+        xaxis_type='log',
+        yaxis_range=[0, 100],
+        showlegend=True,
+        height=400
+    )
+    
+    return fig
+
+
+@cached_figure
 def create_gmv_by_status_chart(results: Dict[str, Any]) -> go.Figure:
     """Create grouped bar chart showing GMV by seller status"""
     if 'participants_by_status' not in results:
@@ -247,6 +380,7 @@ def create_gmv_by_status_chart(results: Dict[str, Any]) -> go.Figure:
     return fig
 
 
+@cached_figure
 def create_status_transition_chart(results: Dict[str, Any]) -> go.Figure:
     """Create pie chart showing status transition breakdown"""
     if 'participants_transitions' not in results:
@@ -280,6 +414,7 @@ def create_status_transition_chart(results: Dict[str, Any]) -> go.Figure:
     return fig
 
 
+@cached_figure
 def create_sankey_diagram(sankey_data: Dict[str, List]) -> go.Figure:
     """Create Sankey diagram showing status transitions"""
     if not sankey_data['source']:
@@ -331,6 +466,7 @@ def create_sankey_diagram(sankey_data: Dict[str, List]) -> go.Figure:
     return fig
 
 
+@cached_figure
 def create_status_distribution_comparison(results: Dict[str, Any]) -> go.Figure:
     """Create grouped bar chart comparing status distributions"""
     p_dist = results.get('participants_current_distribution', {})
@@ -377,6 +513,7 @@ def create_status_distribution_comparison(results: Dict[str, Any]) -> go.Figure:
     return fig
 
 
+@cached_figure
 def create_upgrade_by_status_chart(results: Dict[str, Any]) -> go.Figure:
     """Create chart showing upgrade rate by initial status"""
     if 'by_initial_status' not in results:
@@ -423,6 +560,44 @@ def create_upgrade_by_status_chart(results: Dict[str, Any]) -> go.Figure:
     return fig
 
 
+@cached_figure
+def create_leaderboard_chart(
+    records: List[Dict[str, Any]],
+    metric: str = 'lift',
+    title: str = 'Lift de Conversão vs Controle'
+) -> go.Figure:
+    """Create horizontal bar chart ranking webinars/months by a leaderboard metric"""
+    df = pd.DataFrame(records)
+    if df.empty or df[metric].isna().all():
+        return None
+    
+    df = df.dropna(subset=[metric]).sort_values(metric)
+    colors = [
+        COLORS['success'] if significant else COLORS['control']
+        for significant in df['significant'].fillna(False)
+    ]
+    
+    fig = go.Figure(go.Bar(
+        x=df[metric],
+        y=df['group'].astype(str),
+        orientation='h',
+        marker_color=colors,
+        text=[f"{v:+.1f}" for v in df[metric]],
+        textposition='outside',
+        customdata=df['participants'],
+        hovertemplate='%{y}<br>%{x:.1f}<br>%{customdata:,} participantes<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title=title,
+        height=max(350, 28 * len(df) + 120),
+        margin=dict(l=20, r=40)
+    )
+    
+    return fig
+
+
 def format_number(n: float, prefix: str = '') -> str:
     """Format number for display"""
     if n >= 1_000_000: